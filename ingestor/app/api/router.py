@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from app.core.commands import clear_tags
-from app.api.routing import setup_routes
+from app.core.commands import catalog
+from app.api.routing import setup_command_routes, setup_job_routes, setup_routes
 
 router = APIRouter()
-setup_routes(router)
\ No newline at end of file
+setup_routes(router)
+setup_job_routes(router)
+setup_command_routes(router)
\ No newline at end of file
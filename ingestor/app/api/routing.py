@@ -2,51 +2,147 @@ from __future__ import annotations
 from typing import Optional
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 import logging
+from contextlib import AsyncExitStack
 from app.core.registry import commands
-from fastapi import Body
-from typing import Any
+from app.core.limits import get_limiter, limits_stats
+from app.core.jobs import (
+    FINISHED,
+    QUEUED,
+    SUCCEEDED,
+    JobProgressResponse,
+    JobStatusResponse,
+    JobSubmitResponse,
+    get_job_manager,
+)
+from app.core.result_cache import get_result_cache
+from fastapi import Body, Header
+from typing import Any, List
 
 log = logging.getLogger(__name__)
 
+# Повтор запроса с тем же ключом возвращает сохранённый ответ (app.core.result_cache)
+IDEMPOTENCY_KEY = Header(None, alias="Idempotency-Key")
 
-def _make_post_endpoint(func, args_model: Optional[type[BaseModel]]):
+
+async def _release_after(body, stack: AsyncExitStack):
+    async with stack:
+        async for chunk in body:
+            yield chunk
+
+
+async def _limited_call(name: str, call):
+    """Выполняет команду в пределах её лимитов (app.core.limits).
+
+    Потоковый ответ держит место до конца передачи тела, а не до возврата из команды.
+    """
+    limiter = get_limiter(name)
+    async with AsyncExitStack() as stack:
+        lease = await stack.enter_async_context(limiter.slot())
+        result = await limiter.run(call(), lease)
+        if isinstance(result, StreamingResponse):
+            result.body_iterator = _release_after(result.body_iterator, stack.pop_all())
+    return result
+
+
+def _make_post_endpoint(name: str, func, args_model: Optional[type[BaseModel]], cache_ttl: Optional[float] = None):
     if args_model is None:
 
-        async def endpoint():
+        async def endpoint(idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
             try:
-                return await func()
+                return await get_result_cache().call(
+                    name, {}, lambda: _limited_call(name, func), ttl=cache_ttl, idempotency_key=idempotency_key
+                )
+            except HTTPException:
+                raise
             except Exception as e:
                 log.exception("Ошибка команды без аргументов")
                 raise HTTPException(status_code=500, detail=str(e))
 
+        endpoint.__annotations__ = {'idempotency_key': Optional[str], 'return': Any}
         return endpoint
 
     def make_async_endpoint(func, args_model):
         if hasattr(args_model, "model_rebuild"):
             args_model.model_rebuild()
 
-        async def endpoint(args = Body(...)):
+        async def endpoint(args = Body(...), idempotency_key = IDEMPOTENCY_KEY):
             try:
                 kwargs = args.model_dump()
-                return await func(**kwargs)
+                return await get_result_cache().call(
+                    name,
+                    kwargs,
+                    lambda: _limited_call(name, lambda: func(**kwargs)),
+                    ttl=cache_ttl,
+                    idempotency_key=idempotency_key,
+                )
+            except HTTPException:
+                raise
             except Exception as e:
                 log.exception("Ошибка команды с аргументами")
                 raise HTTPException(status_code=500, detail=str(e))
 
-        endpoint.__annotations__ = {'args': args_model, 'return': Any}
+        endpoint.__annotations__ = {'args': args_model, 'idempotency_key': Optional[str], 'return': Any}
         return endpoint
 
     return make_async_endpoint(func, args_model)
 
 
+def _make_job_endpoint(name: str, args_model: Optional[type[BaseModel]]):
+    """Эндпоинт длительной команды: ставит задачу в очередь и сразу отдаёт job_id.
+
+    Повтор с тем же Idempotency-Key возвращает уже созданную задачу.
+    """
+
+    async def submit(args: dict, idempotency_key: Optional[str]) -> dict:
+        async def create():
+            job_id = get_job_manager().submit(name, args)
+            return {"job_id": job_id, "command": name, "status": "queued"}
+
+        return await get_result_cache().call(name, args, create, idempotency_key=idempotency_key)
+
+    if args_model is None:
+
+        async def endpoint(idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+            return await submit({}, idempotency_key)
+
+        endpoint.__annotations__ = {'idempotency_key': Optional[str], 'return': Any}
+        return endpoint
+
+    if hasattr(args_model, "model_rebuild"):
+        args_model.model_rebuild()
+
+    async def endpoint(args = Body(...), idempotency_key = IDEMPOTENCY_KEY):
+        return await submit(args.model_dump(), idempotency_key)
+
+    endpoint.__annotations__ = {'args': args_model, 'idempotency_key': Optional[str], 'return': Any}
+    return endpoint
+
+
+def _job_status(job: dict) -> dict:
+    return {"job_id": job["id"], **{key: job[key] for key in JobStatusResponse.model_fields if key in job}}
+
+
 def setup_routes(router: APIRouter, *, prefix: str = "/scan") -> None:
     if not commands:
         log.info("commands пуст")
 
     for name, meta in commands.items():
         log.info(f"Регистрируем команду: {name} → {meta['func'].__name__}")
-        endpoint = _make_post_endpoint(meta["func"], meta.get("args_model"))
+        if meta.get("job"):
+            router.add_api_route(
+                path=f"{prefix}/{name}",
+                endpoint=_make_job_endpoint(name, meta.get("args_model")),
+                methods=["POST"],
+                status_code=202,
+                response_model=JobSubmitResponse,
+                description=f"{meta.get('description', '')} (фоновая задача, результат: GET /jobs/{{job_id}}/result)",
+                name=f"post_{name}",
+                tags=meta.get("tags", ["scan"]),
+            )
+            continue
+        endpoint = _make_post_endpoint(name, meta["func"], meta.get("args_model"), meta.get("cache_ttl"))
         router.add_api_route(
             path=f"{prefix}/{name}",
             endpoint=endpoint,
@@ -55,4 +151,49 @@ def setup_routes(router: APIRouter, *, prefix: str = "/scan") -> None:
             description=meta.get("description", ""),
             name=f"post_{name}",
             tags=meta.get("tags", ["scan"]),
-        )
\ No newline at end of file
+        )
+
+
+def setup_job_routes(router: APIRouter, *, prefix: str = "/jobs") -> None:
+    """Статус, прогресс, результат и отмена фоновых задач"""
+
+    @router.get(prefix, response_model=List[JobStatusResponse], tags=["jobs"])
+    async def list_jobs(status: Optional[str] = None, limit: int = 50):
+        return [_job_status(job) for job in get_job_manager().store.list(status=status, limit=limit)]
+
+    @router.get(f"{prefix}/{{job_id}}", response_model=JobStatusResponse, tags=["jobs"])
+    async def get_job(job_id: str):
+        return _job_status(get_job_manager().status(job_id))
+
+    @router.get(f"{prefix}/{{job_id}}/progress", response_model=JobProgressResponse, tags=["jobs"])
+    async def get_job_progress(job_id: str):
+        job = get_job_manager().status(job_id)
+        return {"job_id": job_id, "status": job["status"], "progress": job["progress"]}
+
+    @router.get(f"{prefix}/{{job_id}}/result", tags=["jobs"])
+    async def get_job_result(job_id: str):
+        job = get_job_manager().status(job_id)
+        if job["status"] != SUCCEEDED:
+            detail = f"Задача в статусе {job['status']}"
+            if job["status"] in FINISHED and job["error"]:
+                detail += f": {job['error']}"
+            raise HTTPException(status_code=409, detail=detail)
+        return job["result"]
+
+    @router.post(f"{prefix}/{{job_id}}/cancel", response_model=JobStatusResponse, tags=["jobs"])
+    async def cancel_job(job_id: str):
+        return _job_status(get_job_manager().cancel(job_id))
+
+
+def setup_command_routes(router: APIRouter, *, prefix: str = "/commands") -> None:
+    """Загрузка команд: лимиты, занятые и ожидающие места, отказы, таймауты"""
+
+    @router.get(f"{prefix}/stats", tags=["commands"])
+    async def command_stats():
+        stats = limits_stats()
+        stats["result_cache"] = get_result_cache().stats()
+        queued_jobs = get_job_manager().store.count(QUEUED)
+        for name, item in stats["commands"].items():
+            if commands[name].get("job"):
+                item["queued_jobs"] = queued_jobs.get(name, 0)
+        return stats
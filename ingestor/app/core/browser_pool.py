@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_ROOT = Path("data") / "browser_downloads"
+
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
+
+def chromedriver_path() -> str:
+    """Путь к chromedriver: CHROMEDRIVER_PATH или ChromeDriverManager, установка - один раз на процесс"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.environ.get("CHROMEDRIVER_PATH")
+            if not _driver_path:
+                from webdriver_manager.chrome import ChromeDriverManager
+
+                _driver_path = ChromeDriverManager().install()
+                log.info(f"chromedriver установлен: {_driver_path}")
+        return _driver_path
+
+
+def create_driver(headless: bool = True, download_dir: Optional[Path] = None):
+    """Создает и настраивает Chrome WebDriver"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+
+    if download_dir:
+        prefs = {
+            "download.default_directory": str(download_dir.resolve()),
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True
+        }
+        chrome_options.add_experimental_option("prefs", prefs)
+
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+
+
+def set_download_folder(driver, path: Path):
+    """Динамически меняет папку загрузки для Chrome"""
+    driver.execute_cdp_cmd(
+        "Page.setDownloadBehavior",
+        {
+            "behavior": "allow",
+            "downloadPath": str(path.resolve())
+        }
+    )
+    log.info(f"Папка загрузки изменена на: {path}")
+
+
+class BrowserWorker:
+    """Браузер пула со своей папкой загрузок"""
+
+    def __init__(self, index: int, download_dir: Path):
+        self.index = index
+        self.download_dir = download_dir
+        self.driver = None
+        self.tasks = 0
+
+    def healthy(self) -> bool:
+        """Браузер отвечает на команды (процесс жив, сессия не потеряна)"""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            log.warning(f"Браузер #{self.index} не отвечает: {e}")
+            return False
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                log.warning(f"Ошибка при закрытии браузера #{self.index}: {e}")
+            self.driver = None
+
+
+class BrowserPool:
+    """Пул из size переиспользуемых браузеров.
+
+    Браузеры запускаются один раз - при первой выдаче (или при старте приложения
+    с INGESTOR_BROWSER_PREWARM=1), перед выдачей проверяются и при необходимости пересоздаются. Selenium блокирующий, поэтому
+    каждая задача выполняется в отдельном потоке со своим браузером.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        headless: bool = True,
+        download_root: Path = DEFAULT_DOWNLOAD_ROOT,
+        driver_factory: Callable[..., Any] = create_driver,
+    ):
+        if size < 1:
+            raise ValueError(f"Размер пула браузеров должен быть не меньше 1, задан {size}")
+        self.size = size
+        self.headless = headless
+        self.download_root = Path(download_root)
+        self.driver_factory = driver_factory
+        self.workers = [BrowserWorker(i, self.download_root / f"worker_{i}") for i in range(size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self.restarts = 0
+
+    def _launch(self, worker: BrowserWorker):
+        worker.quit()
+        worker.download_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        worker.driver = self.driver_factory(headless=self.headless, download_dir=worker.download_dir)
+        log.info(f"Браузер #{worker.index} запущен за {time.perf_counter() - started:.2f} с")
+
+    async def start(self):
+        """Запускает все браузеры параллельно; ошибка запуска не фатальна - браузер пересоздастся при выдаче"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._launch, worker) for worker in self.workers), return_exceptions=True
+        )
+        for worker, result in zip(self.workers, results):
+            if isinstance(result, Exception):
+                log.error(f"Не удалось запустить браузер #{worker.index}: {result}")
+            self._idle.put_nowait(worker)
+        log.info(f"Пул браузеров: {sum(w.driver is not None for w in self.workers)}/{self.size} готовы")
+
+    async def close(self):
+        await asyncio.gather(*(asyncio.to_thread(worker.quit) for worker in self.workers))
+        self._idle = None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[BrowserWorker]:
+        """Свободный проверенный браузер; после использования возвращается в пул"""
+        if self._idle is None:
+            await self.start()
+        worker = await self._idle.get()
+        try:
+            if not await asyncio.to_thread(worker.healthy):
+                self.restarts += 1
+                await asyncio.to_thread(self._launch, worker)
+            worker.tasks += 1
+            yield worker
+        finally:
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Выполняет func(worker, *args) в потоке со свободным браузером"""
+        async with self.acquire() as worker:
+            return await asyncio.to_thread(func, worker, *args)
+
+    async def map(self, func: Callable[..., Any], items: List[Any]) -> AsyncIterator[Any]:
+        """Распределяет items по браузерам пула; результаты (item, result или исключение) - по мере готовности"""
+
+        async def call(item):
+            try:
+                return item, await self.run(func, item)
+            except Exception as e:
+                return item, e
+
+        for done in asyncio.as_completed([call(item) for item in items]):
+            yield await done
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "alive": sum(worker.driver is not None for worker in self.workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "restarts": self.restarts,
+            "tasks": [worker.tasks for worker in self.workers],
+        }
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Общий на процесс пул браузеров, размер - INGESTOR_BROWSER_POOL_SIZE"""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(
+            size=int(os.environ.get("INGESTOR_BROWSER_POOL_SIZE", 2)),
+            headless=os.environ.get("INGESTOR_BROWSER_HEADLESS", "1") != "0",
+        )
+    return _pool
+
+
+async def close_browser_pool():
+    if _pool is not None:
+        await _pool.close()
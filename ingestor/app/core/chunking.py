@@ -0,0 +1,52 @@
+from typing import List
+
+import numpy as np
+
+
+def chunk_text(text: str, size: int = 500, overlap: int = 100, max_chunks: int = 8) -> List[str]:
+    """Режет текст на перекрывающиеся окна длиной size символов.
+
+    Если окон с шагом size - overlap получается больше max_chunks, берутся max_chunks
+    окон, равномерно распределённых по всему тексту, чтобы число векторов на документ
+    оставалось ограниченным, но конец документа не терялся. ValueError, если не
+    0 <= overlap < size.
+    """
+    if size <= 0 or not 0 <= overlap < size:
+        raise ValueError(f"Нужно 0 <= overlap < size, получено overlap={overlap}, size={size}")
+    text = " ".join(str(text).split())
+    if len(text) <= size:
+        return [text] if text else []
+
+    step = size - overlap
+    starts = list(range(0, len(text) - overlap, step))
+    if len(starts) > max_chunks:
+        starts = np.linspace(0, len(text) - size, max_chunks).astype(int).tolist()
+
+    chunks = []
+    for start in starts:
+        # Сдвигаем начало окна к границе слова, чтобы не резать слова пополам
+        if start > 0:
+            space = text.find(" ", start, start + overlap)
+            if space != -1:
+                start = space + 1
+        chunks.append(text[start:start + size])
+    return chunks
+
+
+def chunk_documents(offsets: np.ndarray) -> np.ndarray:
+    """Номер документа для каждой строки-чанка по массиву границ offsets (n_docs + 1)"""
+    counts = np.diff(offsets)
+    return np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+
+
+def aggregate_chunks(scores: np.ndarray, offsets: np.ndarray, aggregation: str = "max") -> np.ndarray:
+    """Скор документов из скоров чанков (n_queries, n_chunks) по границам offsets.
+
+    Чанки одного документа лежат подряд, поэтому агрегация - один reduceat по строкам.
+    """
+    starts = offsets[:-1] - offsets[0]
+    if aggregation == "max":
+        return np.maximum.reduceat(scores, starts, axis=1)
+    if aggregation == "mean":
+        return np.add.reduceat(scores, starts, axis=1) / np.diff(offsets)
+    raise ValueError(f"Неизвестная агрегация '{aggregation}', доступны: max, mean")
@@ -1,188 +1,547 @@
 import logging
 import os
 import numpy as np
-import pandas as pd
 from fastapi import HTTPException
-from app.core.registry import register_command
-from app.db.clickhouse_client import ClickHouseManager
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from app.core.chunking import chunk_text
+from app.core.document_store import make_snippet
+from app.core.embedding_cache import cache_key, get_cache, normalize_text
+from app.core.embedding_index import EmbeddingIndex, content_hash, get_index
+from app.core.embedding_pipeline import EMBEDDINGS_MODEL, EMBEDDING_DIM, get_pipeline
+from app.core.jobs import report_progress
+from app.core.pipeline import CLEANED_TEXT, EMBEDDINGS, RAW_DOCUMENTS, get_artifact, put_artifact
+from app.core.result_cache import get_result_cache
+from app.core.lexical_index import LexicalIndex, get_lexical_index
+from app.core.vector_index import ExactIndex, VectorIndex, get_vector_index, score_documents, top_k_rows
+from app.core.scan_cache import get_scan_cache
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import asyncio
-from gigachat import GigaChat
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import normalize
 import json
 
 log = logging.getLogger(__name__)
 
-# --- Модели для GigaChat команд ---
-class GigaChatSearchArgs(BaseModel):
-    scan_id: int
-    query: str = Field(..., description="Поисковый запрос")
-    top_k: int = Field(5, description="Количество возвращаемых результатов")
-
-class GigaChatBatchSearchArgs(BaseModel):
-    scan_id: int
-    queries: List[str] = Field(..., description="Список поисковых запросов")
-    top_k: int = Field(3, description="Количество возвращаемых результатов на запрос")
-
-class GigaChatPrepareArgs(BaseModel):
-    scan_id: int
-    text_column: str = Field("content", description="Название колонки с текстом")
-
-class GigaChatSearchResponse(BaseModel):
-    scan_id: int
-    query: str
-    results: List[Dict[str, Any]]
-    processing_time: float
-
-class GigaChatBatchResponse(BaseModel):
-    scan_id: int
-    results: Dict[str, List[Dict[str, Any]]]
-    processing_time: float
-
-class GigaChatPrepareResponse(BaseModel):
-    scan_id: int
-    embeddings_count: int
-    valid_documents: int
-    message: str
+DEFAULT_CHUNKING = {"size": 500, "overlap": 100, "max_chunks": 8}
+SEARCH_MODES = ("hybrid", "dense", "lexical")
 
 # --- GigaChat сервис ---
 class GigaChatService:
     def __init__(self):
-        self.client_secret = ""
-        if not self.client_secret:
+        self.pipeline = get_pipeline()
+        self.cache = get_cache()
+        if not self.pipeline.configured:
             log.warning("GIGACHAT_TOKEN не установлен в переменных окружения")
         
         self.embeddings = None
-        self.data_df = None
-        self.valid_indices = []
-        self.original_to_valid_index = {}
-        self.valid_to_original_index = {}
+        self.records = None
+        self.documents = None
+        self.text_column = "content"
+        self.index = None
+        self.content_hashes = None
+        self.chunk_offsets = None
+        self.chunking = None
+        # Строка индекса (документ с векторами) -> позиция документа в скане
+        self.valid_indices = np.empty(0, dtype=np.int64)
 
-    def get_embedding(self, text: str) -> np.ndarray:
-        """Получение эмбеддинга через GigaChat"""
+    @classmethod
+    def for_scan(cls, scan_id: int) -> "GigaChatService":
+        """Сервис поверх сохранённого индекса scan_id, переиспользуется между запросами"""
+        index = get_index(scan_id)
+        service = _services.get(scan_id)
+        if service is None or service.index is not index:
+            service = cls()
+            service.load_index(index)
+            _services[scan_id] = service
+        return service
+
+    def load_index(self, index: EmbeddingIndex):
+        """Подключает готовый индекс вместо повторного расчёта эмбеддингов"""
+        self.index = index
+        self.embeddings = index.vectors
+        self.content_hashes = index.hashes
+        self.chunk_offsets = index.chunk_offsets
+        self.chunking = index.manifest.get("chunking")
+        self.text_column = index.manifest.get("text_column", "content")
+        self.documents = index.documents
+        self.records = None
+        self.valid_indices = index.ids
+
+    def save_index(self, scan_id: int, text_column: str = "content") -> EmbeddingIndex:
+        """Сохраняет подготовленные эмбеддинги на диск и подключает их через mmap.
+        Рядом строится лексический индекс BM25 для гибридного поиска; из async-кода
+        вызывается через asyncio.to_thread."""
+        if self.embeddings is None:
+            raise ValueError("Эмбеддинги не подготовлены")
+        index = EmbeddingIndex.save(
+            scan_id,
+            self.embeddings,
+            self.valid_indices,
+            self.records,
+            model=EMBEDDINGS_MODEL,
+            text_column=text_column,
+            hashes=self.content_hashes,
+            chunk_offsets=self.chunk_offsets,
+            chunking=self.chunking,
+        )
+        self.load_index(index)
+        get_lexical_index(index)
+        return index
+
+    def get_embedding(self, text: str, use_cache: bool = True) -> np.ndarray:
+        """Получение эмбеддинга через GigaChat; use_cache=False всегда идёт в API"""
         try:
-            if not self.client_secret:
-                raise ValueError("GIGACHAT_TOKEN не настроен")
-            
-            truncated_text = text[:500]  # Обрезаем для избежания ошибок
-            with GigaChat(credentials=self.client_secret, verify_ssl_certs=False) as giga:
-                response = giga.embeddings(truncated_text)
-                return np.array(response.data[0].embedding)
+            # Текст обрезается до pipeline.max_chars для избежания ошибок
+            prepared = self._prepare_text(text)
+            if not use_cache:
+                return self.pipeline.embed_sync([prepared])[0]
+            key = cache_key(prepared, self.pipeline.model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            embedding = self.pipeline.embed_sync([prepared])[0]
+            if np.any(embedding != 0):
+                self.cache.put(key, embedding, self.pipeline.model)
+            return embedding
         except Exception as e:
             log.error(f"Ошибка получения эмбеддинга: {e}")
-            return np.zeros(1024)
+            return np.zeros(EMBEDDING_DIM)
+
+    def _prepare_text(self, text: str) -> str:
+        return normalize_text(text)[: self.pipeline.max_chars]
+
+    async def embed_texts(
+        self, texts: List[str], on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Эмбеддинги для списка текстов: сначала кэш, в API уходят только уникальные промахи"""
+        prepared = [self._prepare_text(text) for text in texts]
+        keys = [cache_key(text, self.pipeline.model) for text in prepared]
+        # Кэш - SQLite: чтение и запись с коммитом идут в потоке, чтобы не останавливать цикл событий
+        found = await asyncio.to_thread(self.cache.get_many, dict.fromkeys(keys))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, prepared):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors, ok = await self.pipeline.embed(list(missing.values()), on_progress=on_progress)
+            fresh = {key: vectors[i] for i, key in enumerate(missing) if ok[i]}
+            await asyncio.to_thread(self.cache.put_many, fresh, self.pipeline.model)
+            found.update(fresh)
+        log.info(f"Эмбеддинги из кэша: {len(texts) - len(missing)}/{len(texts)}, запрошено в API: {len(missing)}")
 
-    async def prepare_embeddings_async(self, data: List[Dict], text_field: str = "content"):
-        """Асинхронная подготовка эмбеддингов"""
+        result = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        ok = np.zeros(len(texts), dtype=bool)
+        for i, key in enumerate(keys):
+            vector = found.get(key)
+            if vector is not None:
+                result[i] = vector
+                ok[i] = True
+        return result, ok
+
+    async def prepare_embeddings_async(
+        self,
+        data: List[Dict],
+        text_field: str = "content",
+        previous: Optional[EmbeddingIndex] = None,
+        chunking: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, int]:
+        """Асинхронная подготовка эмбеддингов.
+
+        Документ режется на перекрывающиеся чанки (chunking: size, overlap, max_chunks),
+        каждый чанк получает свой вектор. Если передан предыдущий индекс, векторы документов
+        с неизменившимся содержимым берутся из него, а в API уходят только новые и изменённые
+        документы. Возвращает число переиспользованных, добавленных и удалённых документов.
+        """
         if not data:
             raise ValueError("Нет данных для обработки")
         
         log.info(f"Начинаем создание эмбеддингов для {len(data)} документов")
         
-        self.data_df = pd.DataFrame(data)
-        texts = self.data_df[text_field].astype(str).tolist()
-        embeddings_list = []
+        self.records = data
+        self.text_column = text_field
+        texts = [str(doc[text_field]) for doc in data]
+        hashes = np.array([content_hash(text) for text in texts], dtype="S16")
+        chunking = dict(chunking or DEFAULT_CHUNKING)
+        chunking["size"] = min(chunking["size"], self.pipeline.max_chars)
+        self.chunking = chunking
         
-        for i, text in enumerate(texts):
-            if i % 10 == 0:
-                log.info(f"Обработано {i}/{len(texts)} записей...")
-            
-            # Используем синхронный вызов в отдельном потоке
-            embedding = await asyncio.get_event_loop().run_in_executor(
-                None, self.get_embedding, text
-            )
-            embeddings_list.append(embedding)
-            
-            # Небольшая задержка для избежания rate limiting
-            await asyncio.sleep(0.1)
+        doc_vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        removed = 0
+        if previous is not None and previous.hashes is not None:
+            previous_rows = {h: row for row, h in enumerate(previous.hashes)}
+            offsets = previous.chunk_offsets
+            for i, h in enumerate(hashes):
+                row = previous_rows.get(h)
+                if row is not None:
+                    doc_vectors[i] = np.asarray(previous.vectors[offsets[row]:offsets[row + 1]])
+            removed = len(set(previous_rows) - set(hashes.tolist()))
+        pending = [i for i, vectors in enumerate(doc_vectors) if vectors is None]
+        reused = len(texts) - len(pending)
+        report_progress(documents_total=len(texts), documents_reused=reused, documents_pending=len(pending))
         
-        # Фильтруем валидные эмбеддинги
-        valid_embeddings = []
+        # Пачки чанков уходят в embeddings() параллельно, темп подстраивается под 429 и задержки.
+        # Уже встречавшиеся тексты берутся из кэша эмбеддингов
+        if pending:
+            pending_chunks = [
+                chunk_text(texts[i], chunking["size"], chunking["overlap"], chunking["max_chunks"]) for i in pending
+            ]
+            pending_offsets = np.concatenate([[0], np.cumsum([len(chunks) for chunks in pending_chunks])])
+            fresh_vectors, fresh_ok = await self.embed_texts(
+                [chunk for chunks in pending_chunks for chunk in chunks],
+                on_progress=lambda done, total: report_progress(chunks_embedded=done, chunks_to_embed=total),
+            )
+            for j, i in enumerate(pending):
+                rows = slice(pending_offsets[j], pending_offsets[j + 1])
+                good = fresh_ok[rows]
+                if good.any():
+                    doc_vectors[i] = fresh_vectors[rows][good]
         
-        for i, emb in enumerate(embeddings_list):
-            if isinstance(emb, np.ndarray) and emb.shape == (1024,) and not np.all(emb == 0):
-                valid_embeddings.append(emb)
-                self.valid_indices.append(i)
+        # Фильтруем документы, для которых получен хотя бы один валидный вектор
+        self.valid_indices = np.array(
+            [i for i, vectors in enumerate(doc_vectors) if vectors is not None], dtype=np.int64
+        )
+        added = len(self.valid_indices) - reused
+        self.content_hashes = hashes[self.valid_indices]
         
-        if valid_embeddings:
-            self.embeddings = np.array(valid_embeddings)
-            self.embeddings = normalize(self.embeddings)
-            
-            # Создаем маппинги индексов
-            for valid_idx, original_idx in enumerate(self.valid_indices):
-                self.original_to_valid_index[original_idx] = valid_idx
-                self.valid_to_original_index[valid_idx] = original_idx
+        if len(self.valid_indices):
+            valid_embeddings = np.vstack([doc_vectors[i] for i in self.valid_indices])
+            self.embeddings = normalize(valid_embeddings)
+            self.chunk_offsets = np.concatenate(
+                [[0], np.cumsum([len(doc_vectors[i]) for i in self.valid_indices])]
+            ).astype(np.int64)
             
-            log.info(f"Создано {len(valid_embeddings)} валидных эмбеддингов")
+            log.info(
+                f"Создано {len(valid_embeddings)} векторов для {len(self.valid_indices)} документов: "
+                f"переиспользовано {reused}, добавлено {added}, удалено {removed}"
+            )
         else:
             raise ValueError("Не удалось создать ни одного валидного эмбеддинга")
+        
+        return {"reused": reused, "added": added, "removed": removed}
 
-    def search_similar(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Поиск похожих документов"""
+    def _search_documents(
+        self,
+        query_matrix: np.ndarray,
+        top_k: int,
+        index_type: str = "exact",
+        nlist: Optional[int] = None,
+        codec: str = "float32",
+        pca_dim: Optional[int] = None,
+        aggregation: str = "max",
+        candidates: Optional[np.ndarray] = None,
+        **search_params,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k документов для блока нормированных запросов с агрегацией скоров по чанкам.
+
+        search_params (nprobe, rerank) передаются в search_documents выбранного индекса.
+        Если заданы candidates, точно скорятся только чанки этих документов.
+        """
+        offsets = self.chunk_offsets
+        if offsets is None:
+            offsets = np.arange(len(self.embeddings) + 1, dtype=np.int64)
+        if candidates is not None:
+            candidates = np.sort(candidates)
+            scores, best = top_k_rows(
+                score_documents(self.embeddings, query_matrix, candidates, offsets, aggregation), top_k
+            )
+            return scores, candidates[best]
+        return self.vector_index(index_type, nlist, codec, pca_dim).search_documents(
+            query_matrix, top_k, offsets, aggregation=aggregation, **search_params
+        )
+
+    def vector_index(
+        self,
+        index_type: str = "exact",
+        nlist: Optional[int] = None,
+        codec: str = "float32",
+        pca_dim: Optional[int] = None,
+    ) -> VectorIndex:
+        """Векторный индекс выбранного типа; без сохранённого индекса доступен только точный поиск"""
+        if self.index is None:
+            if index_type != ExactIndex.name or codec != "float32" or pca_dim is not None:
+                raise ValueError(f"Индекс '{index_type}' с кодеком '{codec}' доступен только для сохранённых эмбеддингов")
+            return ExactIndex(self.embeddings)
+        return get_vector_index(self.index, index_type, nlist=nlist, codec=codec, pca_dim=pca_dim)
+
+    def lexical_index(self) -> LexicalIndex:
+        if self.index is None:
+            raise ValueError("Лексический поиск доступен только для сохранённых эмбеддингов")
+        return get_lexical_index(self.index)
+
+    def _lexical_stage(
+        self, query: str, top_k: int, mode: str, lexical_threshold: float, lexical_candidates: int, **output
+    ) -> Tuple[Optional[List[Dict]], Optional[np.ndarray]]:
+        """Лексический этап поиска: (готовые результаты, кандидаты для ранжирования эмбеддингами).
+
+        Если лучший по BM25 документ содержит достаточную долю слов запроса, ответ
+        берётся из лексического индекса без обращения к GigaChat. output - fields и
+        snippet_length для _build_results.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Неизвестный режим поиска '{mode}', доступны: {', '.join(SEARCH_MODES)}")
+        if mode == "dense":
+            return None, None
+
+        scores, docs, coverage = self.lexical_index().search(query, max(top_k, lexical_candidates))
+        if mode == "lexical" or (len(docs) > 0 and coverage[0] >= lexical_threshold):
+            results = self._build_results(
+                docs[:top_k], coverage[:top_k], query, match="lexical", bm25=scores[:top_k], **output
+            )
+            return results, None
+        if lexical_candidates > 0 and len(docs) > 0:
+            return None, docs
+        return None, None
+
+    def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: str = "dense",
+        lexical_threshold: float = 1.0,
+        lexical_candidates: int = 0,
+        fields: Optional[List[str]] = None,
+        snippet_length: int = 200,
+        **index_params,
+    ) -> List[Dict]:
+        """Поиск похожих документов; index_params - параметры индекса из VectorIndexArgs (app.core.commands.models)"""
         if self.embeddings is None or len(self.embeddings) == 0:
             raise ValueError("Эмбеддинги не подготовлены")
         
+        output = {"fields": fields, "snippet_length": snippet_length}
+        answered, candidates = self._lexical_stage(
+            query, top_k, mode, lexical_threshold, lexical_candidates, **output
+        )
+        if answered is not None:
+            return answered
+        
         # Получаем эмбеддинг для запроса
         query_embedding = self.get_embedding(query)
         if np.all(query_embedding == 0):
             raise ValueError("Не удалось получить эмбеддинг для запроса")
         
-        query_embedding = normalize(query_embedding.reshape(1, -1))
-        
-        # Вычисляем косинусное сходство
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        query_embedding = normalize(query_embedding.reshape(1, -1))[0].astype(np.float32)
         
-        # Получаем индексы top_k наиболее похожих
-        top_indices = similarities.argsort()[-top_k:][::-1]
+        # Векторы нормированы, поэтому косинусное сходство - это скалярное произведение;
+        # индекс возвращает top_k документов без полной сортировки
+        scores, top_indices = self._search_documents(
+            query_embedding[None, :], top_k, candidates=candidates, **index_params
+        )
         
-        # Формируем результаты
+        return self._build_results(
+            top_indices[0], scores[0], query, match=None if mode == "dense" else "dense", **output
+        )
+
+    def _build_results(
+        self,
+        top_indices: np.ndarray,
+        scores: np.ndarray,
+        query: str = "",
+        match: Optional[str] = None,
+        bm25: Optional[np.ndarray] = None,
+        fields: Optional[List[str]] = None,
+        snippet_length: int = 200,
+    ) -> List[Dict]:
+        """Формирует результаты по позициям строк индекса и их скорам.
+
+        Из хранилища читаются только поля fields (по умолчанию все, кроме текстовой колонки),
+        текст документа заменяется фрагментом вокруг слов запроса. Для лексических ответов
+        similarity - доля слов запроса в документе, bm25 - сырой скор.
+        """
+        if fields is None:
+            fields = [name for name in self.documents.fields if name != self.text_column]
         results = []
-        for idx in top_indices:
-            if idx in self.valid_to_original_index:
-                original_idx = self.valid_to_original_index[idx]
-                if original_idx < len(self.data_df):
-                    result = {
-                        **self.data_df.iloc[original_idx].to_dict(),
-                        'similarity': float(similarities[idx])
-                    }
-                    results.append(result)
+        for position, (idx, score) in enumerate(zip(top_indices, scores)):
+            if 0 <= idx < len(self.valid_indices):
+                original_idx = int(self.valid_indices[idx])
+                result = {
+                    **self.documents.get(original_idx, fields),
+                    'similarity': float(score)
+                }
+                if snippet_length > 0:
+                    text = self.documents.text(self.text_column, original_idx)
+                    result['snippet'] = make_snippet(text, query, snippet_length)
+                if match is not None:
+                    result['match'] = match
+                if bm25 is not None:
+                    result['bm25'] = float(bm25[position])
+                results.append(result)
         
         return results
 
+    async def search_similar_batch(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        chunk_size: int = 256,
+        mode: str = "dense",
+        lexical_threshold: float = 1.0,
+        lexical_candidates: int = 0,
+        fields: Optional[List[str]] = None,
+        snippet_length: int = 200,
+        **index_params,
+    ) -> Dict[str, List[Dict]]:
+        """Пакетный поиск: эмбеддинги запросов пачками, одно произведение матриц на блок запросов.
+
+        Запросы обходятся блоками по chunk_size, чтобы матрица скоров блок x документы
+        оставалась ограниченной по памяти. Запросы, на которые ответил лексический
+        индекс, в GigaChat не отправляются.
+        """
+        if self.embeddings is None or len(self.embeddings) == 0:
+            raise ValueError("Эмбеддинги не подготовлены")
+
+        unique_queries = list(dict.fromkeys(queries))
+        all_results: Dict[str, List[Dict]] = {query: [] for query in unique_queries}
+        if not unique_queries:
+            return all_results
+
+        output = {"fields": fields, "snippet_length": snippet_length}
+        dense_queries = []
+        query_candidates: Dict[str, np.ndarray] = {}
+
+        def lexical_stage():
+            for query in unique_queries:
+                answered, candidates = self._lexical_stage(
+                    query, top_k, mode, lexical_threshold, lexical_candidates, **output
+                )
+                if answered is not None:
+                    all_results[query] = answered
+                else:
+                    dense_queries.append(query)
+                    if candidates is not None:
+                        query_candidates[query] = candidates
+
+        # Построение индексов и скоринг на NumPy - в потоке, чтобы не блокировать event loop
+        await asyncio.to_thread(lexical_stage)
+        if not dense_queries:
+            return all_results
+        match = None if mode == "dense" else "dense"
+
+        query_embeddings, ok = await self.embed_texts(dense_queries)
+        for query in np.asarray(dense_queries, dtype=object)[~ok]:
+            log.error(f"Не удалось получить эмбеддинг для запроса '{query}'")
+
+        def dense_stage():
+            query_matrix = normalize(query_embeddings[ok]).astype(np.float32)
+            valid_queries = []
+            rows = []
+            for row, query in enumerate(query for query, good in zip(dense_queries, ok) if good):
+                candidates = query_candidates.get(query)
+                if candidates is None:
+                    valid_queries.append(query)
+                    rows.append(row)
+                    continue
+                scores, top_indices = self._search_documents(
+                    query_matrix[row:row + 1], top_k, candidates=candidates, **index_params
+                )
+                all_results[query] = self._build_results(top_indices[0], scores[0], query, match=match, **output)
+            query_matrix = query_matrix[rows]
+
+            for start in range(0, len(valid_queries), chunk_size):
+                scores, top_indices = self._search_documents(
+                    query_matrix[start:start + chunk_size], top_k, **index_params
+                )
+                for row, query in enumerate(valid_queries[start:start + chunk_size]):
+                    all_results[query] = self._build_results(
+                        top_indices[row], scores[row], query, match=match, **output
+                    )
+
+        await asyncio.to_thread(dense_stage)
+        return all_results
+
+
+# Сервисы поверх открытых индексов, по одному на scan_id
+_services: Dict[int, GigaChatService] = {}
+
+
+def _get_service(scan_id: int) -> GigaChatService:
+    """Возвращает сервис с индексом scan_id или 404, если эмбеддинги не подготовлены"""
+    service = get_artifact(EMBEDDINGS, scan_id)
+    if service is not None:
+        return service
+    try:
+        return GigaChatService.for_scan(scan_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 # --- Команды GigaChat ---
-@register_command(
-    command_name="gigachat_prepare_embeddings",
-    args_model=GigaChatPrepareArgs,
-    response_model=GigaChatPrepareResponse,
-    description="Подготовка векторных представлений для документов scan_id"
-)
-async def gigachat_prepare_embeddings_command(scan_id: int, text_column: str = "content") -> dict:
-    """Подготавливает эмбеддинги для документов указанного scan_id"""
+async def gigachat_prepare_embeddings_command(
+    scan_id: int,
+    text_column: str = "content",
+    force: bool = False,
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+    max_chunks: int = 8,
+) -> dict:
+    """Подготавливает эмбеддинги для документов указанного scan_id.
+    При повторном вызове пересчитываются только новые и изменённые документы."""
     start_time = asyncio.get_event_loop().time()
     
     try:
-        # Получаем данные из ClickHouse
-        ch_manager = ClickHouseManager(config_path=None)
-        raw_data = ch_manager.get_data_by_scan_id(scan_id)
-        
-        if not raw_data:
-            raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
+        # В конвейере документы уже прочитаны предыдущим шагом; иначе читаем из ClickHouse
+        # (или кэша сканов) пачками, только колонку content; force перечитывает скан из источника
+        contents = get_artifact(RAW_DOCUMENTS, scan_id)
+        if contents is None:
+            scan_cache = get_scan_cache()
+            if force:
+                scan_cache.invalidate(scan_id)
+            contents = []
+            async for batch in scan_cache.aiter_scan(scan_id, columns=("content",)):
+                contents.extend(row["content"] for row in batch)
+            put_artifact(RAW_DOCUMENTS, contents, scan_id)
 
-        # Подготавливаем данные
+        # text_column=cleaned_text - эмбеддинги по тексту, очищенному шагом clear_tags того же конвейера
+        cleaned = get_artifact(CLEANED_TEXT, scan_id) if text_column == CLEANED_TEXT else None
+        if text_column == CLEANED_TEXT and cleaned is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{CLEANED_TEXT} доступен только в конвейере после шага clear_tags по scan_id={scan_id}",
+            )
         documents = []
-        for i, doc in enumerate(raw_data):
-            documents.append({
-                "id": i,
-                "content": doc.content,
-                "scan_id": scan_id,
-                "document_index": i
-            })
-
-        # Инициализируем и подготавливаем эмбеддинги
+        for i, content in enumerate(contents):
+            document = {"id": i, "content": content, "scan_id": scan_id, "document_index": i}
+            if cleaned is not None:
+                document[CLEANED_TEXT] = cleaned[i]
+            documents.append(document)
+
+        if not documents:
+            raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
+
+        # Инициализируем сервис; размер чанка не может превышать лимит текста на эмбеддинг
         service = GigaChatService()
-        await service.prepare_embeddings_async(documents, text_column)
+        chunking = {
+            "size": min(chunk_size, service.pipeline.max_chars),
+            "overlap": chunk_overlap,
+            "max_chunks": max_chunks,
+        }
+        if not 0 <= chunking["overlap"] < chunking["size"]:
+            raise HTTPException(
+                status_code=422,
+                detail=f"chunk_overlap={chunk_overlap} должен быть меньше длины чанка {chunking['size']}",
+            )
+
+        # Предыдущий индекс той же модели, колонки и нарезки позволяет не пересчитывать неизменённые документы
+        previous = None
+        manifest = EmbeddingIndex.read_manifest(scan_id)
+        if (
+            not force
+            and manifest is not None
+            and manifest.get("model") == EMBEDDINGS_MODEL
+            and manifest.get("text_column") == text_column
+            and manifest.get("chunking") == chunking
+        ):
+            previous = get_index(scan_id)
+
+        # Подготавливаем эмбеддинги
+        update = await service.prepare_embeddings_async(
+            documents, text_column, previous=previous, chunking=chunking
+        )
+        # Запись матрицы и построение BM25 блокируют надолго - в потоке
+        await asyncio.to_thread(service.save_index, scan_id, text_column)
+        _services[scan_id] = service
+        put_artifact(EMBEDDINGS, service, scan_id)
+        # Результаты поиска по прежнему индексу устарели
+        get_result_cache().invalidate(scan_id)
         
         processing_time = asyncio.get_event_loop().time() - start_time
         
@@ -190,48 +549,51 @@ async def gigachat_prepare_embeddings_command(scan_id: int, text_column: str = "
             "scan_id": scan_id,
             "embeddings_count": len(service.embeddings) if service.embeddings is not None else 0,
             "valid_documents": len(service.valid_indices),
-            "message": f"Эмбеддинги подготовлены за {processing_time:.2f} секунд",
-            "processing_time": processing_time
+            "message": (
+                f"Эмбеддинги подготовлены за {processing_time:.2f} секунд: переиспользовано {update['reused']}, "
+                f"добавлено {update['added']}, удалено {update['removed']}"
+            ),
+            "processing_time": processing_time,
+            **update,
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при подготовке эмбеддингов для scan_id={scan_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка подготовки эмбеддингов: {e}")
 
-@register_command(
-    command_name="gigachat_search",
-    args_model=GigaChatSearchArgs,
-    response_model=GigaChatSearchResponse,
-    description="Семантический поиск по документам scan_id с использованием GigaChat"
-)
-async def gigachat_search_command(scan_id: int, query: str, top_k: int = 5) -> dict:
+async def gigachat_search_command(
+    scan_id: int,
+    query: str,
+    top_k: int = 5,
+    index_type: str = "exact",
+    nprobe: Optional[int] = None,
+    nlist: Optional[int] = None,
+    aggregation: str = "max",
+    codec: str = "float32",
+    pca_dim: Optional[int] = None,
+    rerank: int = 0,
+    mode: str = "hybrid",
+    lexical_threshold: float = 1.0,
+    lexical_candidates: int = 0,
+    fields: Optional[List[str]] = None,
+    snippet_length: int = 200,
+) -> dict:
     """Выполняет семантический поиск по документам"""
     start_time = asyncio.get_event_loop().time()
     
     try:
-        # Получаем данные из ClickHouse
-        ch_manager = ClickHouseManager(config_path=None)
-        raw_data = ch_manager.get_data_by_scan_id(scan_id)
-        
-        if not raw_data:
-            raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
-
-        # Подготавливаем данные
-        documents = []
-        for i, doc in enumerate(raw_data):
-            documents.append({
-                "id": i,
-                "content": doc.content,
-                "scan_id": scan_id,
-                "document_index": i
-            })
-
-        # Инициализируем сервис и подготавливаем эмбеддинги
-        service = GigaChatService()
-        await service.prepare_embeddings_async(documents)
+        # Открываем сохранённый индекс вместо повторного расчёта эмбеддингов
+        service = _get_service(scan_id)
         
-        # Выполняем поиск
-        results = service.search_similar(query, top_k)
+        # Эмбеддинг запроса, построение индексов и скоринг блокируют - выполняем в потоке
+        results = await asyncio.to_thread(
+            service.search_similar,
+            query, top_k, mode=mode, lexical_threshold=lexical_threshold, lexical_candidates=lexical_candidates,
+            fields=fields, snippet_length=snippet_length, index_type=index_type, nprobe=nprobe, nlist=nlist, aggregation=aggregation,
+            codec=codec, pca_dim=pca_dim, rerank=rerank,
+        )
         
         processing_time = asyncio.get_event_loop().time() - start_time
         
@@ -242,51 +604,42 @@ async def gigachat_search_command(scan_id: int, query: str, top_k: int = 5) -> d
             "processing_time": processing_time
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при поиске для scan_id={scan_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка поиска: {e}")
 
-@register_command(
-    command_name="gigachat_batch_search",
-    args_model=GigaChatBatchSearchArgs,
-    response_model=GigaChatBatchResponse,
-    description="Пакетный семантический поиск по нескольким запросам"
-)
-async def gigachat_batch_search_command(scan_id: int, queries: List[str], top_k: int = 3) -> dict:
+async def gigachat_batch_search_command(
+    scan_id: int,
+    queries: List[str],
+    top_k: int = 3,
+    index_type: str = "exact",
+    nprobe: Optional[int] = None,
+    nlist: Optional[int] = None,
+    aggregation: str = "max",
+    codec: str = "float32",
+    pca_dim: Optional[int] = None,
+    rerank: int = 0,
+    mode: str = "hybrid",
+    lexical_threshold: float = 1.0,
+    lexical_candidates: int = 0,
+    fields: Optional[List[str]] = None,
+    snippet_length: int = 200,
+) -> dict:
     """Выполняет пакетный поиск по нескольким запросам"""
     start_time = asyncio.get_event_loop().time()
     
     try:
-        # Получаем данные из ClickHouse
-        ch_manager = ClickHouseManager(config_path=None)
-        raw_data = ch_manager.get_data_by_scan_id(scan_id)
+        # Открываем сохранённый индекс вместо повторного расчёта эмбеддингов
+        service = _get_service(scan_id)
         
-        if not raw_data:
-            raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
-
-        # Подготавливаем данные
-        documents = []
-        for i, doc in enumerate(raw_data):
-            documents.append({
-                "id": i,
-                "content": doc.content,
-                "scan_id": scan_id,
-                "document_index": i
-            })
-
-        # Инициализируем сервис и подготавливаем эмбеддинги
-        service = GigaChatService()
-        await service.prepare_embeddings_async(documents)
-        
-        # Выполняем поиск для каждого запроса
-        all_results = {}
-        for query in queries:
-            try:
-                results = service.search_similar(query, top_k)
-                all_results[query] = results
-            except Exception as e:
-                log.error(f"Ошибка при поиске для запроса '{query}': {e}")
-                all_results[query] = []
+        # Все запросы за один проход: эмбеддинги пачками, top_k по строкам матрицы скоров
+        all_results = await service.search_similar_batch(
+            queries, top_k, mode=mode, lexical_threshold=lexical_threshold, lexical_candidates=lexical_candidates,
+            fields=fields, snippet_length=snippet_length, index_type=index_type, nprobe=nprobe, nlist=nlist, aggregation=aggregation,
+            codec=codec, pca_dim=pca_dim, rerank=rerank,
+        )
         
         processing_time = asyncio.get_event_loop().time() - start_time
         
@@ -296,45 +649,62 @@ async def gigachat_batch_search_command(scan_id: int, queries: List[str], top_k:
             "processing_time": processing_time
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при пакетном поиске для scan_id={scan_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка пакетного поиска: {e}")
 
-@register_command(
-    command_name="gigachat_similarity_check",
-    args_model=GigaChatSearchArgs,
-    response_model=GigaChatSearchResponse,
-    description="Проверка схожести документов с эталонным запросом"
-)
-async def gigachat_similarity_check_command(scan_id: int, query: str, top_k: int = 5) -> dict:
+async def gigachat_similarity_check_command(
+    scan_id: int,
+    query: str,
+    top_k: int = 5,
+    index_type: str = "exact",
+    nprobe: Optional[int] = None,
+    nlist: Optional[int] = None,
+    aggregation: str = "max",
+    codec: str = "float32",
+    pca_dim: Optional[int] = None,
+    rerank: int = 0,
+    mode: str = "hybrid",
+    lexical_threshold: float = 1.0,
+    lexical_candidates: int = 0,
+    fields: Optional[List[str]] = None,
+    snippet_length: int = 200,
+) -> dict:
     """Проверяет схожесть документов с эталонным запросом"""
     # Эта команда может использоваться для мониторинга качества документов
-    return await gigachat_search_command(scan_id, query, top_k)
-
-@register_command(
-    command_name="gigachat_get_stats",
-    args_model=GigaChatPrepareArgs,
-    response_model=GigaChatPrepareResponse,
-    description="Получение статистики по подготовленным эмбеддингам"
-)
+    return await gigachat_search_command(
+        scan_id, query, top_k, index_type, nprobe, nlist, aggregation, codec, pca_dim, rerank,
+        mode, lexical_threshold, lexical_candidates, fields, snippet_length,
+    )
+
 async def gigachat_get_stats_command(scan_id: int, text_column: str = "content") -> dict:
     """Возвращает статистику по эмбеддингам (подготавливает их если нужно)"""
-    return await gigachat_prepare_embeddings_command(scan_id, text_column)
+    manifest = EmbeddingIndex.read_manifest(scan_id)
+    if manifest is None:
+        return await gigachat_prepare_embeddings_command(scan_id, text_column)
+
+    return {
+        "scan_id": scan_id,
+        "embeddings_count": manifest["count"],
+        "valid_documents": manifest.get("valid_documents", manifest["count"]),
+        "message": f"Индекс эмбеддингов из {manifest['documents']} документов, модель {manifest['model']}",
+        "processing_time": 0.0
+    }
+
+async def gigachat_cache_stats_command() -> dict:
+    """Возвращает статистику кэша эмбеддингов"""
+    return get_cache().stats()
 
 # --- Дополнительная команда для тестирования GigaChat ---
-@register_command(
-    command_name="gigachat_test_connection",
-    args_model=GigaChatPrepareArgs,
-    response_model=GigaChatPrepareResponse,
-    description="Тестирование подключения к GigaChat API"
-)
 async def gigachat_test_connection_command(scan_id: int, text_column: str = "content") -> dict:
     """Тестирует подключение к GigaChat API"""
     try:
         service = GigaChatService()
         
-        # Пробуем получить эмбеддинг для тестового запроса
-        test_embedding = service.get_embedding("тестовый запрос")
+        # Тестовый запрос идёт мимо кэша, иначе API проверяется только при первом вызове
+        test_embedding = await asyncio.to_thread(service.get_embedding, "тестовый запрос", use_cache=False)
         
         if np.all(test_embedding == 0):
             raise HTTPException(status_code=500, detail="Не удалось получить эмбеддинг")
@@ -0,0 +1,247 @@
+"""Каталог команд: имя, модели, описание и лимиты без импорта реализаций.
+
+Маршруты строятся по этим метаданным, а модуль с реализацией (selenium,
+sklearn, GigaChat SDK) импортируется при первом вызове команды или фоновым
+прогревом после старта (см. app.core.registry.warm_up_commands).
+"""
+from app.core.commands.models import (
+    ClearTagsArgs,
+    DownloadContractsArgs,
+    ProcessContractsBatchArgs,
+    DownloadCSVArgs,
+    LoadContractsCSVArgs,
+    LoadContractsCSVResponse,
+    ScanResponse,
+    ScanCacheInvalidateArgs,
+    ResultCacheInvalidateArgs,
+    ScanCacheInvalidateResponse,
+    ScanCacheStatsResponse,
+    DownloadResponse,
+    ListFilesArgs,
+    ListFilesResponse,
+    NewDocumentsArgs,
+    NewDocumentsResponse,
+    GigaChatSearchArgs,
+    GigaChatBatchSearchArgs,
+    GigaChatPrepareArgs,
+    GigaChatPrepareEmbeddingsArgs,
+    GigaChatSearchResponse,
+    GigaChatBatchResponse,
+    GigaChatPrepareResponse,
+    GigaChatCacheStatsResponse,
+    PipelineArgs,
+)
+from app.core.pipeline import PipelineResponse
+from app.core.registry import register_lazy_command
+
+# --- Очистка сканов, контракты, файлы и кэши (app.core.commands.clear_tags) ---
+register_lazy_command(
+    "app.core.commands.clear_tags:clear_tags_command",
+    command_name="clear_tags",
+    args_model=ClearTagsArgs,
+    response_model=ScanResponse,
+    description="Очистка тегов в HTML по scan_id",
+    resource="cpu",
+    max_concurrency=2,
+    queue_depth=8,
+    timeout=600,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:clear_tags_stream_command",
+    command_name="clear_tags_stream",
+    args_model=ClearTagsArgs,
+    description="Потоковая очистка тегов по scan_id: NDJSON, одна строка на документ",
+    resource="cpu",
+    max_concurrency=2,
+    queue_depth=8,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:download_contracts_command",
+    command_name="download_contracts",
+    args_model=DownloadContractsArgs,
+    response_model=DownloadResponse,
+    description="Скачивание документов контрактов с zakupki.gov.ru",
+    job=True,
+    resource="browser",
+    max_concurrency=1,
+    queue_depth=4,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:download_csv_command",
+    command_name="download_csv",
+    args_model=DownloadCSVArgs,
+    response_model=DownloadResponse,
+    description="Выгрузка CSV файлов с результатами поиска контрактов",
+    job=True,
+    resource="browser",
+    max_concurrency=1,
+    queue_depth=4,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:load_contracts_csv_command",
+    command_name="load_contracts_csv",
+    args_model=LoadContractsCSVArgs,
+    response_model=LoadContractsCSVResponse,
+    description="Загрузка CSV выгрузки реестра контрактов в Postgres (COPY + слияние)",
+    job=True,
+    max_concurrency=1,
+    queue_depth=4,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:process_contracts_batch_command",
+    command_name="process_contracts_batch",
+    args_model=ProcessContractsBatchArgs,
+    response_model=PipelineResponse,
+    description="Пакетная обработка контрактов: выгрузка CSV -> загрузка в Postgres, параллельно скачивание документов",
+    job=True,
+    max_concurrency=1,
+    queue_depth=2,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:contracts_new_since_command",
+    command_name="contracts_new_since",
+    args_model=NewDocumentsArgs,
+    response_model=NewDocumentsResponse,
+    description="Документы контрактов, скачанные после указанного момента",
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:list_downloaded_files_command",
+    command_name="list_downloaded_files",
+    args_model=ListFilesArgs,
+    response_model=ListFilesResponse,
+    description="Показать список скачанных файлов (фильтры и постраничный вывод по каталогу)",
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:rebuild_file_catalog_command",
+    command_name="rebuild_file_catalog",
+    response_model=DownloadResponse,
+    description="Переиндексировать в каталог файлы, уже лежащие на диске",
+    job=True,
+    max_concurrency=1,
+    queue_depth=1,
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:scan_cache_stats_command",
+    command_name="scan_cache_stats",
+    response_model=ScanCacheStatsResponse,
+    description="Попадания, промахи и занятый объём кэша данных сканов",
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:scan_cache_invalidate_command",
+    command_name="scan_cache_invalidate",
+    args_model=ScanCacheInvalidateArgs,
+    response_model=ScanCacheInvalidateResponse,
+    description="Сброс кэша данных сканов (одного scan_id или целиком)",
+)
+
+register_lazy_command(
+    "app.core.commands.clear_tags:result_cache_invalidate_command",
+    command_name="result_cache_invalidate",
+    args_model=ResultCacheInvalidateArgs,
+    response_model=ScanCacheInvalidateResponse,
+    description="Сброс кэша результатов команд (по scan_id, команде или целиком)",
+)
+
+# --- GigaChat (app.core.commands.GigaChatProcurementSearch) ---
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_prepare_embeddings_command",
+    command_name="gigachat_prepare_embeddings",
+    args_model=GigaChatPrepareEmbeddingsArgs,
+    response_model=GigaChatPrepareResponse,
+    description="Подготовка векторных представлений для документов scan_id",
+    job=True,
+    resource="llm",
+    max_concurrency=1,
+    queue_depth=4,
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_search_command",
+    command_name="gigachat_search",
+    args_model=GigaChatSearchArgs,
+    response_model=GigaChatSearchResponse,
+    description="Семантический поиск по документам scan_id с использованием GigaChat",
+    resource="llm",
+    max_concurrency=8,
+    queue_depth=32,
+    timeout=60,
+    cache_ttl=300,
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_batch_search_command",
+    command_name="gigachat_batch_search",
+    args_model=GigaChatBatchSearchArgs,
+    response_model=GigaChatBatchResponse,
+    description="Пакетный семантический поиск по нескольким запросам",
+    resource="llm",
+    max_concurrency=2,
+    queue_depth=8,
+    timeout=300,
+    cache_ttl=300,
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_similarity_check_command",
+    command_name="gigachat_similarity_check",
+    args_model=GigaChatSearchArgs,
+    response_model=GigaChatSearchResponse,
+    description="Проверка схожести документов с эталонным запросом",
+    resource="llm",
+    max_concurrency=4,
+    queue_depth=16,
+    timeout=60,
+    cache_ttl=300,
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_get_stats_command",
+    command_name="gigachat_get_stats",
+    args_model=GigaChatPrepareArgs,
+    response_model=GigaChatPrepareResponse,
+    description="Получение статистики по подготовленным эмбеддингам",
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_cache_stats_command",
+    command_name="gigachat_cache_stats",
+    response_model=GigaChatCacheStatsResponse,
+    description="Статистика кэша эмбеддингов: попадания, промахи и занятый объём",
+)
+
+register_lazy_command(
+    "app.core.commands.GigaChatProcurementSearch:gigachat_test_connection_command",
+    command_name="gigachat_test_connection",
+    args_model=GigaChatPrepareArgs,
+    response_model=GigaChatPrepareResponse,
+    description="Тестирование подключения к GigaChat API",
+    resource="llm",
+    max_concurrency=1,
+    queue_depth=2,
+    timeout=30,
+)
+
+# --- Конвейеры (app.core.commands.pipeline) ---
+register_lazy_command(
+    "app.core.commands.pipeline:run_pipeline_command",
+    command_name="run_pipeline",
+    args_model=PipelineArgs,
+    response_model=PipelineResponse,
+    description=(
+        "Конвейер из зарегистрированных команд, например clear_tags -> gigachat_prepare_embeddings -> "
+        "gigachat_batch_search: независимые шаги выполняются параллельно, данные скана передаются в памяти"
+    ),
+    job=True,
+    max_concurrency=2,
+    queue_depth=8,
+)
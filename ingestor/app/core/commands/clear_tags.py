@@ -1,355 +1,423 @@
+import json
 import logging
 import os
+import shutil
 import time
 from pathlib import Path
 from fastapi import HTTPException
-from app.core.registry import register_command
-from app.db.clickhouse_client import ClickHouseManager
-from app.parser import clean_html_content, extract_urls_and_files
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from fastapi.responses import StreamingResponse
+from app.core.browser_pool import BrowserPool, get_browser_pool, set_download_folder
+from app.core.contracts import CONTRACT_SEARCH_URL, collect_contract_links, download_contracts, select_contracts
+from app.core.download_manifest import get_download_manifest
+from app.core.download_tracker import DownloadTracker
+from app.core.file_catalog import (
+    CONTRACT_DOCUMENT, REGISTRY_CSV, SCAN_ORIGINAL, SCAN_RESULT, file_entry, get_file_catalog,
+)
+from app.core.html_cleaning import get_html_cleaner
+from app.core.jobs import report_progress
+from app.core.pipeline import (
+    CLEANED_TEXT,
+    RAW_DOCUMENTS,
+    REGISTRY_CSV_FILE,
+    PipelineStep,
+    get_artifact,
+    put_artifact,
+    run_pipeline,
+)
+from app.core.result_cache import get_result_cache
+from app.core.scan_cache import get_scan_cache
+from app.db.contract_loader import CSV_DIR, ContractCSVLoader, resolve_csv_file
+from app.parser import extract_urls_and_files
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
 import asyncio
-import aiohttp
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 
 log = logging.getLogger(__name__)
 
-# --- Модели для команд ---
-class ScanArgs(BaseModel):
-    scan_id: int
+# --- Вспомогательные функции для Selenium ---
+def _browser_pool(headless: bool) -> BrowserPool:
+    """Общий пул браузеров; если он запущен в другом режиме - отдельный временный пул"""
+    pool = get_browser_pool()
+    if headless != pool.headless:
+        pool = BrowserPool(size=pool.size, headless=headless, download_root=pool.download_root / "temporary")
+    return pool
 
-class DownloadContractsArgs(BaseModel):
-    limit: int = Field(5, description="Количество контрактов для обработки")
-    headless: bool = Field(True, description="Запуск браузера в фоновом режиме")
+def _request_csv_export(driver, batch_index: int):
+    """Открывает поиск контрактов и запускает выгрузку CSV варианта batch_index"""
+    wait = WebDriverWait(driver, 20)
 
-class DownloadCSVArgs(BaseModel):
-    batch_index: int = Field(0, description="Индекс батча для выгрузки (0-based)")
-    headless: bool = Field(True, description="Запуск браузера в фоновом режиме")
+    log.info("Открываю страницу поиска контрактов...")
+    driver.get(CONTRACT_SEARCH_URL)
 
-class ScanResponse(BaseModel):
-    scan_id: int
-    result: list
-    message: str = ""
+    # Нажимаем кнопку "Выгрузить результаты поиска"
+    try:
+        download_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.downLoad-search")))
+        driver.execute_script("arguments[0].click();", download_btn)
+        log.info("Нажата кнопка 'Выгрузить результаты поиска'")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Не удалось найти кнопку выгрузки: {e}")
 
-class DownloadResponse(BaseModel):
-    success: bool
-    downloaded_files: List[str]
-    message: str = ""
+    # Выбираем элемент из списка батчей
+    try:
+        items = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.csvDownload")))
+        log.info(f"Найдено {len(items)} вариантов выгрузки")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при выборе варианта выгрузки: {e}")
+    if batch_index >= len(items):
+        raise HTTPException(status_code=400, detail=f"Индекс {batch_index} превышает количество доступных вариантов ({len(items)})")
+
+    driver.execute_script("arguments[0].click();", items[batch_index])
+    log.info(f"Нажата кнопка выгрузки #{batch_index + 1}")
+
+def _add_to_catalog(paths: List[str], kind: str, **fields):
+    """Размеры файлов читаются с диска, а запись в каталог - коммит SQLite: вызывается через asyncio.to_thread"""
+    get_file_catalog().add([file_entry(str(path), kind, **fields) for path in paths])
+
+
+def _write_texts(files: List[Tuple[str, str, str]], scan_id: int):
+    for path, content, _ in files:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    get_file_catalog().add(file_entry(path, kind, scan_id=scan_id) for path, _, kind in files)
+
+
+async def _save_documents(name_dir: str, scan_id: int, start: int, originals: List[str], results: List[str]) -> List[Dict]:
+    """Пишет оригиналы и очищенные документы в отдельном потоке, возвращает записи о файлах"""
+    records = []
+    files = []
+    for offset, (original, result) in enumerate(zip(originals, results)):
+        i = start + offset
+        original_path = os.path.join(name_dir, f"{scan_id}_main_{i}.html")
+        result_path = os.path.join(name_dir, f"{scan_id}_result_{i}.html")
+        files.append((original_path, original, SCAN_ORIGINAL))
+        files.append((result_path, result, SCAN_RESULT))
+        records.append({"index": i, "original_path": original_path, "result_path": result_path, "chars": len(result)})
+    await asyncio.to_thread(_write_texts, files, scan_id)
+    return records
+
+
+async def _clean(contents: List[str], parallel: bool, batch_size: int, max_doc_chars: int):
+    """Очистка вне цикла событий: пачками в пуле процессов или в отдельном потоке"""
+    cleaner = get_html_cleaner()
+    if parallel:
+        return await cleaner.clean(contents, batch_size=batch_size, max_doc_chars=max_doc_chars)
+    return await cleaner.clean_inline(contents, max_doc_chars=max_doc_chars)
 
-# --- Вспомогательные функции для Selenium ---
-def create_driver(headless: bool = True, download_dir: Optional[Path] = None):
-    """Создает и настраивает Chrome WebDriver"""
-    chrome_options = Options()
-    if headless:
-        chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-
-    if download_dir:
-        prefs = {
-            "download.default_directory": str(download_dir.resolve()),
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        }
-        chrome_options.add_experimental_option("prefs", prefs)
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
-    return driver
-
-def set_download_folder(driver, path: Path):
-    """Динамически меняет папку загрузки для Chrome"""
-    driver.execute_cdp_cmd(
-        "Page.setDownloadBehavior",
-        {
-            "behavior": "allow",
-            "downloadPath": str(path.resolve())
-        }
-    )
-    log.info(f"Папка загрузки изменена на: {path}")
-
-def wait_for_file(folder: Path, extension: str = ".csv", timeout: int = 60):
-    """Ждёт появления файла с указанным расширением"""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        files = list(folder.glob(f"*{extension}"))
-        if files:
-            return files[0]
-        time.sleep(1)
-    return None
 
 # --- Команды ---
-@register_command(
-    command_name="clear_tags",
-    args_model=ScanArgs,
-    response_model=ScanResponse,
-    description="Очистка тегов в HTML по scan_id"
-)
-async def clear_tags_command(scan_id: int) -> dict:
+async def clear_tags_command(
+    scan_id: int,
+    parallel: bool = True,
+    batch_size: int = 16,
+    max_doc_chars: int = 2_000_000,
+    summary: bool = False,
+) -> dict:
     """Чистит HTML документ от тегов"""
-    ch_manager = ClickHouseManager(config_path=None)
-
     try:
-        raw_data = ch_manager.get_data_by_scan_id(scan_id)
-        if not raw_data:
+        # В конвейере документы могли быть прочитаны предыдущим шагом;
+        # иначе из ClickHouse (или кэша сканов) читается только колонка content
+        list_contents = get_artifact(RAW_DOCUMENTS, scan_id)
+        if list_contents is None:
+            list_contents = []
+            async for batch in get_scan_cache().aiter_scan(scan_id, columns=("content",)):
+                list_contents.extend(row["content"] for row in batch)
+            put_artifact(RAW_DOCUMENTS, list_contents, scan_id)
+        if not list_contents:
             log.warning(f"Данные не найдены для scan_id={scan_id}")
             raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
 
-        list_contents = [doc.content for doc in raw_data]
-
         # Создаем директорию для результатов
         name_dir = f"data/{scan_id}"
         os.makedirs(name_dir, exist_ok=True)
 
-        # Сохраняем оригинальные файлы
-        for i, doc in enumerate(raw_data):
-            file_path = os.path.join(name_dir, f"{scan_id}_main_{i}.html")
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(doc.content)
-
-        # Очищаем HTML контент
-        parsed_result = clean_html_content(list_contents)
-
-        # Сохраняем очищенные файлы
-        for i, result in enumerate(parsed_result):
-            file_path = os.path.join(name_dir, f"{scan_id}_result_{i}.html")
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(result)
+        # Очищаем HTML контент и сохраняем оригиналы и результаты
+        parsed_result, stats = await _clean(list_contents, parallel, batch_size, max_doc_chars)
+        put_artifact(CLEANED_TEXT, parsed_result, scan_id)
+        files = await _save_documents(name_dir, scan_id, 0, list_contents, parsed_result)
 
         output = {
             "scan_id": scan_id,
-            "result": parsed_result,
-            "message": f"Обработка завершена для scan_id={scan_id}. Обработано {len(parsed_result)} документов."
+            "result": files if summary else parsed_result,
+            "message": f"Обработка завершена для scan_id={scan_id}. Обработано {len(parsed_result)} документов.",
+            "stats": stats,
         }
 
         log.info(f"Обработка завершена для scan_id={scan_id}.")
         return output
 
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при обработке scan_id={scan_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Произошла ошибка: {e}")
 
-@register_command(
-    command_name="download_contracts",
-    args_model=DownloadContractsArgs,
-    response_model=DownloadResponse,
-    description="Скачивание документов контрактов с zakupki.gov.ru"
-)
-async def download_contracts_command(limit: int = 5, headless: bool = True) -> dict:
-    """Скачивает документы контрактов с портала закупок"""
-    BASE_URL = "https://zakupki.gov.ru/epz/contract/search/results.html#"
+async def clear_tags_stream_command(
+    scan_id: int,
+    parallel: bool = True,
+    batch_size: int = 16,
+    max_doc_chars: int = 2_000_000,
+    summary: bool = False,
+) -> StreamingResponse:
+    """Чистит документы окнами и отдаёт результат по мере готовности.
+    В памяти одновременно только одно окно документов (batch_size на процесс пула)."""
+    window = batch_size * (get_html_cleaner().max_workers if parallel else 1)
+    # Скан читается из ClickHouse (или кэша сканов) окнами того же размера, что и очистка
+    batches = get_scan_cache().aiter_scan(scan_id, columns=("content",), batch_size=window)
+    first = await anext(batches, None)
+    if first is None:
+        await batches.aclose()
+        log.warning(f"Данные не найдены для scan_id={scan_id}")
+        raise HTTPException(status_code=404, detail=f"Данные не найдены для scan_id={scan_id}")
+
+    name_dir = f"data/{scan_id}"
+    os.makedirs(name_dir, exist_ok=True)
+
+    async def windows():
+        yield first
+        async for batch in batches:
+            yield batch
+
+    async def records():
+        started = time.perf_counter()
+        total = 0
+        try:
+            async for batch in windows():
+                contents = [row["content"] for row in batch]
+                cleaned, _ = await _clean(contents, parallel, batch_size, max_doc_chars)
+                files = await _save_documents(name_dir, scan_id, total, contents, cleaned)
+                for record, text in zip(files, cleaned):
+                    record = {"type": "document", **record}
+                    if not summary:
+                        record["content"] = text
+                    yield json.dumps(record, ensure_ascii=False) + "\n"
+                total += len(files)
+        except Exception as e:
+            # Статус ответа уже отправлен, поэтому ошибка передаётся последней записью
+            log.error(f"Ошибка при потоковой обработке scan_id={scan_id}: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+            return
+        finally:
+            # И при ошибке, и при отключении клиента (GeneratorExit / отмена задачи)
+            await batches.aclose()
+        elapsed = time.perf_counter() - started
+        log.info(f"Потоковая обработка scan_id={scan_id} завершена: {total} документов за {elapsed:.2f} с")
+        yield json.dumps(
+            {"type": "summary", "scan_id": scan_id, "documents": total, "seconds": round(elapsed, 4)},
+            ensure_ascii=False,
+        ) + "\n"
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+async def download_contracts_command(
+    limit: int = 5, headless: bool = True, per_host: int = 4, retries: int = 3, recheck: bool = False
+) -> dict:
+    """Скачивает документы контрактов с портала закупок.
+    Браузеры общего пула находят ссылки на документы, файлы качаются напрямую по HTTP.
+    Журнал загрузок исключает уже скачанные контракты и документы."""
     ROOT_DIR = Path("contracts_docs")
     ROOT_DIR.mkdir(exist_ok=True)
 
+    pool = _browser_pool(headless)
+
+    manifest = get_download_manifest()
     downloaded_files = []
 
     try:
-        # Создаем драйвер
-        driver = create_driver(headless=headless)
-        wait = WebDriverWait(driver, 30)
-
-        log.info("Загружаем страницу поиска контрактов...")
-        driver.get(BASE_URL)
-
-        # Нажимаем кнопку выгрузки CSV
         try:
-            download_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.downLoad-search")))
-            driver.execute_script("arguments[0].click();", download_btn)
-            log.info("Кнопка выгрузки CSV нажата")
-            time.sleep(5)
-        except Exception as e:
-            log.warning(f"Не удалось нажать кнопку выгрузки CSV: {e}")
-
-        # Находим ссылки на контракты
-        try:
-            elems = wait.until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href*='/epz/rdik/card/info.html']"))
-            )
+            all_links = await pool.run(lambda worker: collect_contract_links(worker.driver, CONTRACT_SEARCH_URL, None))
         except Exception as e:
             log.error(f"Не удалось найти ссылки на контракты: {e}")
-            driver.quit()
             raise HTTPException(status_code=500, detail=f"Не удалось найти контракты: {e}")
+        contract_links, skipped = await asyncio.to_thread(select_contracts, all_links, manifest, limit, recheck)
+        report_progress(contracts_total=len(contract_links), contracts_done=0, files=0)
+
+        done = 0
+        new = 0
+        failed = 0
+        async for contract in download_contracts(
+            pool, contract_links, ROOT_DIR, per_host=per_host, retries=retries, manifest=manifest
+        ):
+            done += 1
+            downloaded_files.extend(contract.files)
+            await asyncio.to_thread(_add_to_catalog, contract.new_files, CONTRACT_DOCUMENT, contract=contract.number)
+            new += len(contract.new_files)
+            failed += sum(not result.ok for result in contract.results)
+            report_progress(contracts_done=done, files=len(downloaded_files), new_files=new, failed_files=failed)
 
-        contract_links = list({el.get_attribute("href") for el in elems if el.get_attribute("href")})
-        log.info(f"Найдено контрактов: {len(contract_links)}")
-        contract_links = contract_links[:limit]
-
-        # Обрабатываем контракты
-        for idx, url in enumerate(contract_links, 1):
-            log.info(f"[{idx}] Открываем контракт: {url}")
-            driver.get(url)
-
-            # Создаем папку для контракта
-            contract_number = url.split("contractRegNum=")[-1]
-            contract_dir = ROOT_DIR / contract_number
-            contract_dir.mkdir(exist_ok=True)
-            log.info(f"Создана папка: {contract_dir}")
-
-            # Устанавливаем папку загрузки
-            set_download_folder(driver, contract_dir)
-
-            # Ищем документы для скачивания
-            try:
-                zip_links = WebDriverWait(driver, 20).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href*='filestore/public/1.0/download/rdik/file.html']"))
-                )
-                log.info(f"Найдено документов: {len(zip_links)}")
-            except Exception:
-                log.warning("Документы не найдены для контракта")
-                continue
-
-            # Скачиваем файлы
-            for i, el in enumerate(zip_links, 1):
-                name = el.text.strip() or f"doc_{i}.zip"
-                log.info(f"Скачиваем {i}/{len(zip_links)}: {name}")
-                try:
-                    driver.execute_script("arguments[0].click();", el)
-                    time.sleep(2)
-                except Exception as e:
-                    log.error(f"Ошибка скачивания {name}: {e}")
-
-            # Ждём завершения загрузки
-            while any(f.suffix == ".crdownload" for f in contract_dir.iterdir()):
-                log.info("Ждём завершения загрузки...")
-                time.sleep(1)
-
-            # Добавляем скачанные файлы в результат
-            contract_files = [str(f) for f in contract_dir.iterdir() if f.is_file()]
-            downloaded_files.extend(contract_files)
-            log.info(f"Контракт {contract_number} обработан. Файлов: {len(contract_files)}")
-
-        driver.quit()
         log.info("Все контракты обработаны!")
 
         return {
             "success": True,
             "downloaded_files": downloaded_files,
-            "message": f"Успешно скачано {len(downloaded_files)} файлов из {len(contract_links)} контрактов"
+            "message": f"Успешно скачано {new} новых файлов из {len(contract_links)} контрактов "
+            f"(всего файлов {len(downloaded_files)}, пропущено готовых контрактов {skipped})"
+            + (f", не скачано {failed}" if failed else "")
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при скачивании контрактов: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка скачивания контрактов: {e}")
+    finally:
+        if pool is not get_browser_pool():
+            await pool.close()
 
-@register_command(
-    command_name="download_csv",
-    args_model=DownloadCSVArgs,
-    response_model=DownloadResponse,
-    description="Выгрузка CSV файлов с результатами поиска контрактов"
-)
 async def download_csv_command(batch_index: int = 0, headless: bool = True) -> dict:
-    """Выгружает CSV файлы с результатами поиска контрактов"""
-    CSV_DIR = Path("contracts_csv")
+    """Выгружает CSV файлы с результатами поиска контрактов.
+    Завершение загрузки отслеживается по событиям файловой системы, без опроса папки."""
     CSV_DIR.mkdir(exist_ok=True)
 
+    pool = _browser_pool(headless)
     try:
-        # Создаем драйвер с указанием папки для загрузки
-        driver = create_driver(headless=headless, download_dir=CSV_DIR)
-        wait = WebDriverWait(driver, 20)
-
-        log.info("Открываю страницу поиска контрактов...")
-        driver.get("https://zakupki.gov.ru/epz/contract/search/results.html#")
-
-        # Нажимаем кнопку "Выгрузить результаты поиска"
-        try:
-            download_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.downLoad-search")))
-            driver.execute_script("arguments[0].click();", download_btn)
-            log.info("Нажата кнопка 'Выгрузить результаты поиска'")
-        except Exception as e:
-            driver.quit()
-            raise HTTPException(status_code=500, detail=f"Не удалось найти кнопку выгрузки: {e}")
+        # Браузер качает в свою папку, поэтому параллельные выгрузки не путают файлы;
+        # наблюдение запускается до клика, чтобы не пропустить быстро скачанный файл
+        async with pool.acquire() as worker, DownloadTracker(worker.download_dir) as tracker:
+            set_download_folder(worker.driver, worker.download_dir)
+            await asyncio.to_thread(_request_csv_export, worker.driver, batch_index)
 
-        # Выбираем элемент из списка батчей
-        try:
-            items = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.csvDownload")))
-            log.info(f"Найдено {len(items)} вариантов выгрузки")
-            
-            if batch_index >= len(items):
-                driver.quit()
-                raise HTTPException(status_code=400, detail=f"Индекс {batch_index} превышает количество доступных вариантов ({len(items)})")
-
-            item = items[batch_index]
-            driver.execute_script("arguments[0].click();", item)
-            log.info(f"Нажата кнопка выгрузки #{batch_index + 1}")
-        except Exception as e:
-            driver.quit()
-            raise HTTPException(status_code=500, detail=f"Ошибка при выборе варианта выгрузки: {e}")
+            # Ждем завершения загрузки
+            report_progress(stage="waiting_for_file")
+            downloaded_file = await tracker.wait_for(suffix=".csv", timeout=120)
 
-        # Ждем завершения загрузки
-        downloaded_file = wait_for_file(CSV_DIR, ".csv", timeout=120)
-        
-        if downloaded_file:
-            log.info(f"Файл успешно скачан: {downloaded_file}")
-            driver.quit()
-            
-            return {
-                "success": True,
-                "downloaded_files": [str(downloaded_file)],
-                "message": f"CSV файл успешно скачан: {downloaded_file.name}"
-            }
-        else:
-            driver.quit()
+        if downloaded_file is None:
             raise HTTPException(status_code=500, detail="Не удалось дождаться загрузки CSV файла")
+        downloaded_file = Path(await asyncio.to_thread(shutil.move, str(downloaded_file), CSV_DIR / downloaded_file.name))
+
+        log.info(f"Файл успешно скачан: {downloaded_file}")
+        await asyncio.to_thread(_add_to_catalog, [downloaded_file], REGISTRY_CSV)
+        put_artifact(REGISTRY_CSV_FILE, str(downloaded_file))
+        return {
+            "success": True,
+            "downloaded_files": [str(downloaded_file)],
+            "message": f"CSV файл успешно скачан: {downloaded_file.name}"
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Ошибка при выгрузке CSV: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка выгрузки CSV: {e}")
+    finally:
+        if pool is not get_browser_pool():
+            await pool.close()
+
+async def load_contracts_csv_command(path: Optional[str] = None, chunk_size: int = 10000) -> dict:
+    """Потоково разбирает CSV и загружает договоры в таблицу contract"""
+    if path is not None:
+        # Имя приходит из запроса: читаются только файлы из contracts_csv
+        try:
+            path = str(resolve_csv_file(path))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"Файл не найден: {Path(path).name}")
+    else:
+        # В конвейере - файл, выгруженный шагом download_csv
+        path = get_artifact(REGISTRY_CSV_FILE)
+    if path is None:
+        files = sorted(CSV_DIR.glob("*.csv"), key=lambda f: f.stat().st_mtime)
+        if not files:
+            raise HTTPException(status_code=404, detail="В contracts_csv нет CSV файлов")
+        path = str(files[-1])
 
-@register_command(
-    command_name="process_contracts_batch",
-    args_model=DownloadContractsArgs,
-    response_model=DownloadResponse,
-    description="Пакетная обработка контрактов (скачивание документов)"
-)
-async def process_contracts_batch_command(limit: int = 5, headless: bool = True) -> dict:
-    """Пакетная обработка контрактов - объединяет несколько операций"""
-    # Здесь можно добавить комплексную обработку,
-    # например: скачать CSV -> проанализировать -> скачать документы контрактов
-    return await download_contracts_command(limit, headless)
+    try:
+        return await ContractCSVLoader(chunk_size=chunk_size).load(Path(path), on_progress=report_progress)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.error(f"Ошибка загрузки {path}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка загрузки CSV: {e}")
+
+async def process_contracts_batch_command(
+    limit: int = 5,
+    headless: bool = True,
+    per_host: int = 4,
+    retries: int = 3,
+    recheck: bool = False,
+    batch_index: int = 0,
+    load_csv: bool = True,
+) -> dict:
+    """Пакетная обработка контрактов - конвейер из download_csv, load_contracts_csv и download_contracts.
+    Скачивание документов не ждёт выгрузки реестра; загружается именно выгруженный файл."""
+    steps = [
+        PipelineStep(
+            id="documents",
+            command="download_contracts",
+            args={"limit": limit, "headless": headless, "per_host": per_host, "retries": retries, "recheck": recheck},
+        ),
+    ]
+    if load_csv:
+        steps += [
+            PipelineStep(id="csv", command="download_csv", args={"batch_index": batch_index, "headless": headless}),
+            PipelineStep(id="load", command="load_contracts_csv", after=["csv"]),
+        ]
+    return await run_pipeline(steps)
+
+async def contracts_new_since_command(since: datetime, limit: int = 1000) -> dict:
+    """Выборка из журнала загрузок по времени скачивания"""
+    manifest = get_download_manifest()
+    documents = manifest.new_since(since.timestamp(), limit)
+    return {"documents": documents, "count": len(documents), "manifest": manifest.stats()}
 
 # Дополнительные команды могут быть добавлены здесь
-@register_command(
-    command_name="list_downloaded_files",
-    args_model=ScanArgs,
-    response_model=DownloadResponse,
-    description="Показать список скачанных файлов"
-)
-async def list_downloaded_files_command(scan_id: int) -> dict:
-    """Показывает список скачанных файлов для указанного scan_id"""
+async def list_downloaded_files_command(
+    scan_id: Optional[int] = None,
+    contract: Optional[str] = None,
+    kind: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    summary: bool = True,
+) -> dict:
+    """Показывает скачанные файлы из каталога: по scan_id, контракту, типу и дате"""
     try:
-        scan_dir = Path(f"data/{scan_id}")
-        contracts_dir = Path("contracts_docs")
-        csv_dir = Path("contracts_csv")
-        
-        all_files = []
-        
-        # Собираем файлы из всех директорий
-        if scan_dir.exists():
-            all_files.extend([str(f) for f in scan_dir.rglob("*") if f.is_file()])
-        
-        if contracts_dir.exists():
-            all_files.extend([str(f) for f in contracts_dir.rglob("*") if f.is_file()])
-        
-        if csv_dir.exists():
-            all_files.extend([str(f) for f in csv_dir.rglob("*") if f.is_file()])
-        
+        catalog = get_file_catalog()
+        filters = {
+            "scan_id": scan_id,
+            "contract": contract,
+            "kind": kind,
+            "since": since.timestamp() if since else None,
+            "until": until.timestamp() if until else None,
+        }
+        # SQLite и проверка файлов на диске - в отдельном потоке
+        files, next_cursor = await asyncio.to_thread(catalog.list, cursor=cursor, limit=limit, **filters)
+        totals = await asyncio.to_thread(catalog.summary, **filters) if summary and cursor is None else None
+
         return {
             "success": True,
-            "downloaded_files": all_files,
-            "message": f"Найдено {len(all_files)} файлов"
+            "downloaded_files": [f["path"] for f in files],
+            "files": files,
+            "next_cursor": next_cursor,
+            "summary": totals,
+            "message": f"Найдено {totals['files'] if totals else len(files)} файлов"
         }
         
     except Exception as e:
         log.error(f"Ошибка при получении списка файлов: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка получения списка файлов: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка получения списка файлов: {e}")
+
+async def rebuild_file_catalog_command() -> dict:
+    """Обходит data, contracts_docs и contracts_csv один раз и заполняет каталог"""
+    added = await asyncio.to_thread(get_file_catalog().rebuild)
+    return {"success": True, "downloaded_files": [], "message": f"В каталоге {added} файлов"}
+
+async def scan_cache_stats_command() -> dict:
+    """Возвращает счётчики кэша данных сканов"""
+    return get_scan_cache().stats()
+
+async def scan_cache_invalidate_command(scan_id: Optional[int] = None) -> dict:
+    """Удаляет данные скана из кэша, следующая команда прочитает их из ClickHouse заново"""
+    removed = get_scan_cache().invalidate(scan_id)
+    target = "весь кэш" if scan_id is None else f"scan_id={scan_id}"
+    return {"removed": removed, "message": f"Сброшено записей: {removed} ({target})"}
+
+async def result_cache_invalidate_command(scan_id: Optional[int] = None, command: Optional[str] = None) -> dict:
+    """Удаляет сохранённые результаты, следующий запрос выполнит команду заново"""
+    removed = get_result_cache().invalidate(scan_id=scan_id, command=command)
+    target = ", ".join(f"{name}={value}" for name, value in (("scan_id", scan_id), ("command", command)) if value is not None)
+    return {"removed": removed, "message": f"Сброшено результатов: {removed} ({target or 'весь кэш'})"}
@@ -0,0 +1,201 @@
+"""Модели аргументов и ответов команд.
+
+Модуль не тянет тяжёлых зависимостей (selenium, sklearn, GigaChat SDK): по нему
+строятся маршруты и схема API до импорта реализаций команд (см. catalog).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.pipeline import PipelineStep, check_pipeline
+
+# --- Модели для команд ---
+class ScanArgs(BaseModel):
+    scan_id: int
+
+class ClearTagsArgs(ScanArgs):
+    parallel: bool = Field(True, description="Чистить пачками в пуле процессов по числу ядер")
+    batch_size: int = Field(16, gt=0, description="Документов в одной пачке для процесса")
+    max_doc_chars: int = Field(2_000_000, gt=0, description="Документы длиннее обрезаются перед очисткой")
+    summary: bool = Field(False, description="Вернуть пути к файлам и размеры вместо очищенного текста")
+
+class DownloadContractsArgs(BaseModel):
+    limit: int = Field(5, description="Количество контрактов для обработки")
+    headless: bool = Field(True, description="Запуск браузера в фоновом режиме")
+    per_host: int = Field(4, gt=0, description="Одновременных скачиваний с одного хоста")
+    retries: int = Field(3, ge=0, description="Повторов скачивания файла при сетевых ошибках")
+    recheck: bool = Field(False, description="Заново обойти и уже полностью скачанные контракты")
+
+class ProcessContractsBatchArgs(DownloadContractsArgs):
+    batch_index: int = Field(0, description="Индекс батча выгрузки реестра (0-based)")
+    load_csv: bool = Field(True, description="Выгрузить CSV реестра и загрузить его в Postgres")
+
+class DownloadCSVArgs(BaseModel):
+    batch_index: int = Field(0, description="Индекс батча для выгрузки (0-based)")
+    headless: bool = Field(True, description="Запуск браузера в фоновом режиме")
+
+class LoadContractsCSVArgs(BaseModel):
+    path: Optional[str] = Field(None, description="Имя CSV файла в contracts_csv (без каталогов); по умолчанию самый новый файл")
+    chunk_size: int = Field(10000, gt=0, description="Строк в одной пачке COPY")
+
+class LoadContractsCSVResponse(BaseModel):
+    file: str
+    encoding: str
+    delimiter: str
+    columns: Dict[str, List[str]]
+    rows: int
+    loaded: int
+    inserted: int
+    updated: int
+    rejected: int
+    rejected_samples: List[Dict[str, Any]]
+    seconds: float
+    rows_per_sec: float
+
+class ScanResponse(BaseModel):
+    scan_id: int
+    result: list
+    message: str = ""
+    stats: Dict[str, Any] = {}
+
+class ScanCacheInvalidateArgs(BaseModel):
+    scan_id: Optional[int] = Field(None, description="Скан для сброса; без scan_id кэш очищается целиком")
+
+class ResultCacheInvalidateArgs(BaseModel):
+    scan_id: Optional[int] = Field(None, description="Скан, результаты по которому сбрасываются")
+    command: Optional[str] = Field(None, description="Команда; без scan_id и command кэш очищается целиком")
+
+class ScanCacheInvalidateResponse(BaseModel):
+    removed: int
+    message: str = ""
+
+class ScanCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    evicted: int
+    expired: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+class DownloadResponse(BaseModel):
+    success: bool
+    downloaded_files: List[str]
+    message: str = ""
+
+class ListFilesArgs(BaseModel):
+    scan_id: Optional[int] = Field(None, description="Файлы очистки этого скана")
+    contract: Optional[str] = Field(None, description="Документы контракта с этим реестровым номером")
+    kind: Optional[str] = Field(None, description="scan_original, scan_result, contract_document или registry_csv")
+    since: Optional[datetime] = Field(None, description="Файлы, записанные начиная с этого момента")
+    until: Optional[datetime] = Field(None, description="Файлы, записанные до этого момента")
+    cursor: Optional[int] = Field(None, description="next_cursor из предыдущей страницы")
+    limit: int = Field(100, gt=0, le=10000)
+    summary: bool = Field(True, description="Посчитать число и объём файлов по фильтру (только для первой страницы)")
+
+class ListFilesResponse(DownloadResponse):
+    files: List[Dict[str, Any]] = []
+    next_cursor: Optional[int] = None
+    summary: Optional[Dict[str, Any]] = None
+
+class NewDocumentsArgs(BaseModel):
+    since: datetime = Field(..., description="Документы, скачанные после этого момента")
+    limit: int = Field(1000, gt=0, le=100000)
+
+class NewDocumentsResponse(BaseModel):
+    documents: List[Dict[str, Any]]
+    count: int
+    manifest: Dict[str, int] = {}
+
+# --- Модели для GigaChat команд ---
+class VectorIndexArgs(BaseModel):
+    index_type: str = Field("exact", description="Векторный индекс: exact (точный перебор) или ivf (приближённый)")
+    nprobe: Optional[int] = Field(
+        None, description="IVF: число просматриваемых списков, больше - выше recall и задержка; по умолчанию 32 (recall@10 около 0.95)"
+    )
+    nlist: Optional[int] = Field(None, description="IVF: число списков при построении индекса")
+    aggregation: str = Field("max", description="Скор документа по его чанкам: max или mean")
+    codec: str = Field("float32", description="Хранение векторов для exact: float32, float16 или int8")
+    pca_dim: Optional[int] = Field(None, description="Понижение размерности PCA перед сжатием")
+    rerank: int = Field(0, description="Сколько лучших кандидатов пересчитать точно по float32 векторам")
+
+class SearchOptionsArgs(VectorIndexArgs):
+    mode: str = Field("hybrid", description="hybrid (сначала BM25, затем эмбеддинги), dense или lexical")
+    lexical_threshold: float = Field(
+        1.0, ge=0, le=1, description="hybrid: отвечать по BM25, если лучший документ покрывает эту долю слов запроса"
+    )
+    lexical_candidates: int = Field(
+        0, ge=0, description="hybrid: ранжировать эмбеддингами только столько лучших по BM25 документов (0 - все)"
+    )
+    fields: Optional[List[str]] = Field(
+        None, description="Поля документа в ответе; по умолчанию все, кроме текстовой колонки"
+    )
+    snippet_length: int = Field(200, ge=0, description="Длина фрагмента текста вокруг совпадения, 0 - без фрагмента")
+
+class GigaChatSearchArgs(SearchOptionsArgs):
+    scan_id: int
+    query: str = Field(..., description="Поисковый запрос")
+    top_k: int = Field(5, description="Количество возвращаемых результатов")
+
+class GigaChatBatchSearchArgs(SearchOptionsArgs):
+    scan_id: int
+    queries: List[str] = Field(..., description="Список поисковых запросов")
+    top_k: int = Field(3, description="Количество возвращаемых результатов на запрос")
+
+class GigaChatPrepareArgs(BaseModel):
+    scan_id: int
+    text_column: str = Field("content", description="Название колонки с текстом")
+
+class GigaChatPrepareEmbeddingsArgs(GigaChatPrepareArgs):
+    force: bool = Field(False, description="Пересчитать все эмбеддинги, не используя сохранённый индекс")
+    chunk_size: int = Field(500, gt=0, description="Длина окна (символов) для эмбеддинга чанка")
+    chunk_overlap: int = Field(100, ge=0, description="Перекрытие соседних окон (символов)")
+    max_chunks: int = Field(8, gt=0, description="Максимум чанков (векторов) на документ")
+
+    @model_validator(mode="after")
+    def _check_overlap(self):
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap должен быть меньше chunk_size")
+        return self
+
+class GigaChatSearchResponse(BaseModel):
+    scan_id: int
+    query: str
+    results: List[Dict[str, Any]]
+    processing_time: float
+
+class GigaChatBatchResponse(BaseModel):
+    scan_id: int
+    results: Dict[str, List[Dict[str, Any]]]
+    processing_time: float
+
+class GigaChatPrepareResponse(BaseModel):
+    scan_id: int
+    embeddings_count: int
+    valid_documents: int
+    message: str
+    reused: int = 0
+    added: int = 0
+    removed: int = 0
+
+class GigaChatCacheStatsResponse(BaseModel):
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    evicted: int
+    memory_entries: int
+    memory_bytes: int
+    disk_entries: int
+    disk_bytes: int
+
+# --- Модели конвейера ---
+class PipelineArgs(BaseModel):
+    scan_id: Optional[int] = Field(None, description="Подставляется в шаги, у команд которых есть scan_id")
+    steps: List[PipelineStep] = Field(..., description="Шаги конвейера; порядок задаётся полями after")
+
+    @model_validator(mode="after")
+    def _check_graph(self):
+        # Ошибки графа и аргументов шагов видны сразу, а не после постановки в очередь
+        check_pipeline(self.steps, self.scan_id)
+        return self
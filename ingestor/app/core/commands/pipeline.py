@@ -0,0 +1,8 @@
+from typing import List, Optional
+
+from app.core.pipeline import PipelineStep, run_pipeline
+
+
+async def run_pipeline_command(steps: List[dict], scan_id: Optional[int] = None) -> dict:
+    """Выполняет граф шагов и возвращает результат и время каждого шага"""
+    return await run_pipeline([PipelineStep(**step) for step in steps], scan_id=scan_id)
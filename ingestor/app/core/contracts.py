@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.core.browser_pool import BrowserPool, BrowserWorker
+from app.core.download_manifest import DownloadManifest
+from app.core.http_downloader import DownloadResult, DownloadTask, HttpDownloader
+
+log = logging.getLogger(__name__)
+
+CONTRACT_SEARCH_URL = "https://zakupki.gov.ru/epz/contract/search/results.html#"
+CONTRACT_LINK_SELECTOR = "a[href*='/epz/rdik/card/info.html']"
+CONTRACT_FILE_SELECTOR = "a[href*='filestore/public/1.0/download/rdik/file.html']"
+
+
+@dataclass
+class ContractDocuments:
+    """Ссылки на документы контракта, найденные браузером, и куки его сессии"""
+    number: str
+    url: str
+    documents: List[Dict[str, str]] = field(default_factory=list)
+    cookies: List[Dict[str, Any]] = field(default_factory=list)
+    user_agent: Optional[str] = None
+
+
+@dataclass
+class ContractResult:
+    number: str
+    url: str
+    results: List[DownloadResult] = field(default_factory=list)
+    error: Optional[str] = None
+    changed: bool = True
+
+    @property
+    def files(self) -> List[str]:
+        return [result.path for result in self.results if result.ok]
+
+    @property
+    def new_files(self) -> List[str]:
+        return [result.path for result in self.results if result.ok and not result.skipped]
+
+
+def contract_number(url: str) -> str:
+    return url.split("contractRegNum=")[-1]
+
+
+def collect_contract_links(
+    driver, search_url: str = CONTRACT_SEARCH_URL, limit: Optional[int] = 5, timeout: int = 30
+) -> List[str]:
+    """Ссылки на карточки контрактов со страницы поиска (все при limit=None)"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    log.info("Загружаем страницу поиска контрактов...")
+    driver.get(search_url)
+    elems = WebDriverWait(driver, timeout).until(
+        EC.presence_of_all_elements_located((By.CSS_SELECTOR, CONTRACT_LINK_SELECTOR))
+    )
+    links = list(dict.fromkeys(el.get_attribute("href") for el in elems if el.get_attribute("href")))
+    log.info(f"Найдено контрактов: {len(links)}")
+    return links[:limit]
+
+
+def select_contracts(
+    links: List[str], manifest: DownloadManifest, limit: int, recheck: bool = False
+) -> Tuple[List[str], int]:
+    """Первые limit контрактов, ещё не скачанных полностью, и число пропущенных готовых;
+    recheck - перепроверить и известные"""
+    complete: Set[str] = set()
+    if not recheck:
+        complete = manifest.complete_contracts(contract_number(url) for url in links)
+        if complete:
+            log.info(f"Пропущено уже скачанных контрактов: {len(complete)}")
+        links = [url for url in links if contract_number(url) not in complete]
+    return links[:limit], len(complete)
+
+
+def collect_contract_documents(worker: BrowserWorker, url: str, timeout: int = 20) -> ContractDocuments:
+    """Открывает карточку контракта и собирает ссылки на документы; сами файлы браузер не качает"""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver = worker.driver
+    log.info(f"[браузер #{worker.index}] Открываем контракт: {url}")
+    driver.get(url)
+    found = ContractDocuments(number=contract_number(url), url=url)
+    try:
+        elems = WebDriverWait(driver, timeout).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, CONTRACT_FILE_SELECTOR))
+        )
+    except TimeoutException:
+        log.warning(f"Документы не найдены для контракта {found.number}")
+        return found
+
+    for i, el in enumerate(elems, 1):
+        href = el.get_attribute("href")
+        if href:
+            found.documents.append({"url": href, "name": el.text.strip() or f"doc_{i}.zip"})
+    found.cookies = driver.get_cookies()
+    found.user_agent = driver.execute_script("return navigator.userAgent")
+    log.info(f"Контракт {found.number}: найдено документов {len(found.documents)}")
+    return found
+
+
+async def download_contracts(
+    pool: BrowserPool,
+    links: List[str],
+    root_dir: Path,
+    per_host: int = 4,
+    retries: int = 3,
+    manifest: Optional[DownloadManifest] = None,
+) -> AsyncIterator[ContractResult]:
+    """Браузеры пула только находят ссылки, файлы качаются через aiohttp с куками браузера.
+
+    Браузер освобождается сразу после обхода карточки, поэтому скачивание документов
+    идёт параллельно с обходом следующих контрактов. С manifest готовые документы
+    не качаются повторно, а оборванные докачиваются. Результаты - по мере готовности.
+    """
+    async with HttpDownloader(per_host=per_host, retries=retries) as downloader:
+
+        async def process(url: str) -> ContractResult:
+            try:
+                found = await pool.run(collect_contract_documents, url)
+            except Exception as e:
+                log.error(f"Ошибка обработки контракта {url}: {e}")
+                return ContractResult(number=contract_number(url), url=url, error=str(e))
+            downloader.add_cookies(found.cookies)
+            if found.user_agent:
+                downloader.headers["User-Agent"] = found.user_agent
+            directory = root_dir / found.number
+            urls = [doc["url"] for doc in found.documents]
+            if manifest is None:
+                changed, done = True, []
+                tasks = [DownloadTask(url=doc_url, directory=directory) for doc_url in urls]
+            else:
+                # Журнал - SQLite и проверки файлов на диске: вызовы идут в потоке, не в цикле событий
+                changed = await asyncio.to_thread(manifest.record_contract, found.number, url, urls)
+                tasks, done = await asyncio.to_thread(manifest.plan, found.number, directory, urls)
+
+            results = await downloader.fetch_all(tasks)
+            if manifest is not None:
+                await asyncio.to_thread(
+                    manifest.record_downloads,
+                    found.number,
+                    results,
+                    directory,
+                    complete=bool(urls) and all(r.ok for r in results),
+                )
+
+            contract = ContractResult(number=found.number, url=url, results=done + results, changed=changed)
+            log.info(
+                f"Контракт {found.number} обработан. Скачано файлов: {len(contract.new_files)} из {len(tasks)}, "
+                f"уже было: {len(done)}"
+            )
+            return contract
+
+        pending = [asyncio.ensure_future(process(url)) for url in links]
+        try:
+            for done in asyncio.as_completed(pending):
+                yield await done
+        finally:
+            for task in pending:
+                task.cancel()
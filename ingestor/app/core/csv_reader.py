@@ -0,0 +1,69 @@
+import codecs
+import csv
+import io
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+SAMPLE_BYTES = 64 * 1024
+DELIMITERS = ";,\t|"
+
+Row = Tuple[int, List[str]]
+
+
+def detect_encoding(sample: bytes) -> str:
+    """utf-8 (с BOM или без), иначе cp1251 - кодировка выгрузок ЕИС"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Неполный многобайтовый символ в конце выборки ошибкой не считается
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def detect_delimiter(text: str) -> str:
+    """Разделитель по первым строкам; при неудаче - тот, что чаще встречается в заголовке"""
+    lines = text.splitlines()
+    sample = "\n".join(lines[:50])
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        header = lines[0] if lines else ""
+        return max(DELIMITERS, key=header.count)
+
+
+class CSVStream:
+    """Потоковое чтение большого CSV пачками строк с автоопределением кодировки и разделителя.
+
+    В памяти одновременно только одна пачка; номера строк сохраняются для отчёта
+    об отбракованных строках.
+    """
+
+    def __init__(self, path: Path, encoding: Optional[str] = None, delimiter: Optional[str] = None):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            sample = f.read(SAMPLE_BYTES)
+        self.encoding = encoding or detect_encoding(sample)
+        text = sample.decode(self.encoding, errors="ignore")
+        self.delimiter = delimiter or detect_delimiter(text)
+        self.header = [name.strip() for name in next(csv.reader(io.StringIO(text), delimiter=self.delimiter), [])]
+        log.info(f"{self.path.name}: кодировка {self.encoding}, разделитель {self.delimiter!r}")
+
+    def chunks(self, chunk_size: int = 10000) -> Iterator[List[Row]]:
+        with open(self.path, encoding=self.encoding, errors="replace", newline="") as f:
+            reader = csv.reader(f, delimiter=self.delimiter)
+            next(reader, None)
+            chunk: List[Row] = []
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                chunk.append((reader.line_num, row))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+FIELDS_FILE = "fields.json"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _column_kind(values: List[Any]) -> str:
+    """Тип колонки: int64/float64 - массив NumPy, text - строки, json - всё остальное"""
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in values):
+        return "int64"
+    if all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool) for v in values):
+        return "float64"
+    if all(isinstance(v, str) for v in values):
+        return "text"
+    return "json"
+
+
+def _write_file(path: Path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class DocumentStore:
+    """Колоночное хранилище документов скана вне кучи Python.
+
+    Числовые поля - массивы .npy, текстовые - один UTF-8 буфер на поле и массив
+    границ offsets (n + 1); буферы открываются через mmap, и в память попадают
+    только строки документов, которые реально возвращаются в ответе.
+    """
+
+    def __init__(self, path: Path, count: int, kinds: Dict[str, str], columns: Dict[str, tuple]):
+        self.path = path
+        self.count = count
+        self.kinds = kinds
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.kinds)
+
+    @classmethod
+    def write(cls, path: Path, records: List[Dict[str, Any]]):
+        """Записывает документы в папку path (она должна быть новой)"""
+        path.mkdir(parents=True, exist_ok=False)
+        names = list(dict.fromkeys(name for record in records for name in record))
+        kinds = {}
+        for number, name in enumerate(names):
+            values = [record.get(name) for record in records]
+            kind = _column_kind(values)
+            kinds[name] = kind
+            stem = path / f"field_{number:03d}"
+            if kind in ("int64", "float64"):
+                with open(stem.with_suffix(".npy"), "wb") as f:
+                    np.save(f, np.asarray(values, dtype=kind))
+                continue
+            if kind == "json":
+                values = [json.dumps(v, ensure_ascii=False) for v in values]
+            encoded = [v.encode("utf-8") for v in values]
+            offsets = np.concatenate([[0], np.cumsum([len(v) for v in encoded])]).astype(np.int64)
+            _write_file(stem.with_suffix(".bytes"), b"".join(encoded))
+            with open(stem.with_suffix(".offsets.npy"), "wb") as f:
+                np.save(f, offsets)
+        _write_file(
+            path / FIELDS_FILE,
+            json.dumps({"count": len(records), "fields": kinds}, ensure_ascii=False).encode("utf-8"),
+        )
+
+    @classmethod
+    def open(cls, path: Path) -> "DocumentStore":
+        with open(path / FIELDS_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        columns = {}
+        for number, (name, kind) in enumerate(meta["fields"].items()):
+            stem = path / f"field_{number:03d}"
+            if kind in ("int64", "float64"):
+                columns[name] = (np.load(stem.with_suffix(".npy"), mmap_mode="r"),)
+                continue
+            buffer_path = stem.with_suffix(".bytes")
+            if buffer_path.stat().st_size:
+                buffer = np.memmap(buffer_path, dtype=np.uint8, mode="r")
+            else:
+                buffer = np.empty(0, dtype=np.uint8)
+            columns[name] = (buffer, np.load(stem.with_suffix(".offsets.npy")))
+        return cls(path, meta["count"], meta["fields"], columns)
+
+    def value(self, field: str, i: int) -> Any:
+        kind = self.kinds[field]
+        column = self._columns[field]
+        if kind == "int64":
+            return int(column[0][i])
+        if kind == "float64":
+            return float(column[0][i])
+        buffer, offsets = column
+        text = buffer[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+        return json.loads(text) if kind == "json" else text
+
+    def text(self, field: str, i: int) -> str:
+        value = self.value(field, i)
+        return value if isinstance(value, str) else ("" if value is None else str(value))
+
+    def texts(self, field: str, rows: Optional[np.ndarray] = None) -> Iterator[str]:
+        """Тексты поля по строкам rows (по умолчанию все) без загрузки всей колонки"""
+        for i in range(self.count) if rows is None else rows:
+            yield self.text(field, int(i))
+
+    def get(self, i: int, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Документ i только с запрошенными полями (неизвестные поля пропускаются)"""
+        names = self.fields if fields is None else [name for name in fields if name in self.kinds]
+        return {name: self.value(name, i) for name in names}
+
+
+def make_snippet(text: str, query: str, length: int = 200) -> str:
+    """Фрагмент текста длиной до length символов вокруг первого слова запроса, найденного в тексте"""
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+
+    haystack = text.lower().replace("ё", "е")
+    position = -1
+    for word in _WORD_RE.findall(query.lower().replace("ё", "е")):
+        # Ищем по началу слова, чтобы "закупки" находило "закупка"
+        found = haystack.find(word[: max(3, len(word) - 2)])
+        if found != -1 and (position == -1 or found < position):
+            position = found
+    start = 0 if position == -1 else max(0, min(position - length // 4, len(text) - length))
+    snippet = text[start:start + length]
+    return ("…" if start > 0 else "") + snippet + ("…" if start + length < len(text) else "")
+
@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.http_downloader import DownloadResult, DownloadTask, part_path
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = Path("data") / "downloads.sqlite"
+
+COMPLETE = "complete"
+PARTIAL = "partial"
+FAILED = "failed"
+
+
+def documents_hash(urls: Iterable[str]) -> str:
+    """Отпечаток набора документов контракта: меняется, если документ добавлен или удалён"""
+    return hashlib.sha256("\n".join(sorted(urls)).encode("utf-8")).hexdigest()
+
+
+class DownloadManifest:
+    """Журнал скачанных контрактов и документов в SQLite.
+
+    По нему повторный запуск пропускает готовые документы, докачивает оборванные
+    и обходит только новые (или, при перепроверке, изменившиеся) контракты.
+    Индекс по fetched_at обслуживает запрос "что нового с момента X".
+    """
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS contracts ("
+            " number TEXT PRIMARY KEY, url TEXT NOT NULL, documents_hash TEXT, documents INTEGER NOT NULL DEFAULT 0,"
+            " complete INTEGER NOT NULL DEFAULT 0, first_seen REAL NOT NULL, last_checked REAL, last_changed REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " url TEXT PRIMARY KEY, contract TEXT NOT NULL, filename TEXT, path TEXT, size INTEGER NOT NULL DEFAULT 0,"
+            " sha256 TEXT, status TEXT NOT NULL, error TEXT, fetched_at REAL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_contract ON documents(contract)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_fetched_at ON documents(fetched_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS contracts_first_seen ON contracts(first_seen)")
+        self._db.commit()
+
+    def complete_contracts(self, numbers: Iterable[str]) -> Set[str]:
+        """Номера из numbers, по которым все документы уже скачаны"""
+        numbers = list(numbers)
+        if not numbers:
+            return set()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT number FROM contracts WHERE complete = 1 AND number IN ({', '.join('?' * len(numbers))})",
+                numbers,
+            ).fetchall()
+        return {row["number"] for row in rows}
+
+    def record_contract(self, number: str, url: str, urls: List[str]) -> bool:
+        """Отмечает обход карточки контракта; True, если контракт новый или набор документов изменился"""
+        digest = documents_hash(urls)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT documents_hash FROM contracts WHERE number = ?", (number,)).fetchone()
+            changed = row is None or row["documents_hash"] != digest
+            self._db.execute(
+                "INSERT INTO contracts (number, url, documents_hash, documents, first_seen, last_checked, last_changed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(number) DO UPDATE SET url = excluded.url, documents_hash = excluded.documents_hash,"
+                " documents = excluded.documents, last_checked = excluded.last_checked,"
+                " last_changed = CASE WHEN contracts.documents_hash IS excluded.documents_hash"
+                " THEN contracts.last_changed ELSE excluded.last_changed END",
+                (number, url, digest, len(urls), now, now, now),
+            )
+            self._db.commit()
+        return changed
+
+    def plan(self, number: str, directory: Path, urls: List[str]) -> Tuple[List[DownloadTask], List[DownloadResult]]:
+        """Разделяет документы контракта на задачи скачивания и уже готовые файлы"""
+        if not urls:
+            return [], []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM documents WHERE url IN ({', '.join('?' * len(urls))})", urls
+            ).fetchall()
+        known = {row["url"]: row for row in rows}
+
+        tasks: List[DownloadTask] = []
+        done: List[DownloadResult] = []
+        for url in urls:
+            row = known.get(url)
+            if (
+                row is not None
+                and row["status"] == COMPLETE
+                and row["path"]
+                and os.path.exists(row["path"])
+                and os.path.getsize(row["path"]) == row["size"]
+            ):
+                done.append(DownloadResult(
+                    url=url, path=row["path"], filename=row["filename"], size=row["size"],
+                    sha256=row["sha256"], skipped=True,
+                ))
+                continue
+            # Имя файла из прошлой попытки позволяет продолжить её .part запросом Range
+            tasks.append(DownloadTask(url=url, directory=directory, filename=row["filename"] if row is not None else None))
+        return tasks, done
+
+    def record_download(self, number: str, result: DownloadResult, directory: Optional[Path] = None):
+        self.record_downloads(number, [result], directory)
+
+    def record_downloads(
+        self,
+        number: str,
+        results: List[DownloadResult],
+        directory: Optional[Path] = None,
+        complete: Optional[bool] = None,
+    ):
+        """Записывает результаты скачивания документов контракта одной транзакцией;
+        с complete заодно отмечает, скачан ли контракт целиком"""
+        now = time.time()
+        rows = []
+        for result in results:
+            if result.skipped:
+                continue
+            if result.ok:
+                status, size = COMPLETE, result.size
+            else:
+                part = part_path(directory, result.filename) if directory is not None and result.filename else None
+                size = part.stat().st_size if part is not None and part.exists() else 0
+                status = PARTIAL if size else FAILED
+            rows.append((
+                result.url, number, result.filename, result.path, size, result.sha256, status, result.error,
+                now if result.ok else None, now,
+            ))
+        if not rows and complete is None:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO documents (url, contract, filename, path, size, sha256, status, error, fetched_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET contract = excluded.contract, filename = excluded.filename,"
+                " path = excluded.path, size = excluded.size, sha256 = excluded.sha256, status = excluded.status,"
+                " error = excluded.error, fetched_at = COALESCE(excluded.fetched_at, documents.fetched_at),"
+                " updated_at = excluded.updated_at",
+                rows,
+            )
+            if complete is not None:
+                self._db.execute("UPDATE contracts SET complete = ? WHERE number = ?", (int(complete), number))
+
+    def finish_contract(self, number: str, complete: bool):
+        with self._lock:
+            self._db.execute("UPDATE contracts SET complete = ? WHERE number = ?", (int(complete), number))
+            self._db.commit()
+
+    def new_since(self, since: float, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Документы, скачанные после since (unix time), от старых к новым"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT d.contract, c.url AS contract_url, d.url, d.filename, d.path, d.size, d.sha256, d.fetched_at"
+                " FROM documents d JOIN contracts c ON c.number = d.contract"
+                " WHERE d.status = ? AND d.fetched_at > ? ORDER BY d.fetched_at LIMIT ?",
+                (COMPLETE, since, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            contracts = self._db.execute(
+                "SELECT COUNT(*) AS total, COALESCE(SUM(complete), 0) AS complete FROM contracts"
+            ).fetchone()
+            documents = dict(self._db.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall())
+        return {
+            "contracts": contracts["total"],
+            "contracts_complete": contracts["complete"],
+            **{f"documents_{status}": documents.get(status, 0) for status in (COMPLETE, PARTIAL, FAILED)},
+        }
+
+
+_manifest: Optional[DownloadManifest] = None
+
+
+def get_download_manifest() -> DownloadManifest:
+    global _manifest
+    if _manifest is None:
+        _manifest = DownloadManifest(Path(os.environ.get("INGESTOR_DOWNLOAD_MANIFEST", DEFAULT_MANIFEST_PATH)))
+    return _manifest
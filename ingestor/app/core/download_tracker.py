@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+PARTIAL_SUFFIXES = (".crdownload", ".tmp", ".part")
+
+# Без событий дольше этого папка сверяется заново (страховка от потерянных уведомлений)
+RESCAN_INTERVAL_MS = 5000
+
+FileFilter = Callable[[Path], bool]
+
+
+def is_complete_file(path: Path) -> bool:
+    return path.is_file() and path.suffix not in PARTIAL_SUFFIXES
+
+
+class DownloadTracker:
+    """Отслеживание завершённых загрузок в папке по уведомлениям файловой системы (watchfiles).
+
+    Браузер пишет файл как .crdownload и переименовывает его по окончании загрузки,
+    поэтому завершение - появление файла без временного суффикса. На каждый ожидаемый
+    файл выдаётся future; цикл событий не блокируется, и одновременно можно ждать
+    сколько угодно загрузок. Файлы, лежавшие в папке до start, не учитываются.
+    Папка перечитывается только раз в RESCAN_INTERVAL_MS без событий и только
+    при ожидающих future - на случай потерянного уведомления.
+    """
+
+    def __init__(self, folder: Path):
+        # Абсолютный путь: в таком виде приходят пути из уведомлений
+        self.folder = Path(folder).resolve()
+        self._known: Set[Path] = set()
+        # Завершённые файлы, ещё не выданные ни одному future, в порядке появления
+        self._completed: List[Path] = []
+        self._waiters: List[Tuple[FileFilter, asyncio.Future]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._known = {path for path in self.folder.iterdir() if is_complete_file(path)}
+        self._completed = []
+        self._stop = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._watch())
+        await self._ready.wait()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        for _, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters = []
+
+    async def __aenter__(self) -> "DownloadTracker":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _watch(self):
+        from watchfiles import awatch
+
+        watcher = awatch(
+            self.folder, stop_event=self._stop, debounce=50, step=10,
+            yield_on_timeout=True, rust_timeout=RESCAN_INTERVAL_MS,
+        )
+        # Первый шаг генератора синхронно подключает наблюдение и только потом ждёт событий,
+        # поэтому после одного прохода цикла событий ни одно изменение уже не будет пропущено
+        step = asyncio.ensure_future(anext(watcher, None))
+        await asyncio.sleep(0)
+        self._ready.set()
+        try:
+            while (changes := await step) is not None:
+                if changes:
+                    self._on_changes(changes)
+                elif self._waiters:
+                    self._rescan()
+                step = asyncio.ensure_future(anext(watcher, None))
+        except Exception as e:
+            log.error(f"Ошибка наблюдения за папкой {self.folder}: {e}")
+            for _, future in self._waiters:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            step.cancel()
+            self._ready.set()
+
+    def _on_changes(self, changes: Set[Tuple[Any, str]]):
+        """Добавленные и изменённые файлы из уведомлений - без чтения папки"""
+        from watchfiles import Change
+
+        paths = {Path(path) for change, path in changes if change != Change.deleted}
+        self._add_completed(path for path in paths if path.parent == self.folder)
+
+    def _rescan(self):
+        self._add_completed(self.folder.iterdir())
+
+    def _add_completed(self, paths: Iterable[Path]):
+        new = [path for path in paths if path not in self._known and is_complete_file(path)]
+        for path in sorted(new, key=lambda path: path.stat().st_mtime):
+            self._known.add(path)
+            self._completed.append(path)
+        self._match()
+
+    def _match(self):
+        """Выдаёт завершённые файлы ожидающим future"""
+        for path in list(self._completed):
+            for match, future in self._waiters:
+                if not future.done() and match(path):
+                    self._completed.remove(path)
+                    future.set_result(path)
+                    break
+        self._waiters = [waiter for waiter in self._waiters if not waiter[1].done()]
+
+    def expect(self, name: Optional[str] = None, suffix: Optional[str] = None) -> asyncio.Future:
+        """Future с путём к следующему завершённому файлу (с именем name или расширением suffix)"""
+        if self._task is None:
+            raise RuntimeError("Отслеживание загрузок не запущено")
+
+        def match(path: Path) -> bool:
+            return (name is None or path.name == name) and (suffix is None or path.suffix == suffix)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((match, future))
+        # Файл мог завершиться между запуском наблюдения и вызовом expect
+        self._match()
+        return future
+
+    async def wait_for(self, name: Optional[str] = None, suffix: Optional[str] = None, timeout: float = 60) -> Optional[Path]:
+        """Ждёт завершения загрузки не дольше timeout; None - если файл не появился"""
+        future = self.expect(name=name, suffix=suffix)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Файл {name or '*' + (suffix or '')} не появился в {self.folder} за {timeout} с")
+            return None
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.lru import ByteLRU
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path("data") / "embedding_cache.sqlite"
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста перед эмбеддингом: NFC и схлопывание пробельных символов"""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def cache_key(text: str, model: str) -> str:
+    """Контентный ключ кэша: хэш нормализованного текста вместе с именем модели"""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Двухуровневый кэш эмбеддингов: LRU в памяти и SQLite на диске.
+
+    Оба уровня ограничены по объёму в байтах; на диске вытесняются записи
+    с самым давним обращением.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 2 * 1024 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = ByteLRU(memory_max_bytes, sizeof=lambda vector: vector.nbytes)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evicted": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS vectors_last_access ON vectors(last_access)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM vectors").fetchone()[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Векторы для найденных ключей; отсутствующие ключи в ответ не попадают"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing: List[str] = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    found[key] = vector
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing.append(key)
+
+            now = time.time()
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._memory.put(key, vector)
+                self._db.executemany(
+                    "UPDATE vectors SET last_access = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows],
+                )
+                self._stats["disk_hits"] += len(rows)
+                self._stats["misses"] += len(chunk) - len(rows)
+            self._db.commit()
+        return found
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, np.ndarray], model: str):
+        """Сохраняет векторы в оба уровня кэша"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for key, vector in items.items():
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._memory.put(key, vector)
+                blob = vector.tobytes()
+                rows.append((key, model, int(vector.shape[0]), blob, len(blob), now))
+
+            existing = 0
+            for start in range(0, len(rows), 500):
+                chunk = [row[0] for row in rows[start:start + 500]]
+                existing += self._db.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM vectors WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchone()[0]
+            self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._disk_bytes += sum(row[4] for row in rows) - existing
+            self._evict()
+            self._db.commit()
+
+    def put(self, key: str, vector: np.ndarray, model: str):
+        self.put_many({key: vector}, model)
+
+    def _evict(self):
+        """Вытесняет самые давние записи, пока диск не уложится в 90% бюджета"""
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        excess = self._disk_bytes - int(self.disk_max_bytes * 0.9)
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM vectors ORDER BY last_access"):
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM vectors WHERE key = ?", victims)
+        self._stats["evicted"] += len(victims)
+        log.info(f"Кэш эмбеддингов очищен до {self._disk_bytes} байт")
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики попаданий/промахов и занятый объём обоих уровней"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory.bytes
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> EmbeddingCache:
+    """Общий на процесс кэш эмбеддингов"""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            path=Path(os.environ.get("GIGACHAT_CACHE_PATH", DEFAULT_CACHE_PATH)),
+            disk_max_bytes=int(os.environ.get("GIGACHAT_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)),
+        )
+    return _cache
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.document_store import DocumentStore
+
+log = logging.getLogger(__name__)
+
+DATA_ROOT = Path("data")
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+HASHES_FILE = "hashes.npy"
+OFFSETS_FILE = "chunk_offsets.npy"
+VERSION_DIR_PREFIX = "v-"
+MANIFEST_FILE = "manifest.json"
+
+
+def index_dir(scan_id: int) -> Path:
+    """Папка с индексом эмбеддингов для scan_id"""
+    return DATA_ROOT / str(scan_id) / "embeddings"
+
+
+def content_hash(text: str) -> bytes:
+    """Хэш содержимого документа для инкрементального обновления индекса"""
+    return hashlib.blake2b(str(text).encode("utf-8"), digest_size=16).digest()
+
+
+def _atomic_write(path: Path, write) -> None:
+    """Пишет файл во временный путь и атомарно подменяет им целевой"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _fsync_dir(path: Path) -> None:
+    """Сбрасывает на диск файлы папки, чтобы манифест не указал на недописанную версию"""
+    for file in path.rglob("*"):
+        if file.is_file():
+            with open(file, "rb") as f:
+                os.fsync(f.fileno())
+
+
+def _remove_stale(root: Path, keep: set) -> None:
+    """Удаляет прежние версии индекса.
+    Предыдущая версия остаётся: её могут дочитывать открывшие её до подмены манифеста."""
+    for entry in root.iterdir():
+        if entry.name == MANIFEST_FILE or entry.name in keep:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+
+
+class EmbeddingIndex:
+    """Персистентный индекс эмбеддингов scan_id: нормированная матрица в .npy + маппинг id + манифест.
+
+    Строки матрицы - чанки документов; чанки документа j лежат подряд в строках
+    chunk_offsets[j]:chunk_offsets[j + 1], ids[j] - исходный индекс документа.
+    Каждая сборка лежит в своей папке v-<время>, path - эта папка; манифест
+    в index_dir указывает на текущую версию.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        manifest: Dict[str, Any],
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        hashes: Optional[np.ndarray] = None,
+        chunk_offsets: Optional[np.ndarray] = None,
+    ):
+        self.path = path
+        self.manifest = manifest
+        self.vectors = vectors
+        self.ids = ids
+        self.hashes = hashes
+        # Индексы без чанков: по одному вектору на документ
+        self.chunk_offsets = chunk_offsets if chunk_offsets is not None else np.arange(len(ids) + 1, dtype=np.int64)
+        self._documents: Optional[DocumentStore] = None
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def scan_id(self) -> int:
+        return int(self.manifest["scan_id"])
+
+    @property
+    def documents(self) -> DocumentStore:
+        """Исходные документы (хранилище открывается при первом обращении)"""
+        if self._documents is None:
+            self._documents = DocumentStore.open(self.path / self.manifest["documents_dir"])
+        return self._documents
+
+    @classmethod
+    def save(
+        cls,
+        scan_id: int,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        documents: List[Dict[str, Any]],
+        model: str,
+        text_column: str = "content",
+        hashes: Optional[np.ndarray] = None,
+        chunk_offsets: Optional[np.ndarray] = None,
+        chunking: Optional[Dict[str, int]] = None,
+    ) -> "EmbeddingIndex":
+        """Сохраняет индекс на диск. Все файлы сборки пишутся в новую папку версии,
+        затем манифест атомарно переключается на неё, поэтому читатели видят либо
+        прежнюю версию целиком, либо новую."""
+        root = index_dir(scan_id)
+        root.mkdir(parents=True, exist_ok=True)
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        manifest = {
+            "scan_id": scan_id,
+            "model": model,
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "count": int(vectors.shape[0]),
+            "valid_documents": int(ids.shape[0]),
+            "documents": len(documents),
+            "text_column": text_column,
+            "chunking": chunking,
+            "dtype": str(vectors.dtype),
+            "created_at": time.time(),
+            "documents_dir": "documents",
+        }
+        manifest["version"] = f"{VERSION_DIR_PREFIX}{int(manifest['created_at'] * 1e9)}"
+        previous = (cls.read_manifest(scan_id) or {}).get("version")
+
+        path = root / manifest["version"]
+        path.mkdir()
+        np.save(path / VECTORS_FILE, vectors)
+        np.save(path / IDS_FILE, ids)
+        if hashes is not None:
+            np.save(path / HASHES_FILE, np.asarray(hashes, dtype="S16"))
+        if chunk_offsets is not None:
+            np.save(path / OFFSETS_FILE, np.asarray(chunk_offsets, dtype=np.int64))
+        DocumentStore.write(path / manifest["documents_dir"], documents)
+        _fsync_dir(path)
+        _atomic_write(
+            root / MANIFEST_FILE,
+            lambda f: f.write(json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")),
+        )
+        _remove_stale(root, keep={manifest["version"], previous})
+        log.info(f"Индекс эмбеддингов сохранён: {path} ({manifest['count']} векторов)")
+        return get_index(scan_id)
+
+    @classmethod
+    def open(cls, scan_id: int) -> "EmbeddingIndex":
+        """Открывает индекс с диска, матрица отображается в память (mmap)"""
+        path = index_dir(scan_id)
+        manifest_path = path / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Индекс эмбеддингов для scan_id={scan_id} не найден")
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        path = path / manifest["version"]
+        vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+        ids = np.load(path / IDS_FILE)
+        hashes = np.load(path / HASHES_FILE) if (path / HASHES_FILE).exists() else None
+        offsets = np.load(path / OFFSETS_FILE) if manifest.get("chunking") else None
+        return cls(path, manifest, vectors, ids, hashes, offsets)
+
+    @staticmethod
+    def read_manifest(scan_id: int) -> Optional[Dict[str, Any]]:
+        """Читает только манифест индекса, None если индекса нет"""
+        manifest_path = index_dir(scan_id) / MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+# --- Кэш открытых индексов на процесс ---
+_open_indexes: Dict[int, tuple] = {}
+
+
+def get_index(scan_id: int) -> EmbeddingIndex:
+    """Лениво открывает индекс scan_id и переиспользует его между запросами.
+    Индекс переоткрывается, если манифест был перезаписан."""
+    manifest_path = index_dir(scan_id) / MANIFEST_FILE
+    try:
+        mtime = manifest_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        _open_indexes.pop(scan_id, None)
+        raise FileNotFoundError(
+            f"Индекс эмбеддингов для scan_id={scan_id} не найден, выполните gigachat_prepare_embeddings"
+        )
+
+    cached = _open_indexes.get(scan_id)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    index = EmbeddingIndex.open(scan_id)
+    _open_indexes[scan_id] = (mtime, index)
+    log.info(f"Открыт индекс эмбеддингов scan_id={scan_id}: {len(index)} векторов")
+    return index
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from gigachat import GigaChat
+
+log = logging.getLogger(__name__)
+
+EMBEDDINGS_MODEL = "Embeddings"
+EMBEDDING_DIM = 1024
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    """HTTP-код из исключения GigaChat SDK (атрибут или args, в зависимости от версии SDK)"""
+    code = getattr(exc, "status_code", None)
+    if code is None and len(exc.args) >= 2 and isinstance(exc.args[1], int):
+        code = exc.args[1]
+    return code
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Значение заголовка Retry-After из ответа 429, если сервер его прислал"""
+    headers = getattr(exc, "headers", None)
+    if headers is None and len(exc.args) >= 4:
+        headers = exc.args[3]
+    try:
+        return float(headers.get("Retry-After")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """Ограничитель числа запросов в полёте по схеме AIMD.
+
+    Успешный ответ с задержкой ниже целевой увеличивает лимит на единицу за окно,
+    медленный ответ уменьшает его на четверть, 429 - вдвое с паузой для всех запросов.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16, target_latency: float = 2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    def on_success(self, latency: float):
+        if latency > self.target_latency:
+            self.limit = max(self.minimum, self.limit * 0.75)
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        self.limit = max(self.minimum, self.limit / 2)
+        pause = retry_after if retry_after is not None else 1.0
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+class EmbeddingPipeline:
+    """Пакетное получение эмбеддингов через один долгоживущий клиент GigaChat.
+
+    Тексты отправляются пачками по batch_size в одном запросе embeddings(),
+    число одновременных запросов регулирует AdaptiveLimiter.
+    """
+
+    def __init__(
+        self,
+        credentials: Optional[str] = None,
+        access_token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: str = EMBEDDINGS_MODEL,
+        batch_size: int = 16,
+        max_in_flight: int = 8,
+        target_latency: float = 2.0,
+        max_retries: int = 5,
+        max_chars: int = 500,
+    ):
+        self.credentials = credentials
+        self.access_token = access_token
+        self.base_url = base_url
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.max_chars = max_chars
+        self._giga: Optional[GigaChat] = None
+        self._limiter: Optional[AdaptiveLimiter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"docs": 0, "requests": 0, "rate_limited": 0, "errors": 0, "elapsed": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingPipeline":
+        """Настройки из переменных окружения GIGACHAT_*"""
+        return cls(
+            credentials=os.environ.get("GIGACHAT_TOKEN") or None,
+            access_token=os.environ.get("GIGACHAT_ACCESS_TOKEN") or None,
+            base_url=os.environ.get("GIGACHAT_BASE_URL") or None,
+            batch_size=int(os.environ.get("GIGACHAT_EMBED_BATCH", 16)),
+            max_in_flight=int(os.environ.get("GIGACHAT_EMBED_CONCURRENCY", 8)),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.credentials or self.access_token)
+
+    @property
+    def client(self) -> GigaChat:
+        """Один клиент на пайплайн: SDK сам обновляет токен и держит пул соединений"""
+        if self._giga is None:
+            if not self.configured:
+                raise ValueError("GIGACHAT_TOKEN не настроен")
+            kwargs: Dict[str, Any] = {"verify_ssl_certs": False}
+            if self.credentials:
+                kwargs["credentials"] = self.credentials
+            if self.access_token:
+                kwargs["access_token"] = self.access_token
+            if self.base_url:
+                kwargs["base_url"] = self.base_url
+            self._giga = GigaChat(**kwargs)
+        return self._giga
+
+    def _prepare(self, texts: List[str]) -> List[str]:
+        return [str(text)[: self.max_chars] for text in texts]
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """Синхронное получение эмбеддингов одной пачкой (для одиночных запросов)"""
+        response = self.client.embeddings(self._prepare(texts), model=self.model)
+        return self._to_matrix(response, len(texts))
+
+    @staticmethod
+    def _to_matrix(response, count: int) -> np.ndarray:
+        vectors = np.zeros((count, EMBEDDING_DIM), dtype=np.float32)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+    async def _embed_batch(self, batch: List[str]) -> Optional[np.ndarray]:
+        """Одна пачка с повторами: 429 уменьшает параллелизм, прочие ошибки - экспоненциальный backoff"""
+        for attempt in range(self.max_retries + 1):
+            async with self._limiter:
+                started = time.monotonic()
+                try:
+                    response = await self.client.aembeddings(batch, model=self.model)
+                except Exception as e:
+                    if _status_code(e) == 429:
+                        self._stats["rate_limited"] += 1
+                        self._limiter.on_rate_limited(_retry_after(e))
+                        log.warning(
+                            f"GigaChat 429, параллелизм снижен до {int(self._limiter.limit)} запросов"
+                        )
+                        continue
+                    self._stats["errors"] += 1
+                    log.warning(f"Ошибка пачки эмбеддингов (попытка {attempt + 1}): {e}")
+                else:
+                    self._stats["requests"] += 1
+                    self._limiter.on_success(time.monotonic() - started)
+                    return self._to_matrix(response, len(batch))
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt))
+        return None
+
+    async def embed(
+        self,
+        texts: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Эмбеддинги для всех текстов.
+
+        Возвращает матрицу (n, dim) float32 и маску успешно полученных строк.
+        """
+        total = len(texts)
+        vectors = np.zeros((total, EMBEDDING_DIM), dtype=np.float32)
+        ok = np.zeros(total, dtype=bool)
+        if total == 0:
+            return vectors, ok
+        if not self.configured:
+            raise ValueError("GIGACHAT_TOKEN не настроен")
+
+        # Асинхронный клиент и лимитер привязаны к event loop, в котором созданы
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._giga = None
+            self._limiter = None
+            self._loop = loop
+
+        if self._limiter is None:
+            self._limiter = AdaptiveLimiter(
+                initial=min(4, self.max_in_flight),
+                maximum=self.max_in_flight,
+                target_latency=self.target_latency,
+            )
+
+        prepared = self._prepare(texts)
+        started = time.monotonic()
+        done = 0
+
+        async def run(start: int):
+            nonlocal done
+            batch = prepared[start:start + self.batch_size]
+            result = await self._embed_batch(batch)
+            if result is not None:
+                vectors[start:start + len(batch)] = result
+                ok[start:start + len(batch)] = np.any(result != 0, axis=1)
+            done += len(batch)
+            if on_progress is not None:
+                on_progress(done, total)
+            if (done // self.batch_size) % 10 != 0:
+                return
+            elapsed = time.monotonic() - started
+            log.info(
+                f"Эмбеддинги: {done}/{total}, {done / max(elapsed, 1e-9):.1f} док/с, "
+                f"в полёте до {int(self._limiter.limit)} запросов"
+            )
+
+        await asyncio.gather(*(run(start) for start in range(0, total, self.batch_size)))
+
+        elapsed = time.monotonic() - started
+        self._stats["docs"] += total
+        self._stats["elapsed"] += elapsed
+        log.info(f"Эмбеддинги для {total} документов получены за {elapsed:.2f} с ({total / max(elapsed, 1e-9):.1f} док/с)")
+        return vectors, ok
+
+    def stats(self) -> Dict[str, Any]:
+        """Накопленная статистика пайплайна, включая пропускную способность в док/с"""
+        stats = dict(self._stats)
+        stats["docs_per_sec"] = stats["docs"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        stats["concurrency_limit"] = int(self._limiter.limit) if self._limiter else self.max_in_flight
+        return stats
+
+    async def aclose(self):
+        if self._giga is not None:
+            await self._giga.aclose()
+            self._giga = None
+
+
+_pipeline: Optional[EmbeddingPipeline] = None
+
+
+def get_pipeline() -> EmbeddingPipeline:
+    """Общий на процесс пайплайн эмбеддингов"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = EmbeddingPipeline.from_env()
+    return _pipeline
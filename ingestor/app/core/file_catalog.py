@@ -0,0 +1,180 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = Path("data") / "catalog.sqlite"
+
+SCAN_ORIGINAL = "scan_original"
+SCAN_RESULT = "scan_result"
+CONTRACT_DOCUMENT = "contract_document"
+REGISTRY_CSV = "registry_csv"
+
+
+def file_entry(
+    path: str, kind: str, scan_id: Optional[int] = None, contract: Optional[str] = None, size: Optional[int] = None
+) -> Dict[str, Any]:
+    """Запись каталога; размер и время берутся с диска, если не переданы"""
+    stat = os.stat(path)
+    return {
+        "path": str(path),
+        "kind": kind,
+        "scan_id": scan_id,
+        "contract": contract,
+        "size": stat.st_size if size is None else size,
+        "created_at": stat.st_mtime,
+    }
+
+
+class FileCatalog:
+    """Каталог файлов, которые пишут команды (очистка, скачивание контрактов, выгрузки CSV).
+
+    Команды добавляют записи по мере записи файлов, поэтому листинг - индексный
+    запрос к SQLite, а не обход директорий. Страницы выдаются по курсору (id
+    последней записи), так что глубокие страницы не дороже первых.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CATALOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, kind TEXT NOT NULL, scan_id INTEGER,"
+            " contract TEXT, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_scan_id ON files(scan_id, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_contract ON files(contract, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_kind ON files(kind, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_created_at ON files(created_at)")
+        self._db.commit()
+
+    @staticmethod
+    def _rows(entries: Iterable[Dict[str, Any]]) -> List[tuple]:
+        return [
+            (e["path"], e["kind"], e.get("scan_id"), e.get("contract"), e["size"], e.get("created_at") or time.time())
+            for e in entries
+        ]
+
+    def _upsert(self, rows: List[tuple]):
+        self._db.executemany(
+            "INSERT INTO files (path, kind, scan_id, contract, size, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(path) DO UPDATE SET kind = excluded.kind, scan_id = excluded.scan_id,"
+            " contract = excluded.contract, size = excluded.size, created_at = excluded.created_at",
+            rows,
+        )
+
+    def add(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Добавляет или обновляет записи (по пути); id существующих записей сохраняется"""
+        rows = self._rows(entries)
+        if not rows:
+            return 0
+        with self._lock:
+            self._upsert(rows)
+            self._db.commit()
+        return len(rows)
+
+    def remove(self, paths: Iterable[str]) -> int:
+        with self._lock:
+            removed = self._db.executemany("DELETE FROM files WHERE path = ?", [(str(p),) for p in paths]).rowcount
+            self._db.commit()
+        return removed
+
+    @staticmethod
+    def _where(
+        scan_id: Optional[int] = None,
+        contract: Optional[str] = None,
+        kind: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Tuple[str, List[Any]]:
+        conditions, params = [], []
+        for column, value in (("scan_id", scan_id), ("contract", contract), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def list(self, cursor: Optional[int] = None, limit: int = 100, **filters) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Страница записей после курсора и курсор следующей страницы (None - страниц больше нет).
+
+        Записи файлов, удалённых с диска в обход команд, из каталога убираются;
+        страница с такими файлами может оказаться короче limit."""
+        where, params = self._where(**filters)
+        if cursor is not None:
+            where += (" AND " if where else " WHERE ") + "id > ?"
+            params.append(cursor)
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM files{where} ORDER BY id LIMIT ?", [*params, limit + 1]).fetchall()
+        next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        rows = rows[:limit]
+        missing = [row["path"] for row in rows if not os.path.exists(row["path"])]
+        if missing:
+            removed = self.remove(missing)
+            log.info(f"Каталог файлов: убрано {removed} записей о файлах, которых нет на диске")
+        return [dict(row) for row in rows if row["path"] not in missing], next_cursor
+
+    def summary(self, **filters) -> Dict[str, Any]:
+        """Число файлов и суммарный размер, в целом и по типам"""
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT kind, COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes FROM files{where} GROUP BY kind",
+                params,
+            ).fetchall()
+        by_kind = {row["kind"]: {"files": row["files"], "bytes": row["bytes"]} for row in rows}
+        return {
+            "files": sum(item["files"] for item in by_kind.values()),
+            "bytes": sum(item["bytes"] for item in by_kind.values()),
+            "by_kind": by_kind,
+        }
+
+    def rebuild(self, data_dir: Path = Path("data"), contracts_dir: Path = Path("contracts_docs"), csv_dir: Path = Path("contracts_csv")) -> int:
+        """Однократная индексация уже лежащих на диске файлов (до появления каталога)"""
+        entries = []
+        if data_dir.exists():
+            for scan_dir in data_dir.iterdir():
+                if not scan_dir.is_dir() or not scan_dir.name.isdigit():
+                    continue
+                for f in scan_dir.glob("*.html"):
+                    kind = SCAN_RESULT if "_result_" in f.name else SCAN_ORIGINAL
+                    entries.append(file_entry(str(f), kind, scan_id=int(scan_dir.name)))
+        if contracts_dir.exists():
+            for f in contracts_dir.rglob("*"):
+                if f.is_file() and f.suffix != ".part":
+                    entries.append(file_entry(str(f), CONTRACT_DOCUMENT, contract=f.parent.name))
+        if csv_dir.exists():
+            entries.extend(file_entry(str(f), REGISTRY_CSV) for f in csv_dir.glob("*.csv"))
+        rows = self._rows(entries)
+        # Очистка и заполнение - одна транзакция: читатели не видят пустой каталог,
+        # а при ошибке остаётся прежний
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files")
+            self._upsert(rows)
+        added = len(rows)
+        log.info(f"Каталог файлов перестроен: {added} записей")
+        return added
+
+
+_catalog: Optional[FileCatalog] = None
+
+
+def get_file_catalog() -> FileCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = FileCatalog(Path(os.environ.get("INGESTOR_FILE_CATALOG", DEFAULT_CATALOG_PATH)))
+    return _catalog
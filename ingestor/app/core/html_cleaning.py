@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+def _default_clean(contents: List[str]) -> List[str]:
+    from app.parser import clean_html_content
+
+    return clean_html_content(contents)
+
+
+def _clean_batch(clean: Callable[[List[str]], List[str]], batch: List[str]) -> Tuple[List[str], float]:
+    """Выполняется в процессе пула: чистит пачку и возвращает время обработки"""
+    started = time.perf_counter()
+    result = clean(batch)
+    return result, time.perf_counter() - started
+
+
+class HtmlCleaner:
+    """Очистка HTML пачками документов в пуле процессов.
+
+    Разбор HTML упирается в CPU, поэтому пачки уходят в отдельные процессы и цикл
+    событий не блокируется. Порядок результатов совпадает с порядком входа.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        batch_size: int = 16,
+        max_doc_chars: int = 2_000_000,
+        clean: Callable[[List[str]], List[str]] = _default_clean,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_doc_chars = max_doc_chars
+        self.clean_func = clean
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _cap(self, contents: List[str], max_doc_chars: Optional[int]) -> Tuple[List[str], int]:
+        """Обрезает документы длиннее max_doc_chars, возвращает их число"""
+        max_doc_chars = max_doc_chars or self.max_doc_chars
+        truncated = 0
+        capped = []
+        for content in contents:
+            if len(content) > max_doc_chars:
+                truncated += 1
+                content = content[:max_doc_chars]
+            capped.append(content)
+        if truncated:
+            log.warning(f"Обрезано {truncated} документов длиннее {max_doc_chars} символов")
+        return capped, truncated
+
+    async def clean(
+        self, contents: List[str], batch_size: Optional[int] = None, max_doc_chars: Optional[int] = None
+    ) -> Tuple[List[str], Dict[str, Any]]:
+        """Очищенные документы в исходном порядке и статистика по пачкам"""
+        batch_size = batch_size or self.batch_size
+        contents, truncated = self._cap(contents, max_doc_chars)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        batches = [contents[start:start + batch_size] for start in range(0, len(contents), batch_size)]
+        done = await asyncio.gather(
+            *(loop.run_in_executor(self.pool, _clean_batch, self.clean_func, batch) for batch in batches)
+        )
+
+        results: List[str] = []
+        timings = []
+        for number, (cleaned, seconds) in enumerate(done):
+            results.extend(cleaned)
+            timings.append({"batch": number, "documents": len(cleaned), "seconds": round(seconds, 4)})
+        elapsed = time.perf_counter() - started
+        log.info(
+            f"Очищено {len(results)} документов за {elapsed:.2f} с: {len(batches)} пачек, "
+            f"{self.max_workers} процессов, {len(results) / max(elapsed, 1e-9):.1f} док/с"
+        )
+        stats = {
+            "documents": len(results),
+            "truncated": truncated,
+            "workers": self.max_workers,
+            "seconds": round(elapsed, 4),
+            "batches": timings,
+        }
+        return results, stats
+
+    async def clean_inline(
+        self, contents: List[str], max_doc_chars: Optional[int] = None
+    ) -> Tuple[List[str], Dict[str, Any]]:
+        """Однопроцессная очистка в отдельном потоке (без пула процессов)"""
+        contents, truncated = self._cap(contents, max_doc_chars)
+        started = time.perf_counter()
+        results = await asyncio.to_thread(self.clean_func, contents)
+        elapsed = time.perf_counter() - started
+        stats = {
+            "documents": len(results),
+            "truncated": truncated,
+            "workers": 1,
+            "seconds": round(elapsed, 4),
+            "batches": [{"batch": 0, "documents": len(results), "seconds": round(elapsed, 4)}],
+        }
+        return results, stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+_cleaner: Optional[HtmlCleaner] = None
+
+
+def get_html_cleaner() -> HtmlCleaner:
+    """Общий на процесс пул очистки HTML, размер - по числу ядер или INGESTOR_CLEAN_WORKERS"""
+    global _cleaner
+    if _cleaner is None:
+        workers = os.environ.get("INGESTOR_CLEAN_WORKERS")
+        _cleaner = HtmlCleaner(max_workers=int(workers) if workers else None)
+    return _cleaner
+
+
+def close_html_cleaner():
+    if _cleaner is not None:
+        _cleaner.close()
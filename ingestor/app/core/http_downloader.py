@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+from yarl import URL
+
+log = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Файл не скачан: неповторяемый ответ сервера или не сошлись размер/контрольная сумма"""
+
+
+@dataclass
+class DownloadTask:
+    url: str
+    directory: Path
+    filename: Optional[str] = None
+    expected_size: Optional[int] = None
+    expected_sha256: Optional[str] = None
+    resume: bool = True
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: Optional[str] = None
+    filename: Optional[str] = None
+    size: int = 0
+    sha256: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+    resumed_from: int = 0
+    skipped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _safe_filename(name: str) -> str:
+    name = os.path.basename(name.replace("\\", "/")).strip()
+    return name or "file"
+
+
+def _hash_file(path: Path, sha256) -> None:
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+
+
+def _content_range_total(value: Optional[str]) -> Optional[int]:
+    """Полный размер из Content-Range: bytes 100-199/200"""
+    if not value or "/" not in value:
+        return None
+    total = value.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def part_path(directory: Path, filename: str) -> Path:
+    return Path(directory) / (_safe_filename(filename) + ".part")
+
+
+def _fallback_filename(url: str) -> str:
+    query = parse_qs(urlparse(url).query)
+    uid = (query.get("uid") or [None])[0]
+    return f"{uid}.bin" if uid else _safe_filename(urlparse(url).path)
+
+
+def unique_filename(url: str, name: str) -> str:
+    """Имя файла с коротким хэшем URL: разные документы с одинаковым именем
+    из Content-Disposition не перезаписывают друг друга, а повтор того же URL
+    получает то же имя и продолжает свой .part"""
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}_{_safe_filename(name)}"
+
+
+def _open_part(part: Path, mode: str):
+    part.parent.mkdir(parents=True, exist_ok=True)
+    return open(part, mode)
+
+
+def _write_chunks(f, chunks: List[bytes]):
+    for chunk in chunks:
+        f.write(chunk)
+
+
+def _part_size(part: Path) -> int:
+    return part.stat().st_size if part.exists() else 0
+
+
+class HttpDownloader:
+    """Скачивание файлов через общую aiohttp-сессию с куками браузера.
+
+    Соединения переиспользуются, на один хост - не больше per_host запросов.
+    Файл пишется потоково во временный .part и переименовывается только после
+    проверки Content-Length и (если известна) SHA-256; запись на диск идёт
+    в отдельном потоке пачками по write_buffer байт, не блокируя цикл событий. Сетевые ошибки и ответы
+    429/5xx повторяются с экспоненциальной паузой; оборванная загрузка
+    продолжается с места обрыва запросом Range, если известно имя файла.
+    """
+
+    def __init__(
+        self,
+        cookies: Iterable[Dict[str, Any]] = (),
+        headers: Optional[Dict[str, str]] = None,
+        per_host: int = 4,
+        total: int = 32,
+        retries: int = 3,
+        backoff: float = 0.5,
+        chunk_size: int = 64 * 1024,
+        write_buffer: int = 1024 * 1024,
+        timeout: float = 120.0,
+    ):
+        self.per_host = per_host
+        self.total = total
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.write_buffer = write_buffer
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_read=min(timeout, 60.0))
+        self.headers = headers or {}
+        self._cookies = list(cookies)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "HttpDownloader":
+        connector = aiohttp.TCPConnector(limit=self.total, limit_per_host=self.per_host)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self.add_cookies(self._cookies)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def add_cookies(self, cookies: Iterable[Dict[str, Any]]):
+        """Добавляет куки в формате Selenium (name, value, domain, path)"""
+        cookies = list(cookies)
+        if self._session is None:
+            self._cookies.extend(cookies)
+            return
+        for cookie in cookies:
+            domain = (cookie.get("domain") or "").lstrip(".")
+            url = f"https://{domain}{cookie.get('path') or '/'}" if domain else None
+            self._session.cookie_jar.update_cookies(
+                {cookie["name"]: cookie["value"]}, response_url=URL(url) if url else None
+            )
+
+    async def fetch(self, task: DownloadTask) -> DownloadResult:
+        """Скачивает один файл; ошибка возвращается в результате, а не исключением"""
+        result = DownloadResult(url=task.url)
+        started = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            try:
+                path, size, digest, offset = await self._fetch_once(task)
+                result.path, result.size, result.sha256, result.error = str(path), size, digest, None
+                result.resumed_from = offset
+                break
+            except DownloadError as e:
+                result.error = str(e)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                result.error = f"{type(e).__name__}: {e}"
+                if attempt > self.retries:
+                    break
+                delay = self.backoff * 2 ** (attempt - 1)
+                log.warning(f"Повтор {attempt}/{self.retries} для {task.url} через {delay:.1f} с: {result.error}")
+                await asyncio.sleep(delay)
+            except OSError as e:
+                # Ошибка диска (нет места, нет прав) - повтор не поможет
+                result.error = f"Ошибка записи файла: {e}"
+                break
+        result.filename = task.filename
+        result.seconds = round(time.perf_counter() - started, 4)
+        if result.ok:
+            log.info(f"Скачан {result.path} ({result.size} байт) за {result.seconds:.2f} с")
+        else:
+            log.error(f"Не удалось скачать {task.url}: {result.error}")
+        return result
+
+    async def _fetch_once(self, task: DownloadTask):
+        headers = dict(self.headers)
+        offset = 0
+        if task.resume and task.filename:
+            part = part_path(task.directory, task.filename)
+            offset = await asyncio.to_thread(_part_size, part)
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+
+        async with self._session.get(task.url, headers=headers) as response:
+            if response.status == 416 and offset:
+                # Недокачанный файл больше или не совпадает с текущим - качаем заново
+                await asyncio.to_thread(part.unlink, missing_ok=True)
+                raise aiohttp.ClientPayloadError("диапазон не принят сервером, загрузка начнётся заново")
+            if response.status in RETRY_STATUSES:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status, message=response.reason or ""
+                )
+            if response.status >= 400:
+                raise DownloadError(f"HTTP {response.status} {response.reason}")
+
+            if task.filename is None:
+                disposition = response.content_disposition
+                name = (disposition.filename if disposition else None) or _fallback_filename(task.url)
+                # Имя запоминается, чтобы повтор после обрыва продолжил тот же .part
+                task.filename = unique_filename(task.url, name)
+            directory = Path(task.directory)
+            path = directory / _safe_filename(task.filename)
+            part = part_path(directory, task.filename)
+
+            sha256 = hashlib.sha256()
+            expected = task.expected_size
+            if response.status == 206 and offset:
+                await asyncio.to_thread(_hash_file, part, sha256)
+                mode, size = "ab", offset
+                expected = expected or _content_range_total(response.headers.get("Content-Range"))
+            else:
+                mode, size, offset = "wb", 0, 0
+                if expected is None and not response.headers.get("Content-Encoding"):
+                    # При сжатии Content-Length - размер сжатого тела, с распакованным не сравнивается
+                    expected = response.content_length
+
+            f = await asyncio.to_thread(_open_part, part, mode)
+            try:
+                buffered: List[bytes] = []
+                pending = 0
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    buffered.append(chunk)
+                    pending += len(chunk)
+                    if pending >= self.write_buffer:
+                        await asyncio.to_thread(_write_chunks, f, buffered)
+                        buffered, pending = [], 0
+                await asyncio.to_thread(_write_chunks, f, buffered)
+            except BaseException:
+                # Здесь и при отмене задачи, поэтому без await
+                f.close()
+                if not task.resume:
+                    part.unlink(missing_ok=True)
+                raise
+            await asyncio.to_thread(f.close)
+
+            if expected is not None and size != expected:
+                if size > expected or not task.resume:
+                    await asyncio.to_thread(part.unlink, missing_ok=True)
+                # Оборванный ответ - повторяемая ошибка
+                raise aiohttp.ClientPayloadError(f"получено {size} байт из {expected}")
+            digest = sha256.hexdigest()
+            if task.expected_sha256 and digest != task.expected_sha256:
+                await asyncio.to_thread(part.unlink, missing_ok=True)
+                raise DownloadError(f"контрольная сумма {digest} не совпадает с ожидаемой {task.expected_sha256}")
+            await asyncio.to_thread(os.replace, part, path)
+            return path, size, digest, offset
+
+    async def fetch_all(self, tasks: List[DownloadTask]) -> List[DownloadResult]:
+        """Скачивает файлы конкурентно (в пределах лимитов соединений), порядок результатов - как у tasks"""
+        return await asyncio.gather(*(self.fetch(task) for task in tasks))
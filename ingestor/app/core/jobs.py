@@ -0,0 +1,350 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JOBS_PATH = Path("data") / "jobs.sqlite"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Задача, внутри которой выполняется текущий код; задаётся менеджером задач
+current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    command: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    command: str
+    status: str
+    progress: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class JobProgressResponse(BaseModel):
+    job_id: str
+    status: str
+    progress: Dict[str, Any] = {}
+
+
+class JobStore:
+    """Состояние задач в SQLite: переживает перезапуск сервиса"""
+
+    def __init__(self, path: Path = DEFAULT_JOBS_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, command TEXT NOT NULL, args TEXT NOT NULL, status TEXT NOT NULL,"
+            " progress TEXT NOT NULL DEFAULT '{}', result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs(created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_command_status ON jobs(command, status)")
+        self._db.commit()
+
+    def create(self, command: str, args: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, command, args, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, command, json.dumps(jsonable_encoder(args), ensure_ascii=False), QUEUED, time.time()),
+            )
+            self._db.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        for name in ("progress", "result"):
+            if name in fields:
+                fields[name] = json.dumps(jsonable_encoder(fields[name]), ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                [*fields.values(), job_id],
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        params: list = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def count(self, status: str, command: Optional[str] = None) -> Dict[str, int]:
+        """Число задач в статусе status по командам"""
+        query = "SELECT command, COUNT(*) FROM jobs WHERE status = ?"
+        params: list = [status]
+        if command is not None:
+            query += " AND command = ?"
+            params.append(command)
+        with self._lock:
+            rows = self._db.execute(query + " GROUP BY command", params).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["args"] = json.loads(job["args"])
+        job["progress"] = json.loads(job["progress"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+
+class JobManager:
+    """Очередь длительных команд с ограниченным числом одновременно выполняемых задач.
+
+    Задачи выполняются в цикле приложения, поэтому команды делят с обычными
+    запросами общие клиенты (GigaChat, кэш эмбеддингов). После перезапуска задачи
+    из очереди запускаются снова, а прерванные на середине помечаются как failed.
+    Лимиты команды (app.core.limits) действуют и здесь: диспетчер берёт из очереди
+    только задачи, для команды которых есть свободное место, поэтому задача,
+    упёршаяся в лимит, не занимает ни одного из workers и не задерживает задачи
+    других команд. При заполненной очереди команды новая задача отклоняется с 429.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, progress_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.progress_interval = progress_interval
+        # Задачи в очереди в порядке постановки: job_id -> команда
+        self._pending: Dict[str, str] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._executing: Dict[str, asyncio.Task] = {}
+        # Занятые места лимитов запущенных задач; освобождаются по завершении задачи
+        self._slots: Dict[str, AsyncExitStack] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._progress_saved: Dict[str, float] = {}
+        # Идёт остановка сервиса: прерванные ею задачи не считаются отменёнными пользователем
+        self._stopping = False
+
+    async def start(self):
+        from app.core.limits import add_release_listener
+
+        self._wake = asyncio.Event()
+        self._stopping = False
+        for job in self.store.list(status=RUNNING, limit=10000):
+            self.store.update(job["id"], status=FAILED, error="Прервано перезапуском сервиса", finished_at=time.time())
+        for job in reversed(self.store.list(status=QUEUED, limit=10000)):
+            self._pending[job["id"]] = job["command"]
+        add_release_listener(self._wake.set)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        log.info(f"Задач одновременно: до {self.workers}, в очереди {len(self._pending)}")
+
+    async def stop(self):
+        from app.core.limits import remove_release_listener
+
+        self._stopping = True
+        if self._wake is not None:
+            remove_release_listener(self._wake.set)
+        tasks = [task for task in (self._dispatcher, *self._executing.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Задача, отменённая до первого шага, не успела освободить своё место
+        for stack in list(self._slots.values()):
+            await stack.aclose()
+        self._slots.clear()
+        self._dispatcher = None
+        self._executing.clear()
+
+    def submit(self, command: str, args: Dict[str, Any]) -> str:
+        from app.core.limits import get_limiter
+
+        if self._wake is None:
+            raise RuntimeError("Менеджер задач не запущен")
+        get_limiter(command).reject_if_full(self.queued(command))
+        job_id = self.store.create(command, args)
+        self._pending[job_id] = command
+        self._wake.set()
+        log.info(f"Задача {job_id} ({command}) поставлена в очередь")
+        return job_id
+
+    async def run_child(self, command: str, args: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        """Выполняет call как отдельную задачу прямо сейчас, в текущем контексте (шаг конвейера).
+
+        Место в лимите команды уже занято вызывающим, поэтому задача не проходит
+        через очередь и workers; статус, прогресс и отмена - как у обычной задачи."""
+        job_id = self.store.create(command, args)
+        log.info(f"Задача {job_id} ({command}) запущена как шаг задачи {current_job.get()}")
+        return {"job_id": job_id, **await self._run(job_id, call)}
+
+    def queued(self, command: str) -> int:
+        return self.store.count(QUEUED, command).get(command, 0)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        job = self.store.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+        if job_id in self._progress:
+            job["progress"] = self._progress[job_id]
+        return job
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        job = self.status(job_id)
+        if job["status"] == QUEUED:
+            self._pending.pop(job_id, None)
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+        elif job["status"] == RUNNING and job_id in self._running:
+            # Отмена срабатывает на ближайшем await внутри команды
+            self._running[job_id].cancel()
+        return self.status(job_id)
+
+    def report_progress(self, job_id: str, values: Dict[str, Any]):
+        progress = {**self._progress.get(job_id, {}), **values}
+        self._progress[job_id] = progress
+        now = time.monotonic()
+        if now - self._progress_saved.get(job_id, 0.0) >= self.progress_interval:
+            self._progress_saved[job_id] = now
+            self.store.update(job_id, progress=progress)
+
+    def _next_ready(self) -> Optional[str]:
+        """Первая в очереди задача, команда которой может начаться сразу"""
+        from app.core.limits import get_limiter
+        from app.core.registry import commands
+
+        for job_id, command in list(self._pending.items()):
+            if command not in commands:
+                del self._pending[job_id]
+                self.store.update(job_id, status=FAILED, error="Команда не найдена", finished_at=time.time())
+                continue
+            if get_limiter(command).available():
+                return job_id
+        return None
+
+    async def _dispatch(self):
+        """Запускает задачи, пока есть свободные workers и места в лимитах их команд;
+        просыпается при постановке задачи и при освобождении любого места"""
+        from app.core.limits import get_limiter
+
+        while True:
+            self._wake.clear()
+            while len(self._executing) < self.workers:
+                job_id = self._next_ready()
+                if job_id is None:
+                    break
+                command = self._pending.pop(job_id)
+                limiter = get_limiter(command)
+                # Место свободно, поэтому вход в slot не ждёт и его никто не перехватит
+                stack = AsyncExitStack()
+                lease = await stack.enter_async_context(limiter.slot(reject=False))
+                self._slots[job_id] = stack
+                self._executing[job_id] = asyncio.create_task(self._execute(job_id, limiter, lease, stack))
+            await self._wake.wait()
+
+    async def _execute(self, job_id: str, limiter, lease, stack: AsyncExitStack):
+        from app.core.registry import commands
+
+        try:
+            async with stack:
+                job = self.store.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    return
+                func = commands[job["command"]]["func"]
+                await self._run(job_id, lambda: limiter.run(func(**job["args"]), lease))
+        finally:
+            self._slots.pop(job_id, None)
+            self._executing.pop(job_id, None)
+            self._wake.set()
+
+    async def _run(self, job_id: str, call: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        token = current_job.set(job_id)
+        task = asyncio.create_task(call())
+        current_job.reset(token)
+        self._running[job_id] = task
+        fields: Dict[str, Any]
+        interrupted = False
+        try:
+            fields = {"status": SUCCEEDED, "result": await task}
+        except asyncio.CancelledError:
+            task.cancel()
+            if self._stopping:
+                fields = {"status": FAILED, "error": "Прервано остановкой сервиса"}
+            else:
+                fields = {"status": CANCELLED}
+            # Отменена не сама задача, а ожидающий её (остановка сервиса, отмена родительской задачи):
+            # после записи статуса отмена передаётся дальше
+            interrupted = self._stopping or asyncio.current_task().cancelling() > 0
+        except HTTPException as e:
+            fields = {"status": FAILED, "error": str(e.detail)}
+            if isinstance(e.detail, dict):
+                # Подробный отчёт об ошибке (например, шаги конвейера) сохраняется как результат
+                fields.update(error=str(e.detail.get("message", e.detail)), result=e.detail)
+        except Exception as e:
+            log.exception(f"Задача {job_id} завершилась с ошибкой")
+            fields = {"status": FAILED, "error": str(e)}
+        finally:
+            self._running.pop(job_id, None)
+            self._progress_saved.pop(job_id, None)
+        progress = self._progress.pop(job_id, None)
+        if progress is not None:
+            fields["progress"] = progress
+        self.store.update(job_id, finished_at=time.time(), **fields)
+        log.info(f"Задача {job_id}: {fields['status']}")
+        if interrupted:
+            raise asyncio.CancelledError
+        return fields
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Общий на процесс менеджер задач"""
+    global _manager
+    if _manager is None:
+        _manager = JobManager(
+            JobStore(Path(os.environ.get("INGESTOR_JOBS_PATH", DEFAULT_JOBS_PATH))),
+            workers=int(os.environ.get("INGESTOR_JOB_WORKERS", 2)),
+        )
+    return _manager
+
+
+def report_progress(**values):
+    """Обновляет прогресс текущей задачи; вне задачи ничего не делает"""
+    job_id = current_job.get()
+    if job_id is not None and _manager is not None:
+        _manager.report_progress(job_id, values)
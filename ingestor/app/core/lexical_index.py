@@ -0,0 +1,235 @@
+import logging
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+LEXICAL_FILE = "lexical.npz"
+
+# Длиннее - это base64, хэши и склеенный мусор из разметки, а не слова
+MAX_TOKEN_LENGTH = 40
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+# Окончания для лёгкого стемминга: сначала длинные, чтобы "ами" срезалось раньше "и"
+_SUFFIXES = sorted(
+    [
+        "иями", "ями", "ами", "иях", "ях", "ах", "ием", "ией",
+        "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их",
+        "ая", "яя", "ое", "ее", "ые", "ие", "ий", "ый", "ой", "ей", "ую", "юю",
+        "ом", "ем", "ам", "ям", "ов", "ев", "ию", "ия", "ии", "ью",
+        "ать", "ять", "ить", "еть", "ет", "ит", "ут", "ют", "ат", "ят",
+        "а", "я", "о", "е", "ы", "и", "у", "ю", "й", "ь",
+    ],
+    key=len,
+    reverse=True,
+)
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Лёгкий стеммер для русского: срезает одно окончание, оставляя основу не короче 3 букв"""
+    if len(word) <= 3 or not _CYRILLIC_RE.search(word):
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Нормализованные токены: без HTML-тегов, нижний регистр, ё -> е, стемминг русских слов.
+    Токены длиннее MAX_TOKEN_LENGTH отбрасываются."""
+    text = _TAG_RE.sub(" ", str(text)).lower().replace("ё", "е")
+    return [stem(token) for token in _TOKEN_RE.findall(text) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+class Terms:
+    """Отсортированный словарь терминов: UTF-8 байты всех терминов подряд и границы.
+
+    В отличие от массива NumPy со строками фиксированной ширины, память не
+    зависит от длины самого длинного термина. Порядок байтов UTF-8 совпадает
+    с порядком строк, поэтому поиск - бинарный по срезам байтов.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self._bytes = data.tobytes()
+
+    @classmethod
+    def from_sorted(cls, terms: List[str]) -> "Terms":
+        encoded = [term.encode("utf-8") for term in terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._bytes[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        return (self[i].decode("utf-8") for i in range(len(self)))
+
+    def find(self, term: str) -> int:
+        """Позиция термина в словаре или -1"""
+        encoded = term.encode("utf-8")
+        position = bisect_left(self, encoded)
+        return position if position < len(self) and self[position] == encoded else -1
+
+
+class LexicalIndex:
+    """Инвертированный индекс BM25 по документам скана.
+
+    Постинги хранятся в CSR-виде: документы термина terms[t] лежат в
+    docs[offsets[t]:offsets[t + 1]], а weights - их готовый вклад BM25 (k1, b
+    применены при построении), поэтому поиск - это сумма весов по терминам запроса.
+    """
+
+    def __init__(
+        self,
+        terms: Terms,
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        weights: np.ndarray,
+        idf: np.ndarray,
+        n_docs: int,
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.idf = idf
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc] = counts.get(doc, 0) + 1
+
+        n_docs = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        sorted_terms = sorted(postings)
+        sizes = np.array([len(postings[term]) for term in sorted_terms], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        docs = np.empty(offsets[-1], dtype=np.int32)
+        tf = np.empty(offsets[-1], dtype=np.float32)
+        for t, term in enumerate(sorted_terms):
+            counts = postings.pop(term)
+            docs[offsets[t]:offsets[t + 1]] = list(counts.keys())
+            tf[offsets[t]:offsets[t + 1]] = list(counts.values())
+
+        idf = np.log1p((n_docs - sizes + 0.5) / (sizes + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[docs] / avgdl)
+        weights = np.repeat(idf, sizes) * tf * (k1 + 1) / (tf + norm)
+        return cls(Terms.from_sorted(sorted_terms), offsets, docs, weights.astype(np.float32), idf, n_docs)
+
+    def _term_ids(self, tokens: List[str]) -> np.ndarray:
+        """Позиции терминов в словаре; -1 для слов, которых нет в корпусе"""
+        return np.array([self.terms.find(token) for token in tokens], dtype=np.int64)
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Top-k документов по BM25: (scores, docs, coverage).
+
+        coverage - доля IDF-массы запроса, найденная в документе: 1.0 означает,
+        что в документе есть все слова запроса.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        empty = np.empty(0, dtype=np.float32)
+        if not tokens or self.n_docs == 0:
+            return empty, empty.astype(np.int64), empty
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        # Накопление в float64 в том же порядке, что и total_idf: при всех словах запроса coverage ровно 1.0
+        matched = np.zeros(self.n_docs, dtype=np.float64)
+        # Слово вне словаря весит как самый редкий термин и снижает coverage
+        total_idf = 0.0
+        for t in self._term_ids(tokens):
+            if t < 0:
+                total_idf += math.log1p((self.n_docs + 0.5) / 0.5)
+                continue
+            rows = slice(self.offsets[t], self.offsets[t + 1])
+            scores[self.docs[rows]] += self.weights[rows]
+            matched[self.docs[rows]] += float(self.idf[t])
+            total_idf += float(self.idf[t])
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        coverage = matched[hits] / total_idf if total_idf > 0 else np.zeros(len(hits), dtype=np.float32)
+        return scores[hits], hits.astype(np.int64), coverage
+
+    def save(self, path: Path):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                term_data=self.terms.data,
+                term_offsets=self.terms.offsets,
+                offsets=self.offsets,
+                docs=self.docs,
+                weights=self.weights,
+                idf=self.idf,
+                n_docs=np.int64(self.n_docs),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        data = np.load(path)
+        terms = Terms(data["term_data"], data["term_offsets"])
+        return cls(terms, data["offsets"], data["docs"], data["weights"], data["idf"], int(data["n_docs"]))
+
+
+# Открытые индексы: scan_id -> (время создания индекса эмбеддингов, LexicalIndex)
+_lexical: Dict[int, tuple] = {}
+_lexical_lock = threading.Lock()
+
+
+def get_lexical_index(embedding_index) -> LexicalIndex:
+    """Лексический индекс по документам EmbeddingIndex.
+
+    Строится один раз на версию индекса эмбеддингов, сохраняется рядом с ним
+    и при следующих обращениях только загружается.
+    """
+    key = embedding_index.scan_id
+    created_at = embedding_index.manifest.get("created_at", 0)
+    cached = _lexical.get(key)
+    if cached is not None and cached[0] == created_at:
+        return cached[1]
+
+    # Построение блокирующее: вызывается из потока, одновременные запросы ждут одного построения
+    with _lexical_lock:
+        cached = _lexical.get(key)
+        if cached is not None and cached[0] == created_at:
+            return cached[1]
+        path = embedding_index.path / LEXICAL_FILE
+        if path.exists() and path.stat().st_mtime >= created_at:
+            index = LexicalIndex.load(path)
+        else:
+            text_column = embedding_index.manifest.get("text_column", "content")
+            index = LexicalIndex.build(embedding_index.documents.texts(text_column, embedding_index.ids))
+            index.save(path)
+            log.info(f"Построен лексический индекс {path}: {index.n_docs} документов, {len(index.terms)} терминов")
+        _lexical[key] = (created_at, index)
+    return index
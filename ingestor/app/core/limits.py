@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+log = logging.getLogger(__name__)
+
+RESOURCE_CLASSES = ("cpu", "io", "browser", "llm")
+
+# Вызываются при каждом освобождении места (например, диспетчер задач)
+_release_listeners: List[Callable[[], None]] = []
+
+
+def add_release_listener(listener: Callable[[], None]):
+    _release_listeners.append(listener)
+
+
+def remove_release_listener(listener: Callable[[], None]):
+    if listener in _release_listeners:
+        _release_listeners.remove(listener)
+
+
+def _resource_limit(resource: str) -> Optional[int]:
+    """Общий лимит класса ресурсов: INGESTOR_LIMIT_<CLASS>, 0 - без ограничения"""
+    defaults = {
+        "cpu": os.cpu_count() or 1,
+        "io": 0,
+        "browser": int(os.environ.get("INGESTOR_BROWSER_POOL_SIZE", 2)),
+        "llm": 16,
+    }
+    value = int(os.environ.get(f"INGESTOR_LIMIT_{resource.upper()}", defaults[resource]))
+    return value or None
+
+
+class Bulkhead:
+    """Семафор класса ресурсов, общий для всех его команд"""
+
+    def __init__(self, resource: str, limit: Optional[int]):
+        self.resource = resource
+        self.limit = limit
+        self.in_use = 0
+        self._semaphore = asyncio.Semaphore(limit) if limit else None
+
+    async def acquire(self):
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        self.in_use += 1
+
+    def release(self):
+        self.in_use -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def available(self) -> bool:
+        return self._semaphore is None or not self._semaphore.locked()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "in_use": self.in_use}
+
+
+class Lease:
+    """Занятое место лимита; run() отмечает в нём выполнение, которое место держит"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+
+class CommandLimiter:
+    """Ограничения одной команды: одновременные вызовы, длина очереди ожидания и таймаут.
+
+    Вызов сверх max_concurrency ждёт в очереди; если в ней уже queue_depth
+    вызовов, запрос сразу отклоняется с 429, не занимая ресурсов. По таймауту
+    клиент сразу получает 504, но место освобождается только когда команда
+    действительно завершится: работу в потоках и процессах отменить нельзя,
+    и без этого лимит пропускал бы новые вызовы поверх ещё идущих.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bulkhead: Bulkhead,
+        max_concurrency: Optional[int] = None,
+        queue_depth: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.bulkhead = bulkhead
+        self.max_concurrency = max_concurrency
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.running = 0
+        self.waiting = 0
+        # Вызовы, получившие 504, но ещё держащие место
+        self.overrunning = 0
+        self.counters = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def reject_if_full(self, waiting: Optional[int] = None):
+        """429, если в очереди уже queue_depth вызовов (waiting - своя очередь, например задач)"""
+        if waiting is None:
+            # Есть свободное место - ждать не придётся
+            if self.max_concurrency is None or self.running + self.waiting < self.max_concurrency:
+                return
+            waiting = self.waiting
+        if self.queue_depth is not None and waiting >= self.queue_depth:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Очередь команды {self.name} заполнена ({waiting}), повторите позже",
+                headers={"Retry-After": "1"},
+            )
+
+    def available(self) -> bool:
+        """Место свободно: slot() займёт его сразу, без ожидания"""
+        return (self._semaphore is None or not self._semaphore.locked()) and self.bulkhead.available()
+
+    @asynccontextmanager
+    async def slot(self, reject: bool = True) -> AsyncIterator[Lease]:
+        """Место для выполнения: сначала лимит команды, затем общий лимит класса ресурсов"""
+        if reject:
+            self.reject_if_full()
+        self.waiting += 1
+        queued = time.perf_counter()
+        acquired = False
+        try:
+            if self._semaphore is not None:
+                await self._semaphore.acquire()
+                acquired = True
+            await self.bulkhead.acquire()
+        except BaseException:
+            # Отмена во время ожидания: место в очереди освобождается
+            self.waiting -= 1
+            if acquired:
+                self._semaphore.release()
+            raise
+        self.waiting -= 1
+        started = time.perf_counter()
+        self._wait_seconds += started - queued
+        self.running += 1
+
+        def release(task: Optional[asyncio.Task] = None):
+            if task is not None:
+                self.overrunning -= 1
+                if not task.cancelled() and task.exception() is not None:
+                    log.warning(f"Команда {self.name} после таймаута завершилась с ошибкой: {task.exception()}")
+            self.running -= 1
+            self._run_seconds += time.perf_counter() - started
+            self.bulkhead.release()
+            if acquired:
+                self._semaphore.release()
+            for listener in _release_listeners:
+                listener()
+
+        lease = Lease()
+        try:
+            yield lease
+        finally:
+            if lease.task is not None and not lease.task.done():
+                # Команда продолжает работу после 504: место освободится по её завершении
+                self.overrunning += 1
+                lease.task.add_done_callback(release)
+            else:
+                release()
+
+    async def run(self, call: Awaitable[Any], lease: Optional[Lease] = None) -> Any:
+        """Выполняет корутину с таймаутом команды; превышение - 504.
+
+        С lease (место из slot()) команда по таймауту не отменяется, а доработает,
+        удерживая место; без него - отменяется, как asyncio.wait_for."""
+        try:
+            if self.timeout is None:
+                result = await call
+            elif lease is None:
+                result = await asyncio.wait_for(call, self.timeout)
+            else:
+                task = asyncio.ensure_future(call)
+                lease.task = task
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+                except asyncio.CancelledError:
+                    # Отмена вызывающего (отключение клиента, отмена задачи) отменяет и команду
+                    task.cancel()
+                    raise
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise HTTPException(status_code=504, detail=f"Команда {self.name} не уложилась в {self.timeout} с")
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        self.counters["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.counters["completed"] + self.counters["failed"] + self.counters["timeouts"]
+        return {
+            "resource": self.bulkhead.resource,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "timeout": self.timeout,
+            "running": self.running,
+            "waiting": self.waiting,
+            "overrunning": self.overrunning,
+            **self.counters,
+            "avg_wait_ms": round(self._wait_seconds / max(finished + self.running, 1) * 1000, 2),
+            "avg_run_ms": round(self._run_seconds / max(finished, 1) * 1000, 2),
+        }
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+_limiters: Dict[str, CommandLimiter] = {}
+
+
+def get_bulkhead(resource: str) -> Bulkhead:
+    if resource not in RESOURCE_CLASSES:
+        raise ValueError(f"Неизвестный класс ресурсов '{resource}', доступны: {', '.join(RESOURCE_CLASSES)}")
+    if resource not in _bulkheads:
+        _bulkheads[resource] = Bulkhead(resource, _resource_limit(resource))
+    return _bulkheads[resource]
+
+
+def get_limiter(name: str) -> CommandLimiter:
+    """Ограничитель команды по метаданным из register_command"""
+    if name not in _limiters:
+        from app.core.registry import commands
+
+        limits = commands[name].get("limits", {})
+        _limiters[name] = CommandLimiter(
+            name,
+            get_bulkhead(limits.get("resource", "io")),
+            max_concurrency=limits.get("max_concurrency"),
+            queue_depth=limits.get("queue_depth"),
+            timeout=limits.get("timeout"),
+        )
+    return _limiters[name]
+
+
+def limits_stats() -> Dict[str, Any]:
+    from app.core.registry import commands
+
+    return {
+        "commands": {name: get_limiter(name).stats() for name in commands},
+        "resources": {resource: get_bulkhead(resource).stats() for resource in RESOURCE_CLASSES},
+    }
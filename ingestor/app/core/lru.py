@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ByteLRU:
+    """LRU-кэш, ограниченный суммарным размером значений в байтах, с опциональным TTL.
+
+    Размер значения передаётся в put или считается функцией sizeof. Значение
+    больше всего бюджета не кэшируется.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: Optional[float] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._items: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[2] > self.ttl:
+                self._remove(key)
+                self._stats["expired"] += 1
+                item = None
+            if item is None:
+                if count:
+                    self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            if count:
+                self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        """Кладёт значение; False, если оно не помещается в бюджет целиком"""
+        if size is None:
+            size = self.sizeof(value) if self.sizeof is not None else 1
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            self._items[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+                self._stats["evicted"] += 1
+            return True
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._remove(key)
+            return item[0]
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Удаляет ключи, для которых predicate истинен (все ключи без predicate)"""
+        with self._lock:
+            keys = [key for key in self._items if predicate is None or predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._items.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._items), "bytes": self.bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field, ValidationError
+
+from app.core.jobs import report_progress
+
+log = logging.getLogger(__name__)
+
+MAX_STEPS = 16
+
+# Промежуточные данные, которые шаги конвейера передают друг другу в памяти
+RAW_DOCUMENTS = "raw_documents"
+CLEANED_TEXT = "cleaned_text"
+EMBEDDINGS = "embeddings"
+REGISTRY_CSV_FILE = "registry_csv_file"
+
+# Данные текущего конвейера: (scan_id, имя) -> значение; вне конвейера None
+_artifacts: ContextVar[Optional[Dict[Tuple[Optional[int], str], Any]]] = ContextVar("pipeline_artifacts", default=None)
+
+
+def get_artifact(name: str, scan_id: Optional[int] = None) -> Optional[Any]:
+    """Результат предыдущего шага конвейера; вне конвейера всегда None"""
+    artifacts = _artifacts.get()
+    return artifacts.get((scan_id, name)) if artifacts is not None else None
+
+
+def put_artifact(name: str, value: Any, scan_id: Optional[int] = None):
+    """Передаёт данные следующим шагам конвейера; вне конвейера ничего не делает"""
+    artifacts = _artifacts.get()
+    if artifacts is not None:
+        artifacts[(scan_id, name)] = value
+
+
+class PipelineStep(BaseModel):
+    id: str = Field(..., description="Имя шага, на него ссылаются after других шагов")
+    command: str = Field(..., description="Зарегистрированная команда")
+    args: Dict[str, Any] = Field({}, description="Аргументы команды; scan_id конвейера подставляется сам")
+    after: List[str] = Field([], description="Шаги, которые должны успешно завершиться раньше")
+
+
+class PipelineStepResult(BaseModel):
+    id: str
+    command: str
+    status: str
+    job_id: Optional[str] = None
+    started: Optional[float] = None
+    seconds: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+class PipelineResponse(BaseModel):
+    success: bool
+    steps: List[PipelineStepResult]
+    seconds: float
+    message: str = ""
+
+
+def _ordered(steps: List[PipelineStep]) -> List[PipelineStep]:
+    """Проверяет граф шагов и возвращает их в порядке зависимостей"""
+    from app.core.registry import commands
+
+    if not steps:
+        raise ValueError("Конвейер без шагов")
+    if len(steps) > MAX_STEPS:
+        raise ValueError(f"В конвейере больше {MAX_STEPS} шагов")
+    by_id = {step.id: step for step in steps}
+    if len(by_id) != len(steps):
+        raise ValueError("Имена шагов конвейера повторяются")
+    for step in steps:
+        if step.command not in commands:
+            raise ValueError(f"Шаг {step.id}: команда {step.command} не найдена")
+        if commands[step.command]["response_model"] is PipelineResponse:
+            # Вложенный конвейер ждал бы мест лимитов, занятых внешним, - взаимная блокировка
+            raise ValueError(f"Шаг {step.id}: команда {step.command} сама запускает конвейер и не может быть шагом")
+        unknown = [name for name in step.after if name not in by_id]
+        if unknown:
+            raise ValueError(f"Шаг {step.id}: неизвестные шаги в after: {unknown}")
+
+    ordered: List[PipelineStep] = []
+    done: set = set()
+    while len(ordered) < len(steps):
+        ready = [step for step in steps if step.id not in done and all(name in done for name in step.after)]
+        if not ready:
+            raise ValueError("Шаги конвейера образуют цикл")
+        ordered.extend(ready)
+        done.update(step.id for step in ready)
+    return ordered
+
+
+def _step_kwargs(step: PipelineStep, scan_id: Optional[int]) -> Dict[str, Any]:
+    from app.core.registry import commands
+
+    args_model = commands[step.command]["args_model"]
+    if args_model is None:
+        return {}
+    args = dict(step.args)
+    if scan_id is not None and "scan_id" in args_model.model_fields:
+        args.setdefault("scan_id", scan_id)
+    try:
+        return args_model.model_validate(args).model_dump()
+    except ValidationError as e:
+        raise ValueError(f"Шаг {step.id}: {e}")
+
+
+def check_pipeline(steps: List[PipelineStep], scan_id: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Аргументы шагов в порядке выполнения; ValueError, если граф или аргументы некорректны"""
+    return {step.id: _step_kwargs(step, scan_id) for step in _ordered(steps)}
+
+
+async def run_pipeline(steps: List[PipelineStep], scan_id: Optional[int] = None) -> Dict[str, Any]:
+    """Выполняет граф команд: независимые шаги параллельно, каждый - после своих after.
+
+    Шаги выполняются в пределах лимитов своих команд (app.core.limits). Шаги
+    с фоновыми командами (job=True) становятся дочерними задачами (app.core.jobs):
+    у них свой статус, прогресс и отмена, но worker не занимается - его уже держит
+    конвейер. Данные между шагами идут через get_artifact/put_artifact, а не
+    повторным чтением из ClickHouse. Ошибка шага пропускает только зависящие от него шаги;
+    если хотя бы один шаг не выполнен, после остальных поднимается HTTPException 500
+    с отчётом по шагам в detail.
+    """
+    from app.core.jobs import SUCCEEDED, get_job_manager
+    from app.core.limits import get_limiter
+    from app.core.registry import commands
+
+    try:
+        kwargs = check_pipeline(steps, scan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    by_id = {step.id: step for step in steps}
+    ordered = [by_id[step_id] for step_id in kwargs]
+    results: Dict[str, Dict[str, Any]] = {
+        step.id: PipelineStepResult(id=step.id, command=step.command, status="pending").model_dump() for step in steps
+    }
+    started = time.perf_counter()
+
+    def progress():
+        report_progress(steps={step_id: result["status"] for step_id, result in results.items()})
+
+    async def run_step(step: PipelineStep, dependencies: List[asyncio.Task]) -> bool:
+        record = results[step.id]
+        if not all(await asyncio.gather(*dependencies)):
+            record["status"] = "skipped"
+            progress()
+            return False
+        meta = commands[step.command]
+        limiter = get_limiter(step.command)
+        async with limiter.slot(reject=False) as lease:
+            record["status"] = "running"
+            record["started"] = round(time.perf_counter() - started, 3)
+            progress()
+            step_started = time.perf_counter()
+
+            async def call():
+                return await limiter.run(meta["func"](**kwargs[step.id]), lease)
+
+            try:
+                if meta["job"]:
+                    job = await get_job_manager().run_child(step.command, kwargs[step.id], call)
+                    record["job_id"] = job["job_id"]
+                    if job["status"] != SUCCEEDED:
+                        # Ошибку дочерней задачи уже сохранил и записал в лог менеджер задач
+                        raise HTTPException(status_code=500, detail=job.get("error") or f"задача {job['status']}")
+                    result = job["result"]
+                else:
+                    result = await call()
+                if isinstance(result, Response):
+                    raise ValueError("потоковые команды в конвейере не поддерживаются")
+                record.update(status="succeeded", result=result)
+            except HTTPException as e:
+                record.update(status="failed", error=str(e.detail))
+            except Exception as e:
+                log.exception(f"Шаг конвейера {step.id} ({step.command}) завершился с ошибкой")
+                record.update(status="failed", error=str(e))
+            record["seconds"] = round(time.perf_counter() - step_started, 3)
+        log.info(f"Шаг конвейера {step.id} ({step.command}): {record['status']} за {record['seconds']} с")
+        progress()
+        return record["status"] == "succeeded"
+
+    token = _artifacts.set({})
+    try:
+        tasks: Dict[str, asyncio.Task] = {}
+        for step in ordered:
+            tasks[step.id] = asyncio.create_task(run_step(step, [tasks[name] for name in step.after]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+    finally:
+        _artifacts.reset(token)
+
+    elapsed = time.perf_counter() - started
+    failed = [step_id for step_id, result in results.items() if result["status"] != "succeeded"]
+    response = {
+        "success": not failed,
+        "steps": [results[step.id] for step in steps],
+        "seconds": round(elapsed, 3),
+        "message": f"Конвейер выполнен за {elapsed:.2f} с" + (f", не выполнены шаги: {', '.join(failed)}" if failed else ""),
+    }
+    if failed:
+        # Конвейер с невыполненными шагами - ошибка: задача получает статус failed, отчёт по шагам сохраняется
+        raise HTTPException(status_code=500, detail=response)
+    return response
@@ -1,7 +1,14 @@
 from __future__ import annotations
 from typing import Optional, Callable, Any
 from pydantic import BaseModel
+import asyncio
+import importlib
+import logging
 import re
+import time
+from app.core.limits import RESOURCE_CLASSES
+
+log = logging.getLogger(__name__)
 
 commands: dict[str, dict] = {}
 
@@ -17,8 +24,25 @@ def register_command(
     args_model: Optional[type[BaseModel]] = None,
     response_model: Optional[type[BaseModel]] = None,
     description: str = "",
+    job: bool = False,
+    resource: str = "io",
+    max_concurrency: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+    timeout: Optional[float] = None,
+    cache_ttl: Optional[float] = None,
 ):
-    """Декоратор для регистрации команд с метаданными"""
+    """Декоратор для регистрации команд с метаданными.
+
+    job=True - длительная команда: POST сразу возвращает job_id, а сама команда
+    выполняется в пуле воркеров (см. app.core.jobs).
+
+    resource (cpu/io/browser/llm), max_concurrency, queue_depth и timeout - лимиты
+    выполнения (см. app.core.limits): вызовы сверх max_concurrency ждут в очереди,
+    при заполненной очереди запрос отклоняется с 429.
+
+    cache_ttl - результат команды кэшируется на cache_ttl секунд по хэшу аргументов
+    (см. app.core.result_cache); только для команд без побочных эффектов.
+    """
     _ensure_command_name(command_name)
     if args_model is not None and not issubclass(args_model, BaseModel):
         raise TypeError("args_model должен наследовать BaseModel")
@@ -26,6 +50,10 @@ def register_command(
         raise TypeError("response_model должен наследовать BaseModel")
     if command_name in commands:
         raise ValueError(f"Команда '{command_name}' уже зарегистрирована")
+    if resource not in RESOURCE_CLASSES:
+        raise ValueError(f"Неизвестный класс ресурсов '{resource}', доступны: {', '.join(RESOURCE_CLASSES)}")
+    if job and cache_ttl is not None:
+        raise ValueError("cache_ttl не применяется к фоновым задачам: их результат хранится в задаче")
 
     def decorator(func: Callable[..., Any]):
         commands[command_name] = {
@@ -33,12 +61,71 @@ def register_command(
             "args_model": args_model,
             "response_model": response_model,
             "description": description,
+            "job": job,
+            "cache_ttl": cache_ttl,
+            "limits": {
+                "resource": resource,
+                "max_concurrency": max_concurrency,
+                "queue_depth": queue_depth,
+                "timeout": timeout,
+            },
         }
         return func
 
     return decorator
 
 
+class LazyCommand:
+    """Команда, модуль которой импортируется при первом вызове ("пакет.модуль:функция").
+
+    Импорт идёт в отдельном потоке, чтобы не останавливать цикл событий на время
+    загрузки selenium, sklearn и GigaChat SDK.
+    """
+
+    def __init__(self, target: str):
+        self.target = target
+        self.module, _, self.__name__ = target.partition(":")
+        self._func: Optional[Callable[..., Any]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def load(self) -> Callable[..., Any]:
+        if self._func is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self.module)
+            self._func = getattr(module, self.__name__)
+            log.info(f"Команда {self.target} загружена за {time.perf_counter() - started:.2f} с")
+        return self._func
+
+    async def __call__(self, *args, **kwargs):
+        func = self._func or await asyncio.to_thread(self.load)
+        return await func(*args, **kwargs)
+
+
+def register_lazy_command(target: str, command_name: str, **options):
+    """Регистрирует команду по метаданным (см. register_command) без импорта её реализации"""
+    register_command(command_name, **options)(LazyCommand(target))
+
+
+async def warm_up_commands():
+    """Фоновый импорт реализаций команд после старта, чтобы первый вызов не ждал импорта"""
+    started = time.perf_counter()
+    lazy = [meta["func"] for meta in commands.values() if isinstance(meta["func"], LazyCommand)]
+    modules = {}
+    for command in lazy:
+        modules.setdefault(command.module, []).append(command)
+    for module, module_commands in modules.items():
+        try:
+            for command in module_commands:
+                await asyncio.to_thread(command.load)
+        except Exception as e:
+            # Ошибка импорта повторится и будет видна при вызове команды
+            log.error(f"Не удалось загрузить {module}: {e}")
+    log.info(f"Прогрев команд завершён за {time.perf_counter() - started:.2f} с ({len(modules)} модулей)")
+
+
 # from typing import Callable, Optional
 # from pydantic import BaseModel
 
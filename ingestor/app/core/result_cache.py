@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app.core.lru import ByteLRU
+
+log = logging.getLogger(__name__)
+
+
+def args_hash(args: Dict[str, Any]) -> str:
+    """Хэш аргументов команды, не зависящий от порядка полей"""
+    encoded = json.dumps(jsonable_encoder(args), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _encoded(result: Any) -> Tuple[Any, int]:
+    value = jsonable_encoder(result)
+    return value, len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+class ResultCache:
+    """Кэш результатов команд и ответов по ключу идемпотентности.
+
+    Результат команды с cache_ttl хранится по ключу (команда, scan_id, хэш
+    аргументов) и сбрасывается по scan_id. Повтор запроса с тем же заголовком
+    Idempotency-Key возвращает сохранённый ответ (для фоновых задач - тот же
+    job_id), не выполняя команду снова. Одинаковые запросы, пришедшие
+    одновременно, выполняются один раз.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, idempotency_ttl: float = 24 * 3600):
+        self.results = ByteLRU(max_bytes)
+        self.idempotency = ByteLRU(max_bytes // 4, ttl=idempotency_ttl)
+        # Выполняющиеся команды: ключ -> [задача, число ожидающих её результата]
+        self._inflight: Dict[tuple, list] = {}
+        # Растёт при каждом сбросе: результат, начатый до сброса, не сохраняется
+        self._generation = 0
+
+    def get(self, command: str, args: Dict[str, Any]) -> Optional[Any]:
+        key = (command, args.get("scan_id"), args_hash(args))
+        entry = self.results.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            self.results.pop(key)
+            return None
+        return value
+
+    def put(self, command: str, args: Dict[str, Any], result: Any, ttl: float) -> bool:
+        value, size = _encoded(result)
+        return self.results.put((command, args.get("scan_id"), args_hash(args)), (time.monotonic() + ttl, value), size)
+
+    async def call(
+        self,
+        command: str,
+        args: Dict[str, Any],
+        run: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Any:
+        """Результат команды из кэша или от run; без ttl и ключа идемпотентности - просто run"""
+        fingerprint = (command, args_hash(args))
+        if idempotency_key is not None:
+            stored = self.idempotency.get(idempotency_key)
+            if stored is not None:
+                if stored[0] != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail=f"Ключ идемпотентности {idempotency_key} уже использован с другой командой или аргументами",
+                    )
+                return stored[1]
+        if ttl is not None:
+            cached = self.get(command, args)
+            if cached is not None:
+                return cached
+
+        if ttl is None and idempotency_key is None:
+            return await run()
+        flight = ("idempotency", idempotency_key) if idempotency_key is not None else ("result", *fingerprint)
+        entry = self._inflight.get(flight)
+        if entry is None:
+            # Команда выполняется отдельной задачей: отмена одного из ожидающих
+            # (например, отключение клиента-инициатора) не прерывает её для остальных
+            task = asyncio.ensure_future(
+                self._run(flight, command, args, run, ttl, idempotency_key, fingerprint, self._generation)
+            )
+            entry = self._inflight[flight] = [task, 0]
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1:
+                # Ждать результата больше некому; новый такой же запрос начнёт заново
+                task.cancel()
+                if self._inflight.get(flight) is entry:
+                    del self._inflight[flight]
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def _run(
+        self,
+        flight: tuple,
+        command: str,
+        args: Dict[str, Any],
+        run: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+        idempotency_key: Optional[str],
+        fingerprint: tuple,
+        generation: int,
+    ) -> Any:
+        try:
+            result = await run()
+        finally:
+            entry = self._inflight.get(flight)
+            if entry is not None and entry[0] is asyncio.current_task():
+                del self._inflight[flight]
+
+        # Потоковые ответы не сохраняются: тело уже отдаётся клиенту
+        if not isinstance(result, Response):
+            if ttl is not None and generation == self._generation:
+                self.put(command, args, result, ttl)
+            if idempotency_key is not None:
+                value, size = _encoded(result)
+                self.idempotency.put(idempotency_key, (fingerprint, value), size)
+        return result
+
+    def invalidate(self, scan_id: Optional[int] = None, command: Optional[str] = None) -> int:
+        """Сбрасывает результаты по scan_id и/или команде (все - без фильтров)"""
+        self._generation += 1
+        removed = self.results.invalidate(
+            lambda key: (scan_id is None or key[1] == scan_id) and (command is None or key[0] == command)
+        )
+        if removed:
+            log.info(f"Сброшено результатов команд: {removed} (scan_id={scan_id}, команда={command})")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {"results": self.results.stats(), "idempotency": self.idempotency.stats()}
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache(
+            max_bytes=int(os.environ.get("INGESTOR_RESULT_CACHE_MB", 64)) * 1024 * 1024,
+            idempotency_ttl=float(os.environ.get("INGESTOR_IDEMPOTENCY_TTL", 24 * 3600)),
+        )
+    return _cache
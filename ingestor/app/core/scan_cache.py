@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from app.core.lru import ByteLRU
+from app.db.scan_source import Row, ScanSource, get_scan_source
+
+log = logging.getLogger(__name__)
+
+
+def rows_nbytes(rows: List[Row]) -> int:
+    """Оценка памяти, занятой строками скана (список, словари и значения)"""
+    total = sys.getsizeof(rows)
+    for row in rows:
+        total += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+    return total
+
+
+class ScanCache:
+    """Общий на процесс кэш строк сканов поверх ScanSource.
+
+    Ключ - (scan_id, колонки); кэш ограничен по байтам, записи живут не дольше ttl.
+    Повторные команды по тому же скану (clear_tags, затем подготовка эмбеддингов)
+    читают его из памяти, а не из ClickHouse. Скан, не помещающийся в бюджет,
+    отдаётся потоком без кэширования.
+    """
+
+    def __init__(self, source: Optional[ScanSource] = None, max_bytes: int = 512 * 1024 * 1024, ttl: float = 600.0):
+        self._source = source
+        self.lru = ByteLRU(max_bytes, ttl=ttl)
+        self._loading: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def source(self) -> ScanSource:
+        return self._source or get_scan_source()
+
+    async def aiter_scan(
+        self, scan_id: int, columns: Sequence[str] = ("content",), batch_size: int = 1000
+    ) -> AsyncIterator[List[Row]]:
+        """Строки скана пачками: из кэша или из источника с попутным заполнением кэша"""
+        key = (scan_id, tuple(columns))
+        loading = self._loading.get(key)
+        if loading is not None:
+            # Тот же скан уже читается другой командой - ждём её вместо второго запроса
+            await asyncio.shield(loading)
+
+        rows = self.lru.get(key)
+        if rows is not None:
+            for start in range(0, len(rows), batch_size):
+                yield rows[start:start + batch_size]
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        collected: Optional[List[Row]] = []
+        size = 0
+        try:
+            async for batch in self.source.aiter_scan(scan_id, columns=columns, batch_size=batch_size):
+                if collected is not None:
+                    size += rows_nbytes(batch)
+                    if size > self.lru.max_bytes:
+                        log.info(f"Скан {scan_id} больше бюджета кэша ({self.lru.max_bytes} байт), не кэшируется")
+                        collected = None
+                    else:
+                        collected.extend(batch)
+                yield batch
+            if collected is not None:
+                self.lru.put(key, collected, size)
+        finally:
+            self._loading.pop(key, None)
+            future.set_result(None)
+
+    async def get_rows(self, scan_id: int, columns: Sequence[str] = ("content",)) -> List[Row]:
+        rows: List[Row] = []
+        async for batch in self.aiter_scan(scan_id, columns):
+            rows.extend(batch)
+        return rows
+
+    def invalidate(self, scan_id: Optional[int] = None) -> int:
+        """Сбрасывает записи скана scan_id (или весь кэш), возвращает число удалённых записей"""
+        removed = self.lru.invalidate(None if scan_id is None else lambda key: key[0] == scan_id)
+        log.info(f"Кэш сканов: удалено {removed} записей" + ("" if scan_id is None else f" для scan_id={scan_id}"))
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return self.lru.stats()
+
+
+_cache: Optional[ScanCache] = None
+
+
+def get_scan_cache() -> ScanCache:
+    """Единая точка доступа команд к данным сканов"""
+    global _cache
+    if _cache is None:
+        _cache = ScanCache(
+            max_bytes=int(os.environ.get("INGESTOR_SCAN_CACHE_BYTES", 512 * 1024 * 1024)),
+            ttl=float(os.environ.get("INGESTOR_SCAN_CACHE_TTL", 600)),
+        )
+    return _cache
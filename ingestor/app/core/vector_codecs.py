@@ -0,0 +1,179 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Строк кодов, переводимых в float32 за раз: временная копия 8192 x 1024 - 32 МБ
+DECODE_BLOCK = 8192
+
+
+class VectorCodec:
+    """Сжатое представление матрицы эмбеддингов в памяти.
+
+    score считает скалярные произведения нормированных запросов со строками
+    start:end прямо по сжатым кодам, без восстановления всей матрицы.
+    """
+
+    name = ""
+
+    def __init__(self, codes: np.ndarray, pca_mean: Optional[np.ndarray] = None, pca_components: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.pca_mean = pca_mean
+        self.pca_components = pca_components
+
+    @property
+    def nbytes(self) -> int:
+        extra = 0
+        if self.pca_components is not None:
+            extra = self.pca_mean.nbytes + self.pca_components.nbytes
+        return int(self.codes.nbytes + extra + self._params_nbytes())
+
+    def _params_nbytes(self) -> int:
+        return 0
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, pca_dim: Optional[int] = None, sample_size: int = 50000, seed: int = 0) -> "VectorCodec":
+        """Кодирует матрицу; при pca_dim сначала проецирует её на главные компоненты корпуса"""
+        pca_mean = pca_components = None
+        if pca_dim is not None and pca_dim < vectors.shape[1]:
+            pca_mean, pca_components = _fit_pca(vectors, pca_dim, sample_size, seed)
+            vectors = _project_blocks(vectors, pca_mean, pca_components)
+        return cls._encode(np.asarray(vectors, dtype=np.float32), pca_mean, pca_components)
+
+    @classmethod
+    def _encode(cls, vectors: np.ndarray, pca_mean, pca_components) -> "VectorCodec":
+        raise NotImplementedError
+
+    def prepare_queries(self, queries: np.ndarray):
+        """Запросы в пространстве кодов и постоянная добавка к скору от центрирования PCA"""
+        if self.pca_components is None:
+            return queries.astype(np.float32), np.zeros((queries.shape[0], 1), dtype=np.float32)
+        # q·x = q·mean + (P q)·P(x - mean), остаток вне главных компонент отбрасывается
+        return (queries @ self.pca_components.T).astype(np.float32), (queries @ self.pca_mean)[:, None]
+
+    def score(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        projected, bias = self.prepare_queries(queries)
+        return self._score_codes(projected, start, end) + bias
+
+    def _score_codes(self, projected: np.ndarray, start: int, end: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def save(self, path: Path):
+        arrays = {"codes": self.codes, **self._params()}
+        if self.pca_components is not None:
+            arrays.update(pca_mean=self.pca_mean, pca_components=self.pca_components)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def _params(self) -> dict:
+        return {}
+
+    @classmethod
+    def load(cls, path: Path) -> "VectorCodec":
+        data = np.load(path)
+        codec = cls(data["codes"], data.get("pca_mean"), data.get("pca_components"))
+        codec._load_params(data)
+        return codec
+
+    def _load_params(self, data):
+        pass
+
+
+class Float32Codec(VectorCodec):
+    """Без сжатия (4 байта на измерение), полезен вместе с PCA"""
+
+    name = "float32"
+
+    @classmethod
+    def _encode(cls, vectors, pca_mean, pca_components):
+        return cls(np.ascontiguousarray(vectors, dtype=np.float32), pca_mean, pca_components)
+
+    def _score_codes(self, projected, start, end):
+        return projected @ self.codes[start:end].T
+
+
+class Float16Codec(VectorCodec):
+    """Половинная точность (2 байта на измерение), коды переводятся в float32 по DECODE_BLOCK строк на время скоринга"""
+
+    name = "float16"
+
+    @classmethod
+    def _encode(cls, vectors, pca_mean, pca_components):
+        return cls(vectors.astype(np.float16), pca_mean, pca_components)
+
+    def _score_codes(self, projected, start, end):
+        return _decoded_dot(projected, self.codes[start:end])
+
+
+class Int8Codec(VectorCodec):
+    """Скалярное квантование по измерениям (1 байт на измерение): x ≈ (code + 128) * scale + low.
+
+    Скор считается по кодам: q·x = (q * scale)·code + (q * scale)·128 + q·low.
+    """
+
+    name = "int8"
+
+    def __init__(self, codes, pca_mean=None, pca_components=None, scale=None, low=None):
+        super().__init__(codes, pca_mean, pca_components)
+        self.scale = scale
+        self.low = low
+
+    def _params_nbytes(self) -> int:
+        return self.scale.nbytes + self.low.nbytes
+
+    @classmethod
+    def _encode(cls, vectors, pca_mean, pca_components):
+        low = vectors.min(axis=0)
+        scale = np.maximum(vectors.max(axis=0) - low, 1e-12) / 255.0
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, vectors.shape[0], 65536):
+            block = vectors[start:start + 65536]
+            codes[start:start + 65536] = (np.rint((block - low) / scale) - 128).astype(np.int8)
+        return cls(codes, pca_mean, pca_components, scale.astype(np.float32), low.astype(np.float32))
+
+    def _score_codes(self, projected, start, end):
+        weighted = projected * self.scale
+        bias = weighted.sum(axis=1, keepdims=True) * 128.0 + projected @ self.low[:, None]
+        return _decoded_dot(weighted, self.codes[start:end]) + bias
+
+    def _params(self):
+        return {"scale": self.scale, "low": self.low}
+
+    def _load_params(self, data):
+        self.scale = data["scale"]
+        self.low = data["low"]
+
+
+def _decoded_dot(queries: np.ndarray, codes: np.ndarray, block_size: int = DECODE_BLOCK) -> np.ndarray:
+    """queries @ codes.T, коды переводятся в float32 кусками по block_size строк, а не целиком"""
+    scores = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+    for start in range(0, codes.shape[0], block_size):
+        scores[:, start:start + block_size] = queries @ codes[start:start + block_size].astype(np.float32).T
+    return scores
+
+
+def _fit_pca(vectors: np.ndarray, dim: int, sample_size: int, seed: int):
+    """Среднее и главные компоненты по случайной выборке корпуса"""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))], dtype=np.float32)
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return mean.astype(np.float32), vt[:dim].astype(np.float32)
+
+
+def _project_blocks(vectors: np.ndarray, mean: np.ndarray, components: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    projected = np.empty((vectors.shape[0], components.shape[0]), dtype=np.float32)
+    for start in range(0, vectors.shape[0], block_size):
+        projected[start:start + block_size] = (np.asarray(vectors[start:start + block_size]) - mean) @ components.T
+    return projected
+
+
+CODECS = {
+    Float32Codec.name: Float32Codec,
+    Float16Codec.name: Float16Codec,
+    Int8Codec.name: Int8Codec,
+}
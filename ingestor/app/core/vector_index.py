@@ -0,0 +1,414 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.chunking import aggregate_chunks, chunk_documents
+from app.core.vector_codecs import CODECS, VectorCodec
+
+log = logging.getLogger(__name__)
+
+# recall@10 >= 0.95 на benchmarks.ann_recall (100k векторов, nlist по умолчанию,
+# запросы вдали от документов): nprobe=8 давал ~0.75, 16 - ~0.89, 32 - ~0.96
+# при задержке примерно вдвое меньше точного перебора
+DEFAULT_NPROBE = 32
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k по каждой строке за O(N) через argpartition, затем сортировка только k элементов"""
+    n = scores.shape[1]
+    k = min(top_k, n)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), (scores.shape[0], n))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def score_documents(
+    vectors: np.ndarray, queries: np.ndarray, docs: np.ndarray, offsets: np.ndarray, aggregation: str = "max"
+) -> np.ndarray:
+    """Точные скоры (n_queries, len(docs)) выбранных документов по их чанкам.
+
+    Читаются только строки чанков этих документов, поэтому матрица может быть mmap.
+    """
+    counts = offsets[docs + 1] - offsets[docs]
+    local_offsets = np.concatenate([[0], np.cumsum(counts)])
+    rows = np.repeat(offsets[docs] - local_offsets[:-1], counts) + np.arange(local_offsets[-1])
+    return aggregate_chunks(queries @ np.asarray(vectors[rows]).T, local_offsets, aggregation)
+
+
+class VectorIndex:
+    """Базовый интерфейс векторного индекса над нормированной матрицей.
+
+    search возвращает (scores, positions) формы (n_queries, top_k), где positions -
+    номера строк матрицы; -1 означает, что кандидатов меньше top_k.
+    """
+
+    name = ""
+
+    def search(self, queries: np.ndarray, top_k: int, **params) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def search_documents(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        offsets: np.ndarray,
+        aggregation: str = "max",
+        candidates: int = 8,
+        **params,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k документов, когда у документа несколько векторов-чанков.
+
+        offsets - границы чанков документов (n_docs + 1). По умолчанию индекс отдаёт
+        top_k * candidates лучших чанков, и документы агрегируются только по ним,
+        поэтому mean здесь - среднее по найденным чанкам документа.
+        """
+        n_docs = len(offsets) - 1
+        if n_docs == self.vectors.shape[0]:
+            return self.search(queries, top_k, **params)
+
+        chunk_doc = chunk_documents(offsets)
+        scores, positions = self.search(queries, top_k * candidates, **params)
+        scores_out = np.full((queries.shape[0], top_k), -np.inf, dtype=np.float32)
+        ids_out = np.full((queries.shape[0], top_k), -1, dtype=np.int64)
+        for row in range(queries.shape[0]):
+            found = positions[row] >= 0
+            docs = chunk_doc[positions[row][found]]
+            chunk_scores = scores[row][found]
+            unique_docs, inverse = np.unique(docs, return_inverse=True)
+            if aggregation == "max":
+                doc_scores = np.full(len(unique_docs), -np.inf, dtype=np.float32)
+                np.maximum.at(doc_scores, inverse, chunk_scores)
+            elif aggregation == "mean":
+                doc_scores = np.bincount(inverse, weights=chunk_scores) / np.bincount(inverse)
+            else:
+                raise ValueError(f"Неизвестная агрегация '{aggregation}', доступны: max, mean")
+            best_scores, best = top_k_rows(doc_scores[None, :], top_k)
+            k = best.shape[1]
+            scores_out[row, :k] = best_scores[0]
+            ids_out[row, :k] = unique_docs[best[0]]
+        return scores_out, ids_out
+
+
+class ExactIndex(VectorIndex):
+    """Точный поиск перебором. Матрица обходится блоками, чтобы ограничить память под скоры"""
+
+    name = "exact"
+
+    def __init__(self, vectors: np.ndarray, block_size: int = 65536):
+        self.vectors = vectors
+        self.block_size = block_size
+
+    def _score_block(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        return queries @ np.asarray(self.vectors[start:end]).T
+
+    def search(self, queries: np.ndarray, top_k: int, **params) -> Tuple[np.ndarray, np.ndarray]:
+        n = self.vectors.shape[0]
+        if n <= self.block_size:
+            return top_k_rows(self._score_block(queries, 0, n), top_k)
+
+        best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((queries.shape[0], 0), dtype=np.int64)
+        for start in range(0, n, self.block_size):
+            scores, ids = top_k_rows(self._score_block(queries, start, min(start + self.block_size, n)), top_k)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_ids = np.concatenate([best_ids, ids + start], axis=1)
+            best_scores, order = top_k_rows(merged_scores, top_k)
+            best_ids = np.take_along_axis(merged_ids, order, axis=1)
+        return best_scores, best_ids
+
+    def search_documents(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        offsets: np.ndarray,
+        aggregation: str = "max",
+        **params,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Точная агрегация по всем чанкам: блоки матрицы выровнены по границам документов,
+        скоры документов считаются одним reduceat на блок"""
+        n_docs = len(offsets) - 1
+        if n_docs == self.vectors.shape[0]:
+            return self.search(queries, top_k, **params)
+
+        doc_scores = np.empty((queries.shape[0], n_docs), dtype=np.float32)
+        doc_start = 0
+        while doc_start < n_docs:
+            doc_end = int(np.searchsorted(offsets, offsets[doc_start] + self.block_size, side="right")) - 1
+            doc_end = min(max(doc_end, doc_start + 1), n_docs)
+            doc_scores[:, doc_start:doc_end] = aggregate_chunks(
+                self._score_block(queries, int(offsets[doc_start]), int(offsets[doc_end])),
+                offsets[doc_start:doc_end + 1],
+                aggregation,
+            )
+            doc_start = doc_end
+        return top_k_rows(doc_scores, top_k)
+
+
+class CompressedIndex(ExactIndex):
+    """Перебор по сжатой копии матрицы (float16, int8, опционально после PCA).
+
+    rerank > 0 - число лучших кандидатов, которые пересчитываются точно по исходной
+    float32 матрице (она остаётся на диске через mmap и читается только для кандидатов).
+    """
+
+    name = "compressed"
+
+    def __init__(self, vectors: np.ndarray, codec: VectorCodec, rerank: int = 0, block_size: int = 65536):
+        super().__init__(vectors, block_size)
+        self.codec = codec
+        self.rerank = rerank
+
+    def _score_block(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        return self.codec.score(queries, start, end)
+
+    def search(self, queries: np.ndarray, top_k: int, rerank: Optional[int] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+        rerank = self.rerank if rerank is None else rerank
+        scores, ids = super().search(queries, max(top_k, rerank))
+        if rerank <= 0:
+            return scores, ids
+
+        scores_out = np.full((queries.shape[0], top_k), -np.inf, dtype=np.float32)
+        ids_out = np.full((queries.shape[0], top_k), -1, dtype=np.int64)
+        for row in range(queries.shape[0]):
+            candidates = np.sort(ids[row][ids[row] >= 0])
+            exact = np.asarray(self.vectors[candidates]) @ queries[row]
+            best_scores, best = top_k_rows(exact[None, :], top_k)
+            k = best.shape[1]
+            scores_out[row, :k] = best_scores[0]
+            ids_out[row, :k] = candidates[best[0]]
+        return scores_out, ids_out
+
+    def search_documents(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        offsets: np.ndarray,
+        aggregation: str = "max",
+        rerank: Optional[int] = None,
+        **params,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        n_docs = len(offsets) - 1
+        if n_docs == self.vectors.shape[0]:
+            return self.search(queries, top_k, rerank=rerank)
+
+        rerank = self.rerank if rerank is None else rerank
+        scores, docs = super().search_documents(queries, max(top_k, rerank), offsets, aggregation)
+        if rerank <= 0:
+            return scores, docs
+
+        scores_out = np.full((queries.shape[0], top_k), -np.inf, dtype=np.float32)
+        ids_out = np.full((queries.shape[0], top_k), -1, dtype=np.int64)
+        for row in range(queries.shape[0]):
+            candidates = np.sort(docs[row][docs[row] >= 0])
+            doc_scores = score_documents(self.vectors, queries[row:row + 1], candidates, offsets, aggregation)
+            best_scores, best = top_k_rows(doc_scores, top_k)
+            k = best.shape[1]
+            scores_out[row, :k] = best_scores[0]
+            ids_out[row, :k] = candidates[best[0]]
+        return scores_out, ids_out
+
+
+class IVFIndex(VectorIndex):
+    """Приближённый поиск IVF: сферический k-means разбивает векторы на nlist списков,
+    запрос сканирует только nprobe ближайших списков.
+
+    Ручки: nlist (больше - быстрее и ниже recall при том же nprobe), nprobe (больше - выше
+    recall и задержка, по умолчанию DEFAULT_NPROBE), train_size/iterations влияют только
+    на время построения.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: int = DEFAULT_NPROBE,
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @staticmethod
+    def default_nlist(n: int) -> int:
+        return int(max(1, min(4096, round(4 * np.sqrt(n)))))
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        iterations: int = 10,
+        train_size: int = 50000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = vectors.shape[0]
+        nlist = min(nlist or cls.default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+        started = time.monotonic()
+
+        train = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, max(train_size, nlist)), replace=False))])
+        centroids = train[rng.choice(train.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = _assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = train[rng.choice(train.shape[0], size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        log.info(f"IVF индекс построен: {n} векторов, nlist={nlist}, {time.monotonic() - started:.2f} с")
+        return cls(vectors, centroids, order, offsets)
+
+    def save(self, path: Path):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, vectors: np.ndarray, path: Path) -> "IVFIndex":
+        data = np.load(path)
+        return cls(vectors, data["centroids"], data["order"], data["offsets"])
+
+    def search(self, queries: np.ndarray, top_k: int, nprobe: Optional[int] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        _, probes = top_k_rows(queries @ self.centroids.T, nprobe)
+
+        scores_out = np.full((queries.shape[0], top_k), -np.inf, dtype=np.float32)
+        ids_out = np.full((queries.shape[0], top_k), -1, dtype=np.int64)
+        for row, lists in enumerate(probes):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            if candidates.size == 0:
+                continue
+            candidates.sort()
+            scores = np.asarray(self.vectors[candidates]) @ queries[row]
+            best_scores, best = top_k_rows(scores[None, :], top_k)
+            k = best.shape[1]
+            scores_out[row, :k] = best_scores[0]
+            ids_out[row, :k] = candidates[best[0]]
+        return scores_out, ids_out
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """Номер ближайшего центроида для каждого вектора, блоками по block_size строк"""
+    assign = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size])
+        assign[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+INDEX_TYPES = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+# Построенные индексы: ключ - (scan_id, время создания индекса эмбеддингов, имя файла)
+_built: Dict[tuple, VectorIndex] = {}
+# Блокировки построения по тем же ключам: один индекс строится одним потоком
+_build_locks: Dict[tuple, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def _cached(embedding_index, filename: str, load, build) -> VectorIndex:
+    """Индекс из кэша процесса, с диска (если новее эмбеддингов) или построенный заново.
+    Построение долгое и блокирующее, вызывать из потока (asyncio.to_thread)."""
+    key = (embedding_index.scan_id, embedding_index.manifest.get("created_at"), filename)
+    index = _built.get(key)
+    if index is not None:
+        return index
+
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(key, threading.Lock())
+    with lock:
+        index = _built.get(key)
+        if index is not None:
+            return index
+        path = embedding_index.path / filename
+        if path.exists() and path.stat().st_mtime >= embedding_index.manifest.get("created_at", 0):
+            index = load(path)
+        else:
+            index = build(path)
+        with _build_locks_guard:
+            for stale in [k for k in _built if k[0] == key[0] and k[1] != key[1]]:
+                del _built[stale]
+                _build_locks.pop(stale, None)
+            _built[key] = index
+    return index
+
+
+def get_vector_index(
+    embedding_index,
+    index_type: str = "exact",
+    nlist: Optional[int] = None,
+    codec: str = "float32",
+    pca_dim: Optional[int] = None,
+) -> VectorIndex:
+    """Векторный индекс выбранного типа поверх EmbeddingIndex.
+
+    IVF и сжатые копии матрицы строятся при первом обращении и сохраняются рядом
+    с матрицей эмбеддингов.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Неизвестный тип индекса '{index_type}', доступны: {', '.join(INDEX_TYPES)}")
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек '{codec}', доступны: {', '.join(CODECS)}")
+
+    vectors = embedding_index.vectors
+    compressed = codec != "float32" or pca_dim is not None
+    if index_type == ExactIndex.name and not compressed:
+        return ExactIndex(vectors)
+
+    if index_type == ExactIndex.name:
+        codec_cls = CODECS[codec]
+
+        def build_codec(path):
+            encoded = codec_cls.fit(vectors, pca_dim=pca_dim)
+            encoded.save(path)
+            return CompressedIndex(vectors, encoded)
+
+        return _cached(
+            embedding_index,
+            f"codec_{codec}_{pca_dim or 'full'}.npz",
+            lambda path: CompressedIndex(vectors, codec_cls.load(path)),
+            build_codec,
+        )
+
+    if compressed:
+        raise ValueError("Сжатые кодеки поддерживаются только для index_type=exact")
+
+    nlist = nlist or IVFIndex.default_nlist(vectors.shape[0])
+
+    def build_ivf(path):
+        built = IVFIndex.build(vectors, nlist=nlist)
+        built.save(path)
+        return built
+
+    return _cached(embedding_index, f"ivf_{nlist}.npz", lambda path: IVFIndex.load(vectors, path), build_ivf)
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.csv_reader import CSVStream, Row
+
+log = logging.getLogger(__name__)
+
+CONTRACT_COLUMNS = [
+    "number",
+    "name",
+    "contract_date",
+    "parties",
+    "execution_deadline",
+    "planned_amount",
+    "actual_amount",
+    "readiness_description",
+]
+
+# Заголовки выгрузок ЕИС (поиск контрактов и закупок), сопоставленные полям модели Contract
+HEADER_ALIASES: Dict[str, List[str]] = {
+    "number": ["Реестровый номер контракта", "Реестровый номер закупки", "Номер контракта", "Реестровый номер"],
+    "name": ["Объект закупки", "Наименование объекта закупки", "Предмет контракта", "Наименование закупки"],
+    "contract_date": ["Дата заключения контракта", "Дата заключения", "Дата контракта"],
+    "parties": ["Заказчик", "Наименование заказчика", "Поставщик", "Наименование поставщика", "Участник"],
+    "execution_deadline": ["Дата окончания исполнения контракта", "Срок исполнения контракта", "Срок исполнения"],
+    "planned_amount": ["Цена контракта", "Начальная (максимальная) цена контракта", "НМЦК"],
+    "actual_amount": ["Фактически оплачено", "Оплачено", "Исполнение"],
+    "readiness_description": ["Стадия", "Статус контракта", "Этап исполнения"],
+}
+
+MAX_REJECTED_SAMPLES = 20
+
+# Папка выгрузок реестра; загружаются только файлы из неё
+CSV_DIR = Path("contracts_csv")
+
+
+def resolve_csv_file(name: str, root: Path = CSV_DIR) -> Path:
+    """Путь к выгрузке по имени файла; пути с каталогами и выход за пределы root отклоняются"""
+    if not name or name in (".", "..") or Path(name).name != name:
+        raise ValueError(f"Ожидается имя файла в {root}, а не путь: {name!r}")
+    root = root.resolve()
+    path = (root / name).resolve()
+    # Ссылка внутри папки тоже не должна уводить за её пределы
+    if not path.is_relative_to(root):
+        raise ValueError(f"Файл {name!r} находится вне {root.name}")
+    return path
+
+
+def _normalize_header(name: str) -> str:
+    return re.sub(r"\s+", " ", name.replace("\ufeff", "")).strip().lower()
+
+
+def map_columns(header: List[str]) -> Dict[str, List[int]]:
+    """Индексы колонок CSV для каждого поля; сторон договора может быть несколько (заказчик и поставщик)"""
+    positions = {_normalize_header(name): i for i, name in enumerate(header)}
+    mapping: Dict[str, List[int]] = {}
+    for column, aliases in HEADER_ALIASES.items():
+        found = [positions[_normalize_header(alias)] for alias in aliases if _normalize_header(alias) in positions]
+        if found:
+            mapping[column] = found if column == "parties" else found[:1]
+    return mapping
+
+
+def _text(value: str) -> Optional[str]:
+    value = value.strip()
+    # ЕИС оборачивает номера и коды в апострофы, чтобы Excel не превращал их в числа
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1].strip()
+    return value or None
+
+
+def _number(value: str) -> Optional[str]:
+    value = _text(value)
+    return value.lstrip("№").strip() if value else None
+
+
+def _date(value: str) -> Optional[date]:
+    value = _text(value)
+    if value is None:
+        return None
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d.%m.%Y %H:%M", "%d.%m.%y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"неизвестный формат даты {value!r}")
+
+
+# Суммы хранятся как numeric(15, 2): не больше 13 цифр до запятой
+MAX_AMOUNT = Decimal(10) ** 13
+
+
+def _amount(value: str) -> Optional[Decimal]:
+    value = _text(value)
+    if value is None:
+        return None
+    cleaned = re.sub(r"[\s ₽]|руб\.?", "", value).replace(",", ".")
+    try:
+        amount = Decimal(cleaned).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"некорректная сумма {value!r}")
+    if amount < 0:
+        raise ValueError(f"отрицательная сумма {value!r}")
+    if amount >= MAX_AMOUNT:
+        raise ValueError(f"слишком большая сумма {value!r}")
+    return amount
+
+
+PARSERS: Dict[str, Callable[[str], Any]] = {
+    "number": _number,
+    "name": _text,
+    "contract_date": _date,
+    "parties": _text,
+    "execution_deadline": _date,
+    "planned_amount": _amount,
+    "actual_amount": _amount,
+    "readiness_description": _text,
+}
+
+
+def parse_rows(rows: List[Row], mapping: Dict[str, List[int]]) -> Tuple[List[tuple], List[Dict[str, Any]]]:
+    """Строки CSV -> кортежи (номер строки, *CONTRACT_COLUMNS) и список отбракованных строк с причиной"""
+    records: List[tuple] = []
+    rejected: List[Dict[str, Any]] = []
+    for line, row in rows:
+        try:
+            values = []
+            for column in CONTRACT_COLUMNS:
+                indices = mapping.get(column)
+                if not indices:
+                    values.append(None)
+                elif column == "parties":
+                    parts = [_text(row[i]) for i in indices if i < len(row)]
+                    values.append("; ".join(part for part in parts if part) or None)
+                else:
+                    values.append(PARSERS[column](row[indices[0]]) if indices[0] < len(row) else None)
+            if values[0] is None:
+                raise ValueError("нет номера контракта")
+            records.append((line, *values))
+        except Exception as e:
+            rejected.append({"line": line, "reason": str(e)})
+    return records, rejected
+
+
+# Последняя строка с тем же номером побеждает; существующие договоры обновляются, новые добавляются
+MERGE_SQL = """
+WITH latest AS (
+    SELECT DISTINCT ON (number) *
+    FROM {staging}
+    ORDER BY number, line DESC
+), updated AS (
+    UPDATE contract c SET
+        name = COALESCE(l.name, c.name),
+        contract_date = COALESCE(l.contract_date, c.contract_date),
+        parties = COALESCE(l.parties, c.parties),
+        execution_deadline = COALESCE(l.execution_deadline, c.execution_deadline),
+        planned_amount = COALESCE(l.planned_amount, c.planned_amount),
+        actual_amount = COALESCE(l.actual_amount, c.actual_amount),
+        readiness_description = COALESCE(l.readiness_description, c.readiness_description)
+    FROM latest l
+    WHERE c.number = l.number
+    RETURNING c.number
+), inserted AS (
+    INSERT INTO contract (number, name, contract_date, parties, execution_deadline,
+                          planned_amount, actual_amount, readiness_description, created_at)
+    SELECT l.number, l.name, l.contract_date, l.parties, l.execution_deadline,
+           l.planned_amount, l.actual_amount, l.readiness_description, now()
+    FROM latest l
+    WHERE NOT EXISTS (SELECT 1 FROM contract c WHERE c.number = l.number)
+    RETURNING number
+)
+SELECT (SELECT count(*) FROM updated) AS updated, (SELECT count(*) FROM inserted) AS inserted
+"""
+
+
+def postgres_dsn() -> str:
+    """INGESTOR_POSTGRES_DSN или те же POSTGRES_* переменные, что у backend"""
+    dsn = os.environ.get("INGESTOR_POSTGRES_DSN")
+    if dsn:
+        return dsn
+    missing = [name for name in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_HOST", "POSTGRES_DB") if name not in os.environ]
+    if missing:
+        raise RuntimeError(f"Не настроено подключение к Postgres: нет INGESTOR_POSTGRES_DSN и {', '.join(missing)}")
+    return (
+        f"postgresql://{os.environ['POSTGRES_USER']}:{os.environ['POSTGRES_PASSWORD']}"
+        f"@{os.environ['POSTGRES_HOST']}:{os.environ.get('POSTGRES_PORT', 5432)}/{os.environ['POSTGRES_DB']}"
+    )
+
+
+class ContractCSVLoader:
+    """Загрузка выгрузки реестра в таблицу contract.
+
+    CSV читается пачками в отдельном потоке, каждая пачка уходит в временную
+    staging-таблицу через COPY (бинарный протокол asyncpg), затем одним запросом
+    сливается с contract. Всё в одной транзакции: при ошибке таблица не меняется.
+    """
+
+    staging = "contract_staging"
+
+    def __init__(self, dsn: Optional[str] = None, chunk_size: int = 10000):
+        self.dsn = dsn
+        self.chunk_size = chunk_size
+
+    async def load(self, path: Path, on_progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        import asyncpg
+
+        started = time.perf_counter()
+        stream = CSVStream(path)
+        mapping = map_columns(stream.header)
+        if "number" not in mapping:
+            raise ValueError(f"В {Path(path).name} нет колонки с номером контракта: {stream.header}")
+        columns = {column: [stream.header[i] for i in indices] for column, indices in mapping.items()}
+        log.info(f"Сопоставление колонок: {columns}")
+
+        stats: Dict[str, Any] = {
+            "file": str(path),
+            "encoding": stream.encoding,
+            "delimiter": stream.delimiter,
+            "columns": columns,
+            "rows": 0,
+            "loaded": 0,
+            "rejected": 0,
+            "rejected_samples": [],
+        }
+
+        conn = await asyncpg.connect(self.dsn or postgres_dsn())
+        try:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE {self.staging} ("
+                    " line integer, number text, name text, contract_date date, parties text,"
+                    " execution_deadline date, planned_amount numeric(15, 2), actual_amount numeric(15, 2),"
+                    " readiness_description text) ON COMMIT DROP"
+                )
+                chunks = stream.chunks(self.chunk_size)
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        break
+                    records, rejected = parse_rows(chunk, mapping)
+                    stats["rows"] += len(chunk)
+                    stats["rejected"] += len(rejected)
+                    room = MAX_REJECTED_SAMPLES - len(stats["rejected_samples"])
+                    stats["rejected_samples"].extend(rejected[:max(room, 0)])
+                    if records:
+                        await conn.copy_records_to_table(
+                            self.staging, records=records, columns=["line", *CONTRACT_COLUMNS]
+                        )
+                        stats["loaded"] += len(records)
+                    if on_progress is not None:
+                        on_progress(rows=stats["rows"], loaded=stats["loaded"], rejected=stats["rejected"])
+
+                merged = await conn.fetchrow(MERGE_SQL.format(staging=self.staging))
+        finally:
+            await conn.close()
+
+        elapsed = time.perf_counter() - started
+        stats.update(
+            inserted=merged["inserted"],
+            updated=merged["updated"],
+            seconds=round(elapsed, 3),
+            rows_per_sec=round(stats["rows"] / max(elapsed, 1e-9), 1),
+        )
+        log.info(
+            f"{Path(path).name}: {stats['rows']} строк за {elapsed:.2f} с ({stats['rows_per_sec']} строк/с), "
+            f"добавлено {stats['inserted']}, обновлено {stats['updated']}, отбраковано {stats['rejected']}"
+        )
+        return stats
+
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _identifier(name: str) -> str:
+    """Имя колонки/таблицы для подстановки в SQL; всё, кроме идентификатора, отклоняется"""
+    if not all(_IDENTIFIER_RE.fullmatch(part) for part in name.split(".")):
+        raise ValueError(f"Недопустимое имя колонки или таблицы: {name!r}")
+    return name
+
+
+def _rebatch(rows: Iterable[Row], batch_size: int) -> Iterator[List[Row]]:
+    batch: List[Row] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ScanSource:
+    """Источник строк скана, отдающий их пачками.
+
+    columns - проекция (только нужные колонки), limit/offset - окно строк,
+    filters - равенства колонка = значение (список значений - IN).
+    """
+
+    def iter_scan(
+        self,
+        scan_id: int,
+        columns: Sequence[str] = ("content",),
+        batch_size: int = 1000,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[List[Row]]:
+        raise NotImplementedError
+
+    async def aiter_scan(
+        self,
+        scan_id: int,
+        columns: Sequence[str] = ("content",),
+        batch_size: int = 1000,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[List[Row]]:
+        """Асинхронная обёртка iter_scan: каждая пачка читается в отдельном потоке,
+        следующая запрашивается только после того, как потребитель обработал текущую"""
+        batches = self.iter_scan(scan_id, columns, batch_size, limit, offset, filters)
+        reading = None
+        try:
+            while True:
+                reading = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                batch = await asyncio.shield(reading)
+                if batch is None:
+                    return
+                yield batch
+        finally:
+            if reading is not None and not reading.done():
+                # Отмена пришла во время чтения пачки: генератор нельзя закрыть, пока поток его выполняет
+                await asyncio.wait([reading])
+            batches.close()
+
+    def fetch_scan(self, scan_id: int, columns: Sequence[str] = ("content",), **params) -> List[Row]:
+        return [row for batch in self.iter_scan(scan_id, columns, **params) for row in batch]
+
+
+class ClickHouseScanSource(ScanSource):
+    """Потоковое чтение скана из ClickHouse через общий на процесс пул HTTP-соединений.
+
+    Проекция, фильтры и LIMIT/OFFSET выполняются на стороне ClickHouse,
+    строки приходят блоками и не накапливаются в памяти целиком.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 9049,
+        username: str = "default",
+        password: str = "",
+        database: str = "default",
+        table: str = "scan_data",
+        scan_column: str = "scan_id",
+        order_by: Optional[str] = None,
+        pool_size: int = 8,
+    ):
+        self.settings = {
+            "host": host,
+            "port": port,
+            "username": username,
+            "password": password,
+            "database": database,
+        }
+        self.table = _identifier(table)
+        self.scan_column = _identifier(scan_column)
+        self.order_by = _identifier(order_by) if order_by else None
+        self.pool_size = pool_size
+        self._client = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ClickHouseScanSource":
+        """Подключение из общей конфигурации (app.utils.load_config), параметры таблицы - из окружения"""
+        from app.utils import load_config
+
+        settings = load_config()["clickhouse"]
+        return cls(
+            host=settings["host"],
+            port=int(settings["port"]),
+            username=settings["username"],
+            password=settings["password"],
+            database=settings["database"],
+            table=os.environ.get("CLICKHOUSE_SCAN_TABLE", "scan_data"),
+            order_by=os.environ.get("CLICKHOUSE_SCAN_ORDER_BY"),
+            pool_size=int(os.environ.get("CLICKHOUSE_POOL_SIZE", 8)),
+        )
+
+    @property
+    def client(self):
+        """Клиент создаётся один раз; без сессии, чтобы запросы из разных потоков шли параллельно"""
+        with self._lock:
+            if self._client is None:
+                import clickhouse_connect
+                from clickhouse_connect.driver.httputil import get_pool_manager
+
+                self._client = clickhouse_connect.get_client(
+                    **self.settings,
+                    pool_mgr=get_pool_manager(maxsize=self.pool_size),
+                    autogenerate_session_id=False,
+                )
+                log.info(f"Подключение к ClickHouse {self.settings['host']}:{self.settings['port']}")
+            return self._client
+
+    def build_query(
+        self,
+        scan_id: int,
+        columns: Sequence[str],
+        limit: Optional[int],
+        offset: int,
+        filters: Optional[Dict[str, Any]],
+    ):
+        """SQL и параметры запроса с проекцией, фильтрами и окном строк"""
+        parameters: Dict[str, Any] = {"scan_id": scan_id}
+        conditions = [f"{self.scan_column} = %(scan_id)s"]
+        for number, (column, value) in enumerate((filters or {}).items()):
+            name = f"f{number}"
+            parameters[name] = value
+            operator = "IN" if isinstance(value, (list, tuple, set)) else "="
+            conditions.append(f"{_identifier(column)} {operator} %({name})s")
+
+        sql = f"SELECT {', '.join(_identifier(c) for c in columns)} FROM {self.table} WHERE {' AND '.join(conditions)}"
+        if self.order_by:
+            sql += f" ORDER BY {self.order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        if offset:
+            sql += f" OFFSET {int(offset)}"
+        return sql, parameters
+
+    def iter_scan(self, scan_id, columns=("content",), batch_size=1000, limit=None, offset=0, filters=None):
+        columns = list(columns)
+        sql, parameters = self.build_query(scan_id, columns, limit, offset, filters)
+        with self.client.query_row_block_stream(
+            sql, parameters=parameters, settings={"max_block_size": batch_size}
+        ) as stream:
+            rows = (dict(zip(columns, row)) for block in stream for row in block)
+            yield from _rebatch(rows, batch_size)
+
+
+class ManagerScanSource(ScanSource):
+    """Совместимость с ClickHouseManager.get_data_by_scan_id, если прямое подключение не настроено.
+
+    Менеджер отдаёт весь скан сразу, поэтому проекция и окно строк применяются уже в Python.
+    """
+
+    def __init__(self):
+        from app.db.clickhouse_client import ClickHouseManager
+
+        self.manager = ClickHouseManager(config_path=None)
+
+    def iter_scan(self, scan_id, columns=("content",), batch_size=1000, limit=None, offset=0, filters=None):
+        raw_data = self.manager.get_data_by_scan_id(scan_id) or []
+        end = None if limit is None else offset + limit
+        rows = (
+            {column: getattr(doc, column, None) for column in columns}
+            for doc in raw_data
+            if all(_matches(getattr(doc, column, None), value) for column, value in (filters or {}).items())
+        )
+        yield from _rebatch(_islice(rows, offset, end), batch_size)
+
+
+class InMemoryScanSource(ScanSource):
+    """Сканы в памяти процесса: замена ClickHouse для тестов и бенчмарков без сети"""
+
+    def __init__(self, scans: Optional[Dict[int, List[Row]]] = None):
+        self.scans: Dict[int, List[Row]] = scans or {}
+
+    def add_scan(self, scan_id: int, rows: List[Row]):
+        self.scans[scan_id] = rows
+
+    def iter_scan(self, scan_id, columns=("content",), batch_size=1000, limit=None, offset=0, filters=None):
+        end = None if limit is None else offset + limit
+        rows = (
+            {column: row.get(column) for column in columns}
+            for row in self.scans.get(scan_id, [])
+            if all(_matches(row.get(column), value) for column, value in (filters or {}).items())
+        )
+        yield from _rebatch(_islice(rows, offset, end), batch_size)
+
+
+def _matches(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, (list, tuple, set)):
+        return actual in expected
+    return actual == expected
+
+
+def _islice(rows: Iterable[Row], start: int, end: Optional[int]) -> Iterator[Row]:
+    for i, row in enumerate(rows):
+        if end is not None and i >= end:
+            return
+        if i >= start:
+            yield row
+
+
+_source: Optional[ScanSource] = None
+
+
+def get_scan_source() -> ScanSource:
+    """Общий на процесс источник сканов.
+
+    INGESTOR_SCAN_SOURCE: clickhouse (по умолчанию, если задан CLICKHOUSE_HOST),
+    manager (ClickHouseManager) или memory.
+    """
+    global _source
+    if _source is None:
+        kind = os.environ.get("INGESTOR_SCAN_SOURCE") or ("clickhouse" if os.environ.get("CLICKHOUSE_HOST") else "manager")
+        if kind == "clickhouse":
+            _source = ClickHouseScanSource.from_env()
+        elif kind == "memory":
+            _source = InMemoryScanSource()
+        elif kind == "manager":
+            _source = ManagerScanSource()
+        else:
+            raise ValueError(f"Неизвестный источник сканов '{kind}', доступны: clickhouse, manager, memory")
+    return _source
+
+
+def set_scan_source(source: Optional[ScanSource]):
+    """Подменяет источник сканов (тесты, бенчмарки); None - вернуть выбор по окружению"""
+    global _source
+    _source = source
@@ -2,7 +2,13 @@ from app.utils import setup_logging
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.api.router import router
+from app.core.browser_pool import close_browser_pool, get_browser_pool
+from app.core.html_cleaning import close_html_cleaner
+from app.core.jobs import get_job_manager
+from app.core.registry import warm_up_commands
+import asyncio
 import logging
+import os
 
 
 @asynccontextmanager
@@ -10,7 +16,22 @@ async def lifespan(app: FastAPI):
     setup_logging()
     log = logging.getLogger(__name__)
     logging.info("Запуск приложения")
+    jobs = get_job_manager()
+    await jobs.start()
+    # Реализации команд импортируются в фоне: сервис отвечает сразу, а первый вызов не ждёт импорта.
+    # Пул браузеров запускается при первой команде скачивания; заранее - только с INGESTOR_BROWSER_PREWARM=1
+    warmup = []
+    if os.environ.get("INGESTOR_WARMUP", "1") != "0":
+        warmup.append(asyncio.create_task(warm_up_commands()))
+    if os.environ.get("INGESTOR_BROWSER_PREWARM", "0") == "1":
+        warmup.append(asyncio.create_task(get_browser_pool().start()))
     yield
+    for task in warmup:
+        task.cancel()
+    await asyncio.gather(*warmup, return_exceptions=True)
+    await jobs.stop()
+    await close_browser_pool()
+    close_html_cleaner()
     log.info("Завершение работы")
 
 
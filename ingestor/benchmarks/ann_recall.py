@@ -0,0 +1,76 @@
+"""Бенчмарк recall@k и задержки векторных индексов против точного перебора.
+
+    cd ingestor && python -m benchmarks.ann_recall --docs 100000 --dim 256
+
+Данные синтетические: нормированные векторы вокруг случайных центров,
+что близко к распределению эмбеддингов однотипных закупок. В конце печатается
+наименьший nprobe, при котором recall@k достигает --target-recall.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.vector_index import ExactIndex, IVFIndex
+
+
+def make_corpus(docs: int, dim: int, clusters: int, seed: int = 0, noise: float = 0.6) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, docs)] + noise * rng.standard_normal((docs, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed(index, queries, top_k, **params):
+    started = time.perf_counter()
+    _, ids = index.search(queries, top_k, **params)
+    return ids, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=0.6, help="Разброс векторов вокруг центров, больше - труднее для IVF")
+    parser.add_argument("--query-noise", type=float, default=8.0, help="Удалённость запросов от документов корпуса")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    vectors = make_corpus(args.docs, args.dim, clusters=max(10, args.docs // 500), noise=args.noise)
+    # Запрос - документ корпуса плюс шум; при query_noise=8 ближайшие соседи разбросаны
+    # по соседним спискам IVF, как у коротких текстовых запросов к длинным документам
+    rng = np.random.default_rng(2)
+    queries = vectors[rng.choice(args.docs, args.queries)]
+    queries = queries + args.query_noise / np.sqrt(args.dim) * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = ExactIndex(vectors)
+    truth, exact_ms = timed(exact, queries, args.top_k)
+    print(f"exact: {exact_ms:.3f} мс/запрос, recall@{args.top_k}=1.000")
+
+    started = time.perf_counter()
+    ivf = IVFIndex.build(vectors, nlist=args.nlist)
+    print(f"ivf: nlist={ivf.nlist}, построение {time.perf_counter() - started:.2f} с")
+    enough = None
+    for nprobe in (1, 2, 4, 8, 16, 32, 64, 128):
+        if nprobe > ivf.nlist:
+            break
+        ids, ms = timed(ivf, queries, args.top_k, nprobe=nprobe)
+        value = recall(ids, truth)
+        if enough is None and value >= args.target_recall:
+            enough = nprobe
+        default = " (по умолчанию)" if nprobe == ivf.nprobe else ""
+        print(f"ivf nprobe={nprobe:>3}{default}: {ms:.3f} мс/запрос, recall@{args.top_k}={value:.3f}")
+    print(f"recall@{args.top_k} >= {args.target_recall}: nprobe={enough if enough is not None else 'не достигнут'}")
+
+
+if __name__ == "__main__":
+    main()
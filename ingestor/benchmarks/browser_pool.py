@@ -0,0 +1,116 @@
+"""Бенчмарк пула браузеров на локальной статической копии страниц реестра контрактов.
+
+    cd ingestor && python -m benchmarks.browser_pool --contracts 40 --pools 1 2 4
+
+Поднимается HTTP-сервер со страницей поиска, карточками контрактов и файлами
+документов (с задержкой ответа, как у портала). Браузеры только обходят карточки,
+файлы качаются через aiohttp. Для каждого размера пула печатается число контрактов
+в минуту. Нужны Chrome и chromedriver (CHROMEDRIVER_PATH или webdriver-manager).
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from app.core.browser_pool import BrowserPool
+from app.core.contracts import collect_contract_links, download_contracts
+
+
+def make_handler(contracts: int, files: int, latency: float, file_size: int):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body: bytes, content_type: str, headers=None):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/epz/contract/search/results.html":
+                links = "".join(
+                    f"<a href='/epz/rdik/card/info.html?contractRegNum={n}'>Контракт {n}</a><br>"
+                    for n in range(contracts)
+                )
+                self._send(f"<html><body>{links}</body></html>".encode(), "text/html; charset=utf-8")
+            elif url.path == "/epz/rdik/card/info.html":
+                number = query["contractRegNum"][0]
+                links = "".join(
+                    f"<a href='/filestore/public/1.0/download/rdik/file.html?uid={number}_{i}'>doc_{i}.zip</a><br>"
+                    for i in range(files)
+                )
+                self._send(f"<html><body>{links}</body></html>".encode(), "text/html; charset=utf-8")
+            elif url.path == "/filestore/public/1.0/download/rdik/file.html":
+                uid = query["uid"][0]
+                self._send(
+                    b"0" * file_size,
+                    "application/zip",
+                    {"Content-Disposition": f"attachment; filename=doc_{uid}.zip"},
+                )
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+async def run(pool: BrowserPool, search_url: str, limit: int, root_dir: Path):
+    await pool.start()
+    links = await pool.run(lambda worker: collect_contract_links(worker.driver, search_url, limit))
+    started = time.perf_counter()
+    files = 0
+    async for contract in download_contracts(pool, links, root_dir):
+        if contract.error:
+            print(f"  ошибка: {contract.error}")
+        files += len(contract.files)
+    return len(links), files, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contracts", type=int, default=40)
+    parser.add_argument("--files", type=int, default=2, help="Документов в карточке контракта")
+    parser.add_argument("--latency", type=float, default=0.2, help="Задержка ответа сервера, с")
+    parser.add_argument("--file-size", type=int, default=64 * 1024)
+    parser.add_argument("--pools", type=int, nargs="*", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.contracts, args.files, args.latency, args.file_size)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    search_url = f"http://127.0.0.1:{server.server_port}/epz/contract/search/results.html"
+
+    workdir = Path(tempfile.mkdtemp(prefix="browser_pool_"))
+    baseline = None
+    try:
+        for size in args.pools:
+            pool = BrowserPool(size=size, download_root=workdir / f"pool_{size}" / "workers")
+            try:
+                contracts, files, elapsed = asyncio.run(
+                    run(pool, search_url, args.contracts, workdir / f"pool_{size}" / "contracts")
+                )
+            finally:
+                asyncio.run(pool.close())
+            rate = contracts / elapsed * 60
+            baseline = baseline or rate
+            print(f"{size} браузеров: {contracts} контрактов, {files} файлов за {elapsed:.1f} с - "
+                  f"{rate:.0f} контрактов/мин (x{rate / baseline:.2f})")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
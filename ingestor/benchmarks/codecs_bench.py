@@ -0,0 +1,58 @@
+"""Бенчмарк сжатого хранения эмбеддингов: память, задержка и recall@k против float32.
+
+    cd ingestor && python -m benchmarks.codecs_bench --docs 100000 --dim 1024
+
+Для каждого кодека печатается объём в байтах на документ, мс/запрос точного
+перебора по сжатым векторам и recall@k без дооценки и с дооценкой (rerank)
+кандидатов по исходной float32 матрице.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.vector_codecs import CODECS
+from app.core.vector_index import CompressedIndex, ExactIndex
+from benchmarks.ann_recall import make_corpus, recall, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=100)
+    parser.add_argument("--pca-dims", type=int, nargs="*", default=[256])
+    args = parser.parse_args()
+
+    vectors = make_corpus(args.docs, args.dim, clusters=max(10, args.docs // 500))
+    queries = vectors[np.random.default_rng(2).choice(args.docs, args.queries)]
+    queries = queries + 0.1 * make_corpus(args.queries, args.dim, clusters=10, seed=1)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth, exact_ms = timed(ExactIndex(vectors), queries, args.top_k)
+    print(f"float32: {vectors.nbytes / args.docs:.0f} байт/док, {exact_ms:.3f} мс/запрос, recall@{args.top_k}=1.000")
+
+    # PCA до размерности не меньше исходной ничего не сокращает
+    pca_dims = [dim for dim in args.pca_dims if dim < args.dim]
+    for pca_dim in [None, *pca_dims]:
+        for name, codec_cls in CODECS.items():
+            if name == "float32" and pca_dim is None:
+                continue
+            started = time.perf_counter()
+            codec = codec_cls.fit(vectors, pca_dim=pca_dim)
+            build_s = time.perf_counter() - started
+            index = CompressedIndex(vectors, codec)
+            ids, ms = timed(index, queries, args.top_k)
+            reranked, rerank_ms = timed(index, queries, args.top_k, rerank=args.rerank)
+            label = name if pca_dim is None else f"{name}+pca{pca_dim}"
+            print(
+                f"{label}: {codec.nbytes / args.docs:.0f} байт/док, построение {build_s:.2f} с, "
+                f"{ms:.3f} мс/запрос, recall@{args.top_k}={recall(ids, truth):.3f}; "
+                f"rerank={args.rerank}: {rerank_ms:.3f} мс/запрос, recall@{args.top_k}={recall(reranked, truth):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Бенчмарк пропускной способности EmbeddingPipeline против локальной заглушки API.
+
+    cd ingestor && python -m benchmarks.embedding_throughput --docs 2000
+
+Сравнивает старую схему (по одному тексту, без параллелизма) с пачками и
+адаптивным параллелизмом, печатает док/с и число полученных 429.
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+
+from app.core.embedding_pipeline import EmbeddingPipeline
+from benchmarks.fake_embeddings_server import app as fake_app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_server() -> str:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_case(base_url: str, texts, batch_size: int, max_in_flight: int) -> dict:
+    pipeline = EmbeddingPipeline(
+        access_token="fake",
+        base_url=base_url,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+    )
+    try:
+        _, ok = await pipeline.embed(texts)
+    finally:
+        await pipeline.aclose()
+    stats = pipeline.stats()
+    stats["ok"] = int(ok.sum())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=1000)
+    args = parser.parse_args()
+
+    base_url = start_fake_server()
+    texts = [f"Капитальный ремонт объекта №{i}, г. Воронеж" for i in range(args.docs)]
+    cases = [(1, 1), (16, 1), (16, 4), (16, 8), (32, 16)]
+
+    print(f"{'batch':>6} {'in_flight':>9} {'docs/s':>10} {'requests':>9} {'429':>5} {'ok':>6}")
+    for batch_size, max_in_flight in cases:
+        stats = asyncio.run(run_case(base_url, texts, batch_size, max_in_flight))
+        print(
+            f"{batch_size:>6} {max_in_flight:>9} {stats['docs_per_sec']:>10.1f} "
+            f"{stats['requests']:>9} {stats['rate_limited']:>5} {stats['ok']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Локальная заглушка GigaChat embeddings API для офлайн-бенчмарков.
+
+Отвечает на POST /embeddings в формате GigaChat детерминированными векторами,
+имитирует задержку ответа и 429 при превышении лимита одновременных запросов.
+
+Запуск отдельно:
+    FAKE_EMBED_LATENCY=0.2 uvicorn benchmarks.fake_embeddings_server:app --port 8765
+"""
+import asyncio
+import hashlib
+import os
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DIM = 1024
+BASE_LATENCY = float(os.environ.get("FAKE_EMBED_LATENCY", 0.2))
+PER_TEXT_LATENCY = float(os.environ.get("FAKE_EMBED_PER_TEXT_LATENCY", 0.005))
+MAX_CONCURRENCY = int(os.environ.get("FAKE_EMBED_MAX_CONCURRENCY", 6))
+
+app = FastAPI()
+app.state.in_flight = 0
+app.state.requests = 0
+app.state.rejected = 0
+
+
+def fake_vector(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32).tolist()
+
+
+@app.post("/embeddings")
+async def embeddings(request: Request):
+    payload = await request.json()
+    texts = payload.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+
+    if app.state.in_flight >= MAX_CONCURRENCY:
+        app.state.rejected += 1
+        return JSONResponse({"status": 429, "message": "Too Many Requests"}, status_code=429, headers={"Retry-After": "0.5"})
+
+    app.state.in_flight += 1
+    app.state.requests += 1
+    try:
+        await asyncio.sleep(BASE_LATENCY + PER_TEXT_LATENCY * len(texts))
+        data = [
+            {"object": "embedding", "embedding": fake_vector(text), "index": i, "usage": {"prompt_tokens": len(text) // 4}}
+            for i, text in enumerate(texts)
+        ]
+        return {"object": "list", "data": data, "model": payload.get("model", "Embeddings")}
+    finally:
+        app.state.in_flight -= 1
+
+
+@app.get("/stats")
+async def stats():
+    return {"requests": app.state.requests, "rejected": app.state.rejected}
@@ -0,0 +1,72 @@
+"""Бенчмарк очистки HTML: один процесс против пула процессов.
+
+    cd ingestor && python -m benchmarks.html_cleaning --docs 2000 --size 50000
+
+Корпус синтетический: вложенные таблицы, списки и скрипты, похожие на карточки
+закупок. Для каждого числа процессов печатается док/с и самая долгая пачка.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from app.core.html_cleaning import HtmlCleaner, _default_clean
+
+WORDS = "поставка товара заказчик контракт цена рублей срок исполнения обязательств участник закупки".split()
+
+
+def make_document(rng: random.Random, size: int) -> str:
+    parts = ["<html><head><script>var x = 1;</script><style>td {color: red}</style></head><body>"]
+    length = 0
+    while length < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+        block = (
+            f"<div class='row'><table><tr><td><b>{text}</b></td><td><a href='/epz/{rng.randint(1, 10**6)}'>"
+            f"ссылка</a></td></tr></table><ul><li>{text}</li></ul></div>"
+        )
+        parts.append(block)
+        length += len(block)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+async def run(cleaner: HtmlCleaner, corpus, batch_size: int):
+    started = time.perf_counter()
+    _, stats = await cleaner.clean(corpus, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    slowest = max(batch["seconds"] for batch in stats["batches"])
+    return len(corpus) / elapsed, slowest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=50000, help="Примерный размер документа в символах")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="*", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = [make_document(rng, args.size) for _ in range(args.docs)]
+    print(f"Корпус: {args.docs} документов, {sum(map(len, corpus)) / 1e6:.1f} млн символов")
+
+    started = time.perf_counter()
+    _default_clean(corpus)
+    single = args.docs / (time.perf_counter() - started)
+    print(f"1 процесс, без пула: {single:.1f} док/с")
+
+    cores = os.cpu_count() or 1
+    for workers in args.workers or sorted({1, 2, max(1, cores // 2), cores}):
+        cleaner = HtmlCleaner(max_workers=workers)
+        try:
+            # Первый прогон прогревает процессы пула
+            asyncio.run(run(cleaner, corpus[: workers * args.batch_size], args.batch_size))
+            rate, slowest = asyncio.run(run(cleaner, corpus, args.batch_size))
+        finally:
+            cleaner.close()
+        print(f"{workers} процессов: {rate:.1f} док/с (x{rate / single:.2f}), самая долгая пачка {slowest:.3f} с")
+
+
+if __name__ == "__main__":
+    main()
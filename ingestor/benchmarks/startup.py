@@ -0,0 +1,121 @@
+"""Бенчмарк старта сервиса: время импорта приложения и время до первого ответа.
+
+    cd ingestor && python -m benchmarks.startup --runs 3
+
+Каждый замер - в отдельном процессе, чтобы модули не оставались в памяти между
+запусками. Печатается:
+- импорт app.main (команды по каталогу) и импорт вместе со всеми реализациями
+  команд, как было до ленивой загрузки;
+- время от запуска uvicorn до первого ответа и задержка первой команды, вызванной
+  через --idle секунд после старта (с прогревом в фоне и без него,
+  INGESTOR_WARMUP=0); браузеры при этом не запускаются - пул стартует при первой
+  команде скачивания.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY_MODULES = ("selenium", "webdriver_manager", "pandas", "sklearn", "gigachat")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+if {eager}:
+    from app.core.registry import LazyCommand, commands
+    for meta in commands.values():
+        if isinstance(meta["func"], LazyCommand):
+            meta["func"].load()
+    elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(eager: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(eager=eager, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(url: str, body: bytes = None) -> int:
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=120) as response:
+        response.read()
+        return response.status
+
+
+def measure_first_request(command: str, warmup: bool, idle: float, timeout: float) -> dict:
+    port = free_port()
+    env = {**os.environ, "INGESTOR_WARMUP": "1" if warmup else "0"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"Сервис не ответил за {timeout} с")
+            try:
+                request(f"{base}/commands/stats")
+                break
+            except OSError:
+                time.sleep(0.02)
+        first_response = time.perf_counter() - started
+        time.sleep(idle)
+        called = time.perf_counter()
+        request(f"{base}/scan/{command}", b"{}")
+        first_command = time.perf_counter() - called
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response": first_response, "first_command": first_command}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--command", default="gigachat_cache_stats", help="Команда без аргументов для первого вызова")
+    parser.add_argument("--idle", type=float, default=3, help="Пауза между стартом и первой командой, с")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    for eager, label in ((False, "импорт app.main (каталог команд)"), (True, "импорт app.main + реализации команд")):
+        runs = [measure_import(eager) for _ in range(args.runs)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        heavy = ", ".join(runs[-1]["heavy"]) or "нет"
+        print(f"{label}: {seconds:.2f} с, тяжёлые модули: {heavy}")
+
+    for warmup in (True, False):
+        runs = [measure_first_request(args.command, warmup, args.idle, args.timeout) for _ in range(args.runs)]
+        first_response = statistics.median(run["first_response"] for run in runs)
+        first_command = statistics.median(run["first_command"] for run in runs)
+        print(
+            f"uvicorn, прогрев {'в фоне' if warmup else 'выключен'}: первый ответ через {first_response:.2f} с, "
+            f"первый вызов {args.command} {first_command * 1000:.0f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
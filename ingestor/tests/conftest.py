@@ -0,0 +1,24 @@
+import pytest
+
+from app.core import embedding_index
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    """Индексы эмбеддингов во временной папке вместо data/"""
+    monkeypatch.setattr(embedding_index, "DATA_ROOT", tmp_path)
+    monkeypatch.setattr(embedding_index, "_open_indexes", {})
+    return tmp_path
+
+
+@pytest.fixture
+def isolated_commands(monkeypatch):
+    """Пустой реестр команд и свежие лимиты; возвращает реестр"""
+    from app.core import limits, registry
+
+    commands = {}
+    monkeypatch.setattr(registry, "commands", commands)
+    monkeypatch.setattr(limits, "_limiters", {})
+    monkeypatch.setattr(limits, "_bulkheads", {})
+    monkeypatch.setattr(limits, "_release_listeners", [])
+    return commands
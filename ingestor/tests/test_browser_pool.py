@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+        self.alive = True
+        self.quit_calls = 0
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("session lost")
+        return 1
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class Factory:
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self, headless, download_dir):
+        driver = FakeDriver(download_dir)
+        self.drivers.append(driver)
+        return driver
+
+
+def test_browsers_start_once_and_are_reused(tmp_path):
+    factory = Factory()
+    pool = BrowserPool(size=2, download_root=tmp_path, driver_factory=factory)
+
+    async def main():
+        await pool.start()
+        return [await pool.run(lambda worker, i: (worker.index, i), i) for i in range(5)]
+
+    results = asyncio.run(main())
+
+    assert len(factory.drivers) == 2
+    assert [i for _, i in results] == list(range(5))
+    assert sum(pool.stats()["tasks"]) == 5
+    assert all((tmp_path / f"worker_{i}").is_dir() for i in range(2))
+
+
+def test_dead_browser_is_relaunched_on_acquire(tmp_path):
+    factory = Factory()
+    pool = BrowserPool(size=1, download_root=tmp_path, driver_factory=factory)
+
+    async def main():
+        await pool.start()
+        factory.drivers[0].alive = False
+        async with pool.acquire() as worker:
+            return worker.driver
+
+    driver = asyncio.run(main())
+
+    assert driver is factory.drivers[1]
+    assert factory.drivers[0].quit_calls == 1
+    assert pool.restarts == 1
+
+
+def test_map_runs_items_concurrently_up_to_pool_size(tmp_path):
+    pool = BrowserPool(size=2, download_root=tmp_path, driver_factory=Factory())
+    active = []
+    peak = []
+
+    def work(worker, item):
+        active.append(item)
+        peak.append(len(active))
+        time.sleep(0.02)
+        active.remove(item)
+        if item == 3:
+            raise ValueError("bad page")
+        return item * 10
+
+    async def main():
+        return {item: result async for item, result in pool.map(work, list(range(6)))}
+
+    results = asyncio.run(main())
+
+    assert max(peak) == 2
+    assert isinstance(results.pop(3), ValueError)
+    assert results == {0: 0, 1: 10, 2: 20, 4: 40, 5: 50}
+
+
+def test_failed_launch_is_not_fatal(tmp_path):
+    calls = []
+
+    def flaky(headless, download_dir):
+        calls.append(download_dir)
+        if len(calls) == 1:
+            raise RuntimeError("chrome crashed")
+        return FakeDriver(download_dir)
+
+    pool = BrowserPool(size=1, download_root=tmp_path, driver_factory=flaky)
+
+    async def main():
+        await pool.start()
+        assert pool.stats()["alive"] == 0
+        return await pool.run(lambda worker: worker.driver is not None)
+
+    assert asyncio.run(main()) is True
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("size", [0, -1])
+def test_empty_pool_is_rejected(tmp_path, size):
+    with pytest.raises(ValueError):
+        BrowserPool(size=size, download_root=tmp_path)
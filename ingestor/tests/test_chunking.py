@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.core.chunking import aggregate_chunks, chunk_documents, chunk_text
+from app.core.commands import GigaChatProcurementSearch as search
+from app.core.commands.models import GigaChatPrepareEmbeddingsArgs
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("  короткий   текст ", size=50, overlap=10) == ["короткий текст"]
+    assert chunk_text("", size=50, overlap=10) == []
+
+
+def test_windows_overlap_and_respect_words():
+    text = " ".join(f"слово{i}" for i in range(100))
+    chunks = chunk_text(text, size=60, overlap=20, max_chunks=100)
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    assert all(chunk.startswith("слово") for chunk in chunks)
+    assert chunks[-1].endswith("слово99")
+
+
+def test_max_chunks_spread_to_end():
+    text = "а" * 10000
+    chunks = chunk_text(text, size=100, overlap=10, max_chunks=4)
+    assert len(chunks) == 4
+
+
+@pytest.mark.parametrize("size, overlap", [(100, 100), (100, 150), (100, -1), (0, 0)])
+def test_invalid_overlap_rejected(size, overlap):
+    with pytest.raises(ValueError):
+        chunk_text("текст " * 100, size=size, overlap=overlap)
+
+
+def test_args_model_rejects_overlap():
+    with pytest.raises(ValidationError):
+        GigaChatPrepareEmbeddingsArgs(scan_id=1, chunk_size=100, chunk_overlap=100)
+
+
+def test_prepare_rejects_overlap_after_size_clamp(monkeypatch):
+    class Pipeline:
+        max_chars = 500
+        configured = True
+
+    monkeypatch.setattr(search, "get_pipeline", lambda: Pipeline())
+    monkeypatch.setattr(search, "get_cache", lambda: None)
+    monkeypatch.setattr(search, "get_artifact", lambda name, scan_id=None: ["документ"])
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(search.gigachat_prepare_embeddings_command(1, chunk_size=2000, chunk_overlap=600))
+    assert error.value.status_code == 422
+
+
+def test_chunk_aggregation():
+    offsets = np.array([0, 2, 3, 6])
+    assert chunk_documents(offsets).tolist() == [0, 0, 1, 2, 2, 2]
+    scores = np.array([[0.1, 0.5, 0.3, 0.2, 0.9, 0.4]])
+    assert np.allclose(aggregate_chunks(scores, offsets, "max"), [[0.5, 0.3, 0.9]])
+    assert np.allclose(aggregate_chunks(scores, offsets, "mean"), [[0.3, 0.3, 0.5]])
+    # Блок документов, начинающийся не с нулевой строки
+    assert np.allclose(aggregate_chunks(scores[:, 2:], offsets[1:], "max"), [[0.3, 0.9]])
+    with pytest.raises(ValueError):
+        aggregate_chunks(scores, offsets, "median")
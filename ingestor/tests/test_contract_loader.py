@@ -0,0 +1,95 @@
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.db.contract_loader import _amount, _date, map_columns, parse_rows, resolve_csv_file
+
+HEADER = [
+    "\ufeffРеестровый номер контракта",
+    "Объект закупки",
+    "Дата заключения контракта",
+    "Заказчик",
+    "Поставщик",
+    "Цена контракта",
+    "Стадия",
+]
+
+
+def test_map_columns_matches_aliases_and_keeps_all_parties():
+    mapping = map_columns(HEADER + ["Лишняя колонка"])
+
+    assert mapping["number"] == [0]
+    assert mapping["parties"] == [3, 4]
+    assert mapping["planned_amount"] == [5]
+    assert "actual_amount" not in mapping
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1 234 567,80", Decimal("1234567.80")),
+        ("1 000 руб.", Decimal("1000.00")),
+        ("'99.999'", Decimal("100.00")),
+        ("9999999999999,99", Decimal("9999999999999.99")),
+        ("", None),
+    ],
+)
+def test_amount(value, expected):
+    assert _amount(value) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "-5", "12345678901234,50", "9999999999999,995"])
+def test_invalid_amount_is_rejected(value):
+    with pytest.raises(ValueError):
+        _amount(value)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("01.02.2024", date(2024, 2, 1)), ("2024-02-01", date(2024, 2, 1)), ("01.02.24", date(2024, 2, 1)), (" ", None)],
+)
+def test_date(value, expected):
+    assert _date(value) == expected
+
+
+def test_parse_rows_cleans_values_and_reports_bad_lines():
+    mapping = map_columns(HEADER)
+    rows = [
+        (2, ["'№ 0123'", "Поставка", "01.02.2024", "ООО Заказчик", "ИП Поставщик", "1 000,50", "Исполнение"]),
+        (3, ["", "Без номера", "01.02.2024", "", "", "1", ""]),
+        (4, ["0456", "x" * 300, "31.02.2024", "", "", "1", ""]),
+        (5, ["0789", "Короткая строка"]),
+        (6, ["0790", "Поставка " * 40]),
+    ]
+
+    records, rejected = parse_rows(rows, mapping)
+
+    assert records[0] == (
+        2, "0123", "Поставка", date(2024, 2, 1), "ООО Заказчик; ИП Поставщик", None, Decimal("1000.50"), None, "Исполнение",
+    )
+    assert records[1] == (5, "0789", "Короткая строка", None, None, None, None, None, None)
+    assert records[2][2] == ("Поставка " * 40).strip()
+    assert [item["line"] for item in rejected] == [3, 4]
+    assert "номера" in rejected[0]["reason"]
+
+
+def test_resolve_csv_file_accepts_names_inside_folder(tmp_path):
+    assert resolve_csv_file("export.csv", tmp_path) == (tmp_path / "export.csv").resolve()
+
+
+@pytest.mark.parametrize("name", ["../secret.csv", "/etc/passwd", "sub/export.csv", "..", ".", ""])
+def test_resolve_csv_file_rejects_paths(tmp_path, name):
+    with pytest.raises(ValueError):
+        resolve_csv_file(name, tmp_path)
+
+
+def test_resolve_csv_file_rejects_symlink_escape(tmp_path):
+    root = tmp_path / "contracts_csv"
+    root.mkdir()
+    (tmp_path / "outside.csv").write_text("x")
+    os.symlink(tmp_path / "outside.csv", root / "link.csv")
+
+    with pytest.raises(ValueError):
+        resolve_csv_file("link.csv", root)
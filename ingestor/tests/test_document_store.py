@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.core.document_store import DocumentStore, make_snippet
+
+RECORDS = [
+    {"id": 1, "price": 10.5, "content": "Поставка бумаги", "tags": ["a"]},
+    {"id": 2, "price": 3, "content": "", "tags": None},
+    {"id": 3, "price": 7.25, "content": "Ремонт кровли здания", "extra": "только здесь"},
+]
+
+
+def test_columns_roundtrip(tmp_path):
+    DocumentStore.write(tmp_path / "docs", RECORDS)
+    store = DocumentStore.open(tmp_path / "docs")
+    assert len(store) == 3
+    assert store.kinds == {"id": "int64", "price": "float64", "content": "text", "tags": "json", "extra": "json"}
+    assert store.get(0) == {"id": 1, "price": 10.5, "content": "Поставка бумаги", "tags": ["a"], "extra": None}
+    assert store.get(2, ["content", "missing"]) == {"content": "Ремонт кровли здания"}
+    assert store.text("content", 1) == ""
+    assert list(store.texts("content", np.array([2, 0]))) == ["Ремонт кровли здания", "Поставка бумаги"]
+
+
+def test_empty_text_column(tmp_path):
+    DocumentStore.write(tmp_path / "docs", [{"content": ""}, {"content": ""}])
+    assert DocumentStore.open(tmp_path / "docs").text("content", 1) == ""
+
+
+def test_snippet_around_query_word():
+    text = "вступление " * 50 + "закупка картриджей для принтеров " + "хвост " * 50
+    snippet = make_snippet(text, "закупки картриджей", length=60)
+    assert "закупка картриджей" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert make_snippet("короткий текст", "x") == "короткий текст"
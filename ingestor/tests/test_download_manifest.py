@@ -0,0 +1,101 @@
+import time
+
+from app.core.contracts import select_contracts
+from app.core.download_manifest import COMPLETE, FAILED, PARTIAL, DownloadManifest
+from app.core.http_downloader import DownloadResult, part_path
+
+CONTRACT_URL = "https://zakupki.gov.ru/epz/rdik/card/info.html?contractRegNum="
+
+
+def _complete(manifest, tmp_path, number, url, content=b"data"):
+    path = tmp_path / f"{number}_{url}.pdf"
+    path.write_bytes(content)
+    result = DownloadResult(url=url, path=str(path), filename=path.name, size=len(content), sha256="x")
+    manifest.record_download(number, result, tmp_path)
+    return result
+
+
+def test_record_contract_detects_changed_document_set(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+
+    assert manifest.record_contract("1", CONTRACT_URL + "1", ["a", "b"]) is True
+    assert manifest.record_contract("1", CONTRACT_URL + "1", ["b", "a"]) is False
+    assert manifest.record_contract("1", CONTRACT_URL + "1", ["a", "b", "c"]) is True
+
+
+def test_plan_skips_complete_and_resumes_partial(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+    manifest.record_contract("1", CONTRACT_URL + "1", ["done", "partial", "new"])
+    _complete(manifest, tmp_path, "1", "done")
+    part_path(tmp_path, "partial.bin").write_bytes(b"12")
+    manifest.record_download("1", DownloadResult(url="partial", filename="partial.bin", error="обрыв"), tmp_path)
+
+    tasks, done = manifest.plan("1", tmp_path, ["done", "partial", "new"])
+
+    assert [result.url for result in done] == ["done"] and done[0].skipped
+    assert [(task.url, task.filename) for task in tasks] == [("partial", "partial.bin"), ("new", None)]
+    assert manifest.stats()["documents_" + PARTIAL] == 1
+
+
+def test_missing_or_truncated_file_is_downloaded_again(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+    result = _complete(manifest, tmp_path, "1", "doc")
+
+    with open(result.path, "ab") as f:
+        f.write(b"tail")
+    tasks, done = manifest.plan("1", tmp_path, ["doc"])
+
+    assert done == [] and [task.url for task in tasks] == ["doc"]
+
+
+def test_failed_download_without_part_is_marked_failed(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+    manifest.record_contract("1", CONTRACT_URL + "1", ["doc"])
+
+    manifest.record_download("1", DownloadResult(url="doc", filename="doc.bin", error="HTTP 404"), tmp_path)
+
+    assert manifest.stats()["documents_" + FAILED] == 1
+    assert manifest.stats()["documents_" + COMPLETE] == 0
+
+
+def test_select_contracts_skips_complete_unless_recheck(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+    links = [CONTRACT_URL + str(i) for i in range(4)]
+    for number in ("0", "2"):
+        manifest.record_contract(number, CONTRACT_URL + number, ["doc" + number])
+        manifest.finish_contract(number, complete=True)
+
+    assert select_contracts(links, manifest, limit=5) == ([links[1], links[3]], 2)
+    assert select_contracts(links, manifest, limit=1) == ([links[1]], 2)
+    assert select_contracts(links, manifest, limit=5, recheck=True) == (links, 0)
+
+
+def test_new_since_returns_documents_fetched_after_timestamp(tmp_path):
+    manifest = DownloadManifest(tmp_path / "m.sqlite")
+    manifest.record_contract("1", CONTRACT_URL + "1", ["old", "fresh"])
+    _complete(manifest, tmp_path, "1", "old")
+    since = time.time()
+    time.sleep(0.01)
+    _complete(manifest, tmp_path, "1", "fresh")
+
+    documents = manifest.new_since(since)
+
+    assert [document["url"] for document in documents] == ["fresh"]
+    assert documents[0]["contract_url"] == CONTRACT_URL + "1"
+
+
+def test_record_downloads_writes_documents_and_contract_state_together(tmp_path):
+    manifest = DownloadManifest(tmp_path / "batch.sqlite")
+    manifest.record_contract("1", CONTRACT_URL + "1", ["a", "b"])
+    results = [
+        DownloadResult(url="a", path=str(tmp_path / "a.bin"), filename="a.bin", size=3),
+        DownloadResult(url="b", filename="b.bin", error="HTTP 500"),
+    ]
+
+    manifest.record_downloads("1", results, tmp_path, complete=False)
+
+    assert manifest.stats() == {
+        "contracts": 1, "contracts_complete": 0, "documents_complete": 1, "documents_partial": 0, "documents_failed": 1,
+    }
+    manifest.record_downloads("1", [], tmp_path, complete=True)
+    assert manifest.complete_contracts(["1"]) == {"1"}
@@ -0,0 +1,73 @@
+import asyncio
+
+from app.core import download_tracker
+from app.core.download_tracker import DownloadTracker
+
+
+def test_completed_download_resolves_waiter(tmp_path):
+    (tmp_path / "old.csv").write_text("old")
+
+    async def main():
+        async with DownloadTracker(tmp_path) as tracker:
+            future = tracker.expect(suffix=".csv")
+            partial = tmp_path / "export.csv.crdownload"
+            partial.write_text("a;b\n")
+            await asyncio.sleep(0.2)
+            assert not future.done()
+            partial.rename(tmp_path / "export.csv")
+            return await asyncio.wait_for(future, 5)
+
+    assert asyncio.run(main()) == (tmp_path / "export.csv").resolve()
+
+
+def test_file_finished_before_expect_is_not_lost(tmp_path):
+    async def main():
+        async with DownloadTracker(tmp_path) as tracker:
+            (tmp_path / "a.txt").write_text("x")
+            (tmp_path / "b.csv").write_text("y")
+            await asyncio.sleep(0.3)
+            return await tracker.wait_for(suffix=".csv", timeout=5), await tracker.wait_for(name="a.txt", timeout=5)
+
+    csv, txt = asyncio.run(main())
+
+    assert csv.name == "b.csv" and txt.name == "a.txt"
+
+
+def test_wait_for_times_out_without_new_file(tmp_path):
+    (tmp_path / "old.csv").write_text("old")
+
+    async def main():
+        async with DownloadTracker(tmp_path) as tracker:
+            return await tracker.wait_for(suffix=".csv", timeout=0.3)
+
+    assert asyncio.run(main()) is None
+
+
+def test_directory_is_not_scanned_on_events(tmp_path, monkeypatch):
+    scans = []
+    monkeypatch.setattr(DownloadTracker, "_rescan", lambda self: scans.append(1))
+
+    async def main():
+        async with DownloadTracker(tmp_path) as tracker:
+            future = tracker.expect(name="doc.pdf")
+            for i in range(5):
+                (tmp_path / f"noise_{i}.tmp").write_text("x")
+                await asyncio.sleep(0.05)
+            (tmp_path / "doc.pdf").write_text("pdf")
+            return await asyncio.wait_for(future, 5)
+
+    assert asyncio.run(main()).name == "doc.pdf"
+    assert scans == []
+
+
+def test_rescan_after_quiet_interval_catches_missed_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_tracker, "RESCAN_INTERVAL_MS", 200)
+    monkeypatch.setattr(DownloadTracker, "_on_changes", lambda self, changes: None)
+
+    async def main():
+        async with DownloadTracker(tmp_path) as tracker:
+            future = tracker.expect(suffix=".csv")
+            (tmp_path / "late.csv").write_text("x")
+            return await asyncio.wait_for(future, 5)
+
+    assert asyncio.run(main()).name == "late.csv"
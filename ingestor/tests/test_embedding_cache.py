@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.core.commands import GigaChatProcurementSearch as search
+from app.core.embedding_cache import EmbeddingCache, cache_key
+from app.core.embedding_pipeline import EMBEDDING_DIM
+
+
+def test_key_ignores_whitespace_but_not_model():
+    assert cache_key("тендер  на\nпоставку", "Embeddings") == cache_key("тендер на поставку", "Embeddings")
+    assert cache_key("тендер", "Embeddings") != cache_key("тендер", "EmbeddingsGigaR")
+
+
+def test_memory_and_disk_levels(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    cache.put("a", np.ones(4, dtype=np.float32), "m")
+    assert cache.get("a").tolist() == [1.0] * 4
+    assert cache.stats()["memory_hits"] == 1
+
+    reopened = EmbeddingCache(tmp_path / "cache.sqlite")
+    assert reopened.get("a").tolist() == [1.0] * 4
+    assert reopened.get("b") is None
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["misses"], stats["disk_entries"]) == (1, 1, 1)
+
+
+def test_disk_eviction_keeps_recent(tmp_path):
+    vector = np.zeros(256, dtype=np.float32)
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", disk_max_bytes=vector.nbytes * 3)
+    for key in "abcde":
+        cache.put(key, vector, "m")
+    stats = cache.stats()
+    assert stats["disk_bytes"] <= vector.nbytes * 3
+    assert stats["evicted"] >= 2
+    assert EmbeddingCache(tmp_path / "cache.sqlite").get("e") is not None
+
+
+class FakePipeline:
+    model = "Embeddings"
+    max_chars = 500
+    configured = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_sync(self, texts):
+        self.calls += 1
+        return np.ones((len(texts), EMBEDDING_DIM), dtype=np.float32)
+
+
+def test_get_embedding_without_cache_always_calls_api(tmp_path, monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(search, "get_pipeline", lambda: pipeline)
+    monkeypatch.setattr(search, "get_cache", lambda: EmbeddingCache(tmp_path / "cache.sqlite"))
+    service = search.GigaChatService()
+
+    service.get_embedding("тестовый запрос")
+    service.get_embedding("тестовый запрос")
+    assert pipeline.calls == 1
+    service.get_embedding("тестовый запрос", use_cache=False)
+    service.get_embedding("тестовый запрос", use_cache=False)
+    assert pipeline.calls == 3
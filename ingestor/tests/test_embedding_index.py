@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from app.core.embedding_index import HASHES_FILE, MANIFEST_FILE, EmbeddingIndex, content_hash, get_index, index_dir
+
+
+def _save(scan_id=1, count=3, hashes=True, value=1.0):
+    vectors = np.full((count, 4), value, dtype=np.float32)
+    documents = [{"id": i, "content": f"документ {i}"} for i in range(count)]
+    return EmbeddingIndex.save(
+        scan_id,
+        vectors,
+        np.arange(count),
+        documents,
+        model="test",
+        hashes=np.array([content_hash(d["content"]) for d in documents]) if hashes else None,
+    )
+
+
+def test_save_and_open(data_root):
+    index = _save()
+    assert len(index) == 3
+    assert index.path.parent == index_dir(1)
+    assert index.documents.text("content", 2) == "документ 2"
+    assert EmbeddingIndex.open(1).hashes.shape == (3,)
+
+
+def test_resave_drops_hashes(data_root):
+    _save(hashes=True)
+    index = _save(hashes=False)
+    assert index.hashes is None
+    assert not (index.path / HASHES_FILE).exists()
+
+
+def test_old_version_untouched_until_manifest_switch(data_root):
+    first = _save(value=1.0)
+    second = _save(value=2.0)
+    third = _save(value=3.0)
+    # Предыдущая версия остаётся для читателей, открывших её до подмены
+    assert np.all(np.load(second.path / "vectors.npy") == 2.0)
+    assert not first.path.exists()
+    manifest = json.loads((index_dir(1) / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["version"] == third.path.name
+    assert np.all(get_index(1).vectors == 3.0)
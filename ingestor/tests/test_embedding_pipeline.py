@@ -0,0 +1,81 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.embedding_pipeline import EMBEDDING_DIM, AdaptiveLimiter, EmbeddingPipeline
+
+
+def test_aimd_increase_and_decrease():
+    limiter = AdaptiveLimiter(initial=4, maximum=6, target_latency=1.0)
+    for _ in range(5):
+        limiter.on_success(0.1)
+    assert int(limiter.limit) == 5
+    limiter.on_success(5.0)
+    assert limiter.limit < 5
+    for _ in range(100):
+        limiter.on_success(0.1)
+    assert limiter.limit == 6
+
+
+def test_rate_limited_halves_and_pauses():
+    limiter = AdaptiveLimiter(initial=8, minimum=1)
+    limiter.on_rate_limited(retry_after=2.0)
+    assert limiter.limit == 4
+    assert limiter.paused_until > time.monotonic() + 1.5
+    for _ in range(5):
+        limiter.on_rate_limited()
+    assert limiter.limit == 1
+
+
+def test_in_flight_never_exceeds_limit():
+    limiter = AdaptiveLimiter(initial=2)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+class RateLimited(Exception):
+    status_code = 429
+    headers = {"Retry-After": "0"}
+
+
+class FakeClient:
+    def __init__(self, fail_first: int):
+        self.fail_first = fail_first
+        self.calls = 0
+
+    async def aembeddings(self, texts, model):
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise RateLimited("429")
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(t))] * EMBEDDING_DIM) for i, t in enumerate(texts)]
+        )
+
+
+def test_embed_retries_after_429():
+    pipeline = EmbeddingPipeline(credentials="token", batch_size=2, max_in_flight=2)
+    client = FakeClient(fail_first=1)
+
+    async def main():
+        pipeline._loop = asyncio.get_running_loop()
+        pipeline._giga = client
+        return await pipeline.embed(["a", "bb", "ccc"])
+
+    vectors, ok = asyncio.run(main())
+    assert ok.all()
+    assert np.array_equal(vectors[:, 0], [1.0, 2.0, 3.0])
+    assert pipeline.stats()["rate_limited"] == 1
+    assert client.calls == 3
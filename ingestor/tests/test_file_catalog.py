@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+from app.core.file_catalog import CONTRACT_DOCUMENT, REGISTRY_CSV, SCAN_ORIGINAL, SCAN_RESULT, FileCatalog, file_entry
+
+
+def _files(tmp_path, n, scan_id=1):
+    entries = []
+    for i in range(n):
+        path = tmp_path / f"{scan_id}_result_{i}.html"
+        path.write_text("x" * i)
+        entries.append(file_entry(str(path), SCAN_RESULT, scan_id=scan_id))
+    return entries
+
+
+def _all_pages(catalog, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        items, cursor = catalog.list(cursor=cursor, limit=limit, **filters)
+        pages.append([item["path"] for item in items])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pagination_visits_every_file_once(tmp_path):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    entries = _files(tmp_path, 7)
+    catalog.add(entries)
+
+    pages = _all_pages(catalog, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == [entry["path"] for entry in entries]
+
+
+def test_exact_multiple_of_limit_has_no_empty_last_page(tmp_path):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    catalog.add(_files(tmp_path, 4))
+
+    assert [len(page) for page in _all_pages(catalog, limit=2)] == [2, 2]
+
+
+def test_filters_apply_to_pages_and_summary(tmp_path):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    catalog.add(_files(tmp_path, 3, scan_id=1) + _files(tmp_path, 4, scan_id=2))
+
+    pages = _all_pages(catalog, limit=2, scan_id=2)
+
+    assert len(sum(pages, [])) == 4
+    assert catalog.summary(scan_id=2)["files"] == 4
+    assert catalog.summary()["by_kind"][SCAN_RESULT]["files"] == 7
+
+
+def test_readding_a_path_keeps_its_position(tmp_path):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    entries = _files(tmp_path, 3)
+    catalog.add(entries)
+
+    catalog.add([entries[0]])
+
+    assert [item["path"] for item in catalog.list()[0]] == [entry["path"] for entry in entries]
+
+
+def test_files_deleted_from_disk_are_dropped_on_listing(tmp_path):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    entries = _files(tmp_path, 4)
+    catalog.add(entries)
+    (tmp_path / "1_result_1.html").unlink()
+
+    items, _ = catalog.list()
+
+    assert [item["path"] for item in items] == [entries[i]["path"] for i in (0, 2, 3)]
+    assert catalog.summary()["files"] == 3
+
+
+def test_rebuild_indexes_known_folders(tmp_path):
+    data, docs, csv = tmp_path / "data", tmp_path / "contracts_docs", tmp_path / "contracts_csv"
+    (data / "5").mkdir(parents=True)
+    (data / "5" / "5_main_0.html").write_text("a")
+    (data / "5" / "5_result_0.html").write_text("b")
+    (docs / "0123").mkdir(parents=True)
+    (docs / "0123" / "act.pdf").write_text("c")
+    (docs / "0123" / "act2.pdf.part").write_text("d")
+    csv.mkdir()
+    (csv / "export.csv").write_text("e")
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    catalog.add(_files(tmp_path, 2))
+
+    assert catalog.rebuild(data, docs, csv) == 4
+    kinds = {item["kind"]: item for item in catalog.list()[0]}
+    assert set(kinds) == {SCAN_ORIGINAL, SCAN_RESULT, CONTRACT_DOCUMENT, REGISTRY_CSV}
+    assert kinds[CONTRACT_DOCUMENT]["contract"] == "0123"
+    assert kinds[SCAN_RESULT]["scan_id"] == 5
+
+
+def test_failed_rebuild_keeps_previous_catalog(tmp_path, monkeypatch):
+    catalog = FileCatalog(tmp_path / "catalog.sqlite")
+    catalog.add(_files(tmp_path, 2))
+    monkeypatch.setattr(FileCatalog, "_rows", staticmethod(lambda entries: [("broken", None, None, None, 0, 0.0)]))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        catalog.rebuild(tmp_path / "none", tmp_path / "none", tmp_path / "none")
+
+    assert catalog.summary()["files"] == 2
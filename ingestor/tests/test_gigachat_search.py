@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from app.core.commands import GigaChatProcurementSearch as search
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embedding_index import EmbeddingIndex
+from app.core.embedding_pipeline import EMBEDDING_DIM
+
+DOCUMENTS = ["поставка бумаги офисной", "ремонт кровли здания", "поставка картриджей для принтеров"]
+
+
+class FakePipeline:
+    model = "Embeddings"
+    max_chars = 500
+    configured = True
+
+    def __init__(self):
+        self.threads = []
+
+    def embed_sync(self, texts):
+        self.threads.append(threading.current_thread())
+        return np.stack([_vector(text) for text in texts])
+
+    async def embed(self, texts, on_progress=None):
+        return np.stack([_vector(text) for text in texts]), np.ones(len(texts), dtype=bool)
+
+
+def _vector(text):
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for word in text.split():
+        vector[hash(word[:5]) % EMBEDDING_DIM] += 1
+    return vector / np.linalg.norm(vector)
+
+
+def _prepare(data_root, monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(search, "get_pipeline", lambda: pipeline)
+    monkeypatch.setattr(search, "get_cache", lambda: EmbeddingCache(data_root / "cache.sqlite"))
+    monkeypatch.setattr(search, "_services", {})
+    vectors = np.stack([_vector(text) for text in DOCUMENTS])
+    EmbeddingIndex.save(7, vectors, np.arange(3), [{"content": text} for text in DOCUMENTS], model="Embeddings")
+    return pipeline
+
+
+def test_dense_search_embeds_query_off_the_event_loop(data_root, monkeypatch):
+    pipeline = _prepare(data_root, monkeypatch)
+
+    async def main():
+        loop_thread = threading.current_thread()
+        result = await search.gigachat_search_command(7, "ремонт кровли", top_k=1, mode="dense")
+        return loop_thread, result
+
+    loop_thread, result = asyncio.run(main())
+    assert result["results"][0]["snippet"].startswith("ремонт кровли")
+    assert pipeline.threads and loop_thread not in pipeline.threads
+
+
+def test_ivf_search_finds_same_document(data_root, monkeypatch):
+    _prepare(data_root, monkeypatch)
+    result = asyncio.run(search.gigachat_search_command(7, "картриджей для принтеров", top_k=1, mode="dense", index_type="ivf"))
+    assert "картриджей" in result["results"][0]["snippet"]
+
+
+def test_lexical_answer_skips_embedding(data_root, monkeypatch):
+    pipeline = _prepare(data_root, monkeypatch)
+    result = asyncio.run(search.gigachat_batch_search_command(7, ["поставка бумаги"], top_k=1, mode="hybrid"))
+    assert result["results"]["поставка бумаги"][0]["match"] == "lexical"
+    assert pipeline.threads == []
+
+
+def test_batch_search_matches_single_queries(data_root, monkeypatch):
+    _prepare(data_root, monkeypatch)
+    queries = ["ремонт кровли", "картриджей принтеров", "бумаги", "ремонт кровли"]
+
+    async def main():
+        batch = await search.gigachat_batch_search_command(7, queries, top_k=2, mode="dense")
+        single = {q: await search.gigachat_search_command(7, q, top_k=2, mode="dense") for q in set(queries)}
+        return batch, single
+
+    batch, single = asyncio.run(main())
+    assert set(batch["results"]) == set(queries)
+    for query, response in single.items():
+        assert [r["snippet"] for r in batch["results"][query]] == [r["snippet"] for r in response["results"]]
@@ -0,0 +1,27 @@
+import asyncio
+import re
+
+from app.core.html_cleaning import HtmlCleaner
+
+
+def strip_tags(contents):
+    return [re.sub(r"<[^>]+>", "", content) for content in contents]
+
+
+def test_pool_keeps_order_and_reports_batches():
+    cleaner = HtmlCleaner(max_workers=2, batch_size=3, clean=strip_tags)
+    contents = [f"<p>документ {i}</p>" for i in range(10)]
+    try:
+        results, stats = asyncio.run(cleaner.clean(contents))
+    finally:
+        cleaner.close()
+    assert results == [f"документ {i}" for i in range(10)]
+    assert [batch["documents"] for batch in stats["batches"]] == [3, 3, 3, 1]
+    assert stats["workers"] == 2
+
+
+def test_long_documents_truncated():
+    cleaner = HtmlCleaner(max_doc_chars=5, clean=strip_tags)
+    results, stats = asyncio.run(cleaner.clean_inline(["абвгдеёжз", "abc"]))
+    assert results == ["абвгд", "abc"]
+    assert stats["truncated"] == 1
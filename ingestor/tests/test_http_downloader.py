@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+
+from aiohttp import web
+
+from app.core.http_downloader import DownloadTask, HttpDownloader, part_path, unique_filename
+
+BODY = bytes(range(256)) * 400
+
+
+def _app(state):
+    async def named(request):
+        # Разные документы с одинаковым именем во вложении
+        body = request.match_info["doc"].encode() * 10
+        return web.Response(body=body, headers={"Content-Disposition": 'attachment; filename="contract.pdf"'})
+
+    async def flaky(request):
+        state["flaky"] = state.get("flaky", 0) + 1
+        if state["flaky"] == 1:
+            return web.Response(status=503)
+        return web.Response(body=BODY)
+
+    async def ranged(request):
+        state["range"] = request.headers.get("Range")
+        if state["range"]:
+            start = int(state["range"].split("=")[1].rstrip("-"))
+            return web.Response(
+                status=206, body=BODY[start:], headers={"Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"}
+            )
+        return web.Response(body=BODY)
+
+    app = web.Application()
+    app.router.add_get("/named/{doc}", named)
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/ranged", ranged)
+    return app
+
+
+def _serve(state, scenario):
+    async def main():
+        runner = web.AppRunner(_app(state))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with HttpDownloader(retries=2, backoff=0.01, write_buffer=1000) as downloader:
+                return await scenario(downloader, f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_same_attachment_name_from_different_urls_does_not_collide(tmp_path):
+    async def scenario(downloader, base):
+        tasks = [DownloadTask(url=f"{base}/named/{doc}", directory=tmp_path) for doc in ("a", "b", "c")]
+        return await downloader.fetch_all(tasks)
+
+    results = _serve({}, scenario)
+
+    assert all(result.ok for result in results)
+    assert len({result.path for result in results}) == 3
+    for result, doc in zip(results, "abc"):
+        assert result.filename == unique_filename(result.url, "contract.pdf")
+        assert open(result.path, "rb").read() == doc.encode() * 10
+
+
+def test_retryable_status_is_retried(tmp_path):
+    state = {}
+
+    async def scenario(downloader, base):
+        return await downloader.fetch(DownloadTask(url=f"{base}/flaky", directory=tmp_path, filename="f.bin"))
+
+    result = _serve(state, scenario)
+
+    assert result.ok and result.attempts == 2
+    assert result.sha256 == hashlib.sha256(BODY).hexdigest()
+    assert (tmp_path / "f.bin").read_bytes() == BODY
+
+
+def test_partial_file_is_resumed_with_range(tmp_path):
+    state = {}
+    part_path(tmp_path, "r.bin").write_bytes(BODY[:1000])
+
+    async def scenario(downloader, base):
+        return await downloader.fetch(DownloadTask(url=f"{base}/ranged", directory=tmp_path, filename="r.bin"))
+
+    result = _serve(state, scenario)
+
+    assert state["range"] == "bytes=1000-"
+    assert result.ok and result.resumed_from == 1000 and result.size == len(BODY)
+    assert (tmp_path / "r.bin").read_bytes() == BODY
+    assert not part_path(tmp_path, "r.bin").exists()
+
+
+def test_disk_error_is_returned_in_result(tmp_path):
+    blocked = tmp_path / "not_a_dir"
+    blocked.write_text("")
+
+    async def scenario(downloader, base):
+        return await downloader.fetch(DownloadTask(url=f"{base}/flaky", directory=blocked / "docs", filename="f.bin"))
+
+    result = _serve({"flaky": 1}, scenario)
+
+    assert not result.ok
+    assert result.attempts == 1
+    assert "Ошибка записи файла" in result.error
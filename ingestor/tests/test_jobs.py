@@ -0,0 +1,152 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import jobs
+from app.core.jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager, JobStore, report_progress
+from app.core.registry import register_command
+
+
+def test_store_roundtrip(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    first = store.create("a", {"scan_id": 1})
+    second = store.create("b", {})
+    store.update(first, status=SUCCEEDED, result={"ok": True}, progress={"done": 3})
+    job = store.get(first)
+    assert (job["args"], job["result"], job["progress"]) == ({"scan_id": 1}, {"ok": True}, {"done": 3})
+    assert [j["id"] for j in store.list()] == [second, first]
+    assert store.count(QUEUED) == {"b": 1}
+    assert store.count(SUCCEEDED, "a") == {"a": 1}
+    assert JobStore(tmp_path / "jobs.sqlite").get(second)["status"] == QUEUED
+
+
+def test_store_encodes_args(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    job_id = store.create("a", {"since": date(2024, 2, 1), "amount": Decimal("1.50")})
+    assert store.get(job_id)["args"] == {"since": "2024-02-01", "amount": 1.5}
+
+
+async def _wait_status(manager, job_id, statuses, timeout=2.0):
+    async def poll():
+        while manager.status(job_id)["status"] not in statuses:
+            await asyncio.sleep(0.005)
+
+    await asyncio.wait_for(poll(), timeout)
+    return manager.status(job_id)
+
+
+def test_limited_command_does_not_hold_workers(tmp_path, isolated_commands, monkeypatch):
+    release = asyncio.Event()
+
+    @register_command("slow", job=True, max_concurrency=1)
+    async def slow():
+        await release.wait()
+        return {"slow": True}
+
+    @register_command("fast", job=True)
+    async def fast(n: int):
+        report_progress(n=n)
+        return {"n": n}
+
+    async def main():
+        manager = JobManager(JobStore(tmp_path / "jobs.sqlite"), workers=2)
+        monkeypatch.setattr(jobs, "_manager", manager)
+        await manager.start()
+        try:
+            first = manager.submit("slow", {})
+            second = manager.submit("slow", {})
+            await _wait_status(manager, first, (RUNNING,))
+            # Второй slow ждёт лимита команды, но свободный worker достаётся fast
+            fast_jobs = [manager.submit("fast", {"n": n}) for n in range(3)]
+            for job_id, n in zip(fast_jobs, range(3)):
+                job = await _wait_status(manager, job_id, (SUCCEEDED,))
+                assert job["result"] == {"n": n} and job["progress"] == {"n": n}
+            assert manager.status(second)["status"] == QUEUED
+
+            release.set()
+            assert (await _wait_status(manager, second, (SUCCEEDED,)))["result"] == {"slow": True}
+        finally:
+            await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_queue_depth_and_cancel(tmp_path, isolated_commands):
+    release = asyncio.Event()
+
+    @register_command("limited", job=True, max_concurrency=1, queue_depth=1)
+    async def limited():
+        await release.wait()
+
+    @register_command("broken", job=True)
+    async def broken():
+        raise HTTPException(status_code=400, detail="плохие аргументы")
+
+    async def main():
+        manager = JobManager(JobStore(tmp_path / "jobs.sqlite"), workers=1)
+        await manager.start()
+        try:
+            running = manager.submit("limited", {})
+            await _wait_status(manager, running, (RUNNING,))
+            waiting = manager.submit("limited", {})
+            with pytest.raises(HTTPException) as error:
+                manager.submit("limited", {})
+            assert error.value.status_code == 429
+
+            assert manager.cancel(waiting)["status"] == CANCELLED
+            manager.cancel(running)
+            await _wait_status(manager, running, (CANCELLED,))
+
+            failed = await _wait_status(manager, manager.submit("broken", {}), (FAILED,))
+            assert failed["error"] == "плохие аргументы"
+        finally:
+            await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_restart_requeues_and_fails_interrupted(tmp_path, isolated_commands):
+    @register_command("echo", job=True)
+    async def echo(value: int):
+        return value
+
+    store = JobStore(tmp_path / "jobs.sqlite")
+    queued = store.create("echo", {"value": 5})
+    interrupted = store.create("echo", {"value": 6})
+    store.update(interrupted, status=RUNNING)
+    unknown = store.create("missing", {})
+
+    async def main():
+        manager = JobManager(store, workers=1)
+        await manager.start()
+        try:
+            assert (await _wait_status(manager, queued, (SUCCEEDED,)))["result"] == 5
+            assert manager.status(interrupted)["status"] == FAILED
+            assert (await _wait_status(manager, unknown, (FAILED,)))["error"] == "Команда не найдена"
+        finally:
+            await manager.stop()
+
+    asyncio.run(main())
+    assert jobs.current_job.get() is None
+
+
+def test_shutdown_fails_running_job_instead_of_cancelling(tmp_path, isolated_commands):
+    @register_command("endless", job=True)
+    async def endless():
+        await asyncio.Event().wait()
+
+    store = JobStore(tmp_path / "jobs.sqlite")
+
+    async def main():
+        manager = JobManager(store, workers=1)
+        await manager.start()
+        job_id = manager.submit("endless", {})
+        await _wait_status(manager, job_id, (RUNNING,))
+        await manager.stop()
+        return job_id
+
+    job = store.get(asyncio.run(main()))
+    assert (job["status"], job["error"]) == (FAILED, "Прервано остановкой сервиса")
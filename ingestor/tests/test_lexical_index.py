@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.core.lexical_index import MAX_TOKEN_LENGTH, LexicalIndex, Terms, stem, tokenize
+
+TEXTS = [
+    "<p>Поставка бумаги для офиса</p>",
+    "Ремонт кровли административного здания",
+    "Поставка картриджей и бумаги для принтеров",
+    "<div class='x'>Услуги связи</div>",
+]
+
+
+def test_tokenize_strips_tags_and_long_tokens():
+    assert tokenize("<td style='color:red'>Ёлки</td>") == ["елк"]
+    assert tokenize("слово " + "a" * (MAX_TOKEN_LENGTH + 1)) == [stem("слово")]
+
+
+def test_terms_lookup_by_utf8_bytes():
+    terms = Terms.from_sorted(sorted(["бумаг", "abc", "ремонт", "ёж", "z"]))
+    assert list(terms) == sorted(["бумаг", "abc", "ремонт", "ёж", "z"])
+    assert terms.find("ремонт") == list(terms).index("ремонт")
+    assert terms.find("нет") == -1
+    assert terms.data.dtype == np.uint8
+
+
+def test_bm25_ranking_and_coverage():
+    index = LexicalIndex.build(TEXTS)
+    scores, docs, coverage = index.search("поставка бумаги", 3)
+    assert set(docs[:2].tolist()) == {0, 2}
+    assert coverage[0] == 1.0
+    assert np.all(np.diff(scores) <= 0)
+    _, docs, _ = index.search("class div", 3)
+    assert len(docs) == 0
+
+
+def test_unknown_word_lowers_coverage():
+    index = LexicalIndex.build(TEXTS)
+    _, docs, coverage = index.search("ремонт кровли трактора", 1)
+    assert docs[0] == 1
+    assert 0 < coverage[0] < 1
+
+
+def test_save_load_roundtrip(tmp_path):
+    index = LexicalIndex.build(TEXTS)
+    index.save(tmp_path / "lexical.npz")
+    loaded = LexicalIndex.load(tmp_path / "lexical.npz")
+    assert list(loaded.terms) == list(index.terms)
+    for query in ("бумаги", "услуги связи"):
+        assert np.array_equal(loaded.search(query, 2)[1], index.search(query, 2)[1])
+
+
+def test_full_match_coverage_is_exactly_one():
+    # Сумма IDF многих слов в float32 не совпадает с суммой в float64
+    texts = [" ".join(f"w{(doc * 7 + j * 3) % 200}" for j in range(30)) for doc in range(50)]
+    index = LexicalIndex.build(texts)
+    for doc, text in enumerate(texts):
+        _, docs, coverage = index.search(" ".join(text.split()[:12]), len(texts))
+        assert coverage[docs.tolist().index(doc)] == 1.0
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import limits
+from app.core.limits import Bulkhead, CommandLimiter
+
+
+def test_call_beyond_queue_depth_is_rejected_with_429(isolated_commands):
+    limiter = CommandLimiter("slow", Bulkhead("io", None), max_concurrency=1, queue_depth=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    async def main():
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (limiter.running, limiter.waiting) == (1, 1)
+        with pytest.raises(HTTPException) as error:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return error.value
+
+    error = asyncio.run(main())
+
+    assert error.status_code == 429 and error.headers == {"Retry-After": "1"}
+    assert limiter.counters["rejected"] == 1
+    assert (limiter.running, limiter.waiting) == (0, 0)
+
+
+def test_bulkhead_is_shared_between_commands(isolated_commands):
+    bulkhead = Bulkhead("cpu", 1)
+    first = CommandLimiter("first", bulkhead)
+    second = CommandLimiter("second", bulkhead)
+
+    order = []
+
+    async def use(limiter):
+        async with limiter.slot():
+            order.append(limiter.name)
+
+    async def main():
+        async with first.slot():
+            assert not second.available()
+            waiter = asyncio.create_task(use(second))
+            await asyncio.sleep(0.01)
+            assert second.waiting == 1 and order == []
+            order.append("first done")
+        await waiter
+
+    asyncio.run(main())
+
+    assert order == ["first done", "second"]
+
+
+def test_timeout_answers_504_but_keeps_slot_until_work_finishes(isolated_commands):
+    limiter = CommandLimiter("cpu_bound", Bulkhead("cpu", 1), max_concurrency=1, timeout=0.05)
+    finish = threading.Event()
+    released = []
+    limits.add_release_listener(lambda: released.append(limiter.running))
+
+    async def command():
+        # Работа в потоке: отменить её нельзя, место должно оставаться занятым
+        await asyncio.to_thread(finish.wait, 5)
+        return "late"
+
+    async def main():
+        with pytest.raises(HTTPException) as error:
+            async with limiter.slot() as lease:
+                await limiter.run(command(), lease)
+        held = (limiter.available(), limiter.bulkhead.available(), limiter.stats()["overrunning"])
+        finish.set()
+        while limiter.running:
+            await asyncio.sleep(0.01)
+        return error.value.status_code, held
+
+    status, held = asyncio.run(main())
+
+    assert status == 504
+    assert held == (False, False, 1)
+    assert released == [0]
+    assert limiter.available() and limiter.overrunning == 0
+    assert limiter.counters["timeouts"] == 1
+
+
+def test_cancelling_caller_cancels_the_command(isolated_commands):
+    limiter = CommandLimiter("cancelled", Bulkhead("io", None), timeout=10)
+    cancelled = []
+
+    async def command():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def call():
+        async with limiter.slot() as lease:
+            await limiter.run(command(), lease)
+
+    async def main():
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    assert cancelled == [True]
+    assert limiter.running == 0
+
+
+def test_without_lease_timeout_cancels_the_command(isolated_commands):
+    limiter = CommandLimiter("plain", Bulkhead("io", None), timeout=0.01)
+
+    async def main():
+        with pytest.raises(HTTPException) as error:
+            await limiter.run(asyncio.sleep(1))
+        return error.value.status_code
+
+    assert asyncio.run(main()) == 504
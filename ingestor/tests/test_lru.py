@@ -0,0 +1,46 @@
+from app.core import lru
+from app.core.lru import ByteLRU
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = ByteLRU(max_bytes=10)
+    cache.put("a", "A", 4)
+    cache.put("b", "B", 4)
+    assert cache.get("a") == "A"
+
+    cache.put("c", "C", 4)
+
+    assert "b" not in cache
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.bytes == 8
+    assert cache.stats()["evicted"] == 1
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = ByteLRU(max_bytes=10, sizeof=len)
+    cache.put("small", "xx")
+
+    assert cache.put("big", "x" * 11) is False
+    assert "big" not in cache and "small" in cache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    cache = ByteLRU(max_bytes=10, ttl=5)
+    cache.put("a", "A", 1)
+
+    now[0] += 6
+
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+    assert cache.stats()["expired"] == 1
+
+
+def test_invalidate_by_predicate():
+    cache = ByteLRU(max_bytes=100)
+    for key in [(1, "content"), (1, "title"), (2, "content")]:
+        cache.put(key, key, 1)
+
+    assert cache.invalidate(lambda key: key[0] == 1) == 2
+    assert len(cache) == 1 and (2, "content") in cache
@@ -0,0 +1,61 @@
+import asyncio
+
+from app import main
+
+
+class FakeJobs:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class FakePool:
+    def __init__(self):
+        self.started = 0
+
+    async def start(self):
+        self.started += 1
+
+
+def run_lifespan(monkeypatch, **env):
+    pool = FakePool()
+    imported = []
+
+    async def warm_up_commands():
+        imported.append(True)
+
+    async def close_browser_pool():
+        pass
+
+    monkeypatch.setattr(main, "get_job_manager", FakeJobs)
+    monkeypatch.setattr(main, "get_browser_pool", lambda: pool)
+    monkeypatch.setattr(main, "warm_up_commands", warm_up_commands)
+    monkeypatch.setattr(main, "close_browser_pool", close_browser_pool)
+    monkeypatch.setattr(main, "close_html_cleaner", lambda: None)
+    monkeypatch.delenv("INGESTOR_WARMUP", raising=False)
+    monkeypatch.delenv("INGESTOR_BROWSER_PREWARM", raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    async def serve():
+        async with main.lifespan(main.app):
+            await asyncio.sleep(0)
+
+    asyncio.run(serve())
+    return imported, pool
+
+
+def test_startup_warms_up_commands_without_starting_browsers(monkeypatch):
+    imported, pool = run_lifespan(monkeypatch)
+
+    assert imported == [True]
+    assert pool.started == 0
+
+
+def test_browser_prewarm_is_opt_in(monkeypatch):
+    imported, pool = run_lifespan(monkeypatch, INGESTOR_BROWSER_PREWARM="1")
+
+    assert imported == [True]
+    assert pool.started == 1
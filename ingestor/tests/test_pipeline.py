@@ -0,0 +1,179 @@
+import asyncio
+from typing import Optional
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.core import jobs
+from app.core.jobs import FAILED, SUCCEEDED, JobManager, JobStore
+from app.core.pipeline import (
+    PipelineResponse,
+    PipelineStep,
+    check_pipeline,
+    get_artifact,
+    put_artifact,
+    run_pipeline,
+)
+from app.core.registry import register_command
+
+
+class ScanArgs(BaseModel):
+    scan_id: int
+    fail: bool = False
+
+
+@pytest.fixture
+def steps_commands(isolated_commands, tmp_path, monkeypatch):
+    """Команды для шагов и менеджер задач во временной базе"""
+    calls = []
+
+    @register_command("read", args_model=ScanArgs)
+    async def read(scan_id: int, fail: bool = False):
+        calls.append("read")
+        if fail:
+            raise ValueError("нет данных")
+        put_artifact("rows", [1, 2, 3], scan_id)
+        return {"rows": 3}
+
+    @register_command("count", args_model=ScanArgs, job=True)
+    async def count(scan_id: int, fail: bool = False):
+        calls.append("count")
+        jobs.report_progress(stage="counting")
+        return {"total": sum(get_artifact("rows", scan_id))}
+
+    @register_command("nested", response_model=PipelineResponse, job=True)
+    async def nested():
+        return await run_pipeline([PipelineStep(id="r", command="read")], scan_id=1)
+
+    manager = JobManager(JobStore(tmp_path / "jobs.sqlite"), workers=1)
+    monkeypatch.setattr(jobs, "_manager", manager)
+    return calls, manager
+
+
+@pytest.mark.parametrize(
+    "steps, message",
+    [
+        ([], "без шагов"),
+        ([PipelineStep(id="a", command="missing")], "не найдена"),
+        ([PipelineStep(id="a", command="read"), PipelineStep(id="a", command="read")], "повторяются"),
+        ([PipelineStep(id="a", command="read", after=["b"])], "неизвестные шаги"),
+        (
+            [PipelineStep(id="a", command="read", after=["b"]), PipelineStep(id="b", command="read", after=["a"])],
+            "цикл",
+        ),
+        ([PipelineStep(id="a", command="nested")], "сама запускает конвейер"),
+        ([PipelineStep(id="a", command="read", args={"scan_id": "x"})], "Шаг a"),
+    ],
+)
+def test_invalid_graphs_are_rejected(steps_commands, steps, message):
+    with pytest.raises(ValueError, match=message):
+        check_pipeline(steps, scan_id=1)
+
+
+def test_steps_are_ordered_by_dependencies_and_get_pipeline_scan_id(steps_commands):
+    kwargs = check_pipeline(
+        [PipelineStep(id="c", command="count", after=["r"]), PipelineStep(id="r", command="read")], scan_id=7
+    )
+
+    assert list(kwargs) == ["r", "c"]
+    assert kwargs["r"] == {"scan_id": 7, "fail": False}
+
+
+def test_nested_pipeline_is_rejected_with_400(steps_commands):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_pipeline([PipelineStep(id="n", command="nested")]))
+
+    assert error.value.status_code == 400
+
+
+def test_job_step_runs_as_child_job_and_sees_artifacts(steps_commands):
+    calls, manager = steps_commands
+
+    response = asyncio.run(
+        run_pipeline([PipelineStep(id="r", command="read"), PipelineStep(id="c", command="count", after=["r"])], scan_id=1)
+    )
+
+    steps = {step["id"]: step for step in response["steps"]}
+    assert response["success"] and calls == ["read", "count"]
+    assert steps["r"]["job_id"] is None
+    child = manager.status(steps["c"]["job_id"])
+    assert child["command"] == "count" and child["status"] == SUCCEEDED
+    assert child["result"] == {"total": 6} and child["progress"] == {"stage": "counting"}
+    assert steps["c"]["result"] == {"total": 6}
+
+
+def test_failed_step_skips_dependents(steps_commands):
+    calls, _ = steps_commands
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(
+            run_pipeline(
+                [
+                    PipelineStep(id="r", command="read", args={"fail": True}),
+                    PipelineStep(id="c", command="count", after=["r"]),
+                ],
+                scan_id=1,
+            )
+        )
+
+    response = error.value.detail
+    assert error.value.status_code == 500
+    statuses = {step["id"]: (step["status"], step["error"]) for step in response["steps"]}
+    assert not response["success"]
+    assert statuses == {"r": ("failed", "нет данных"), "c": ("skipped", None)}
+    assert calls == ["read"]
+
+
+def test_failed_child_job_fails_its_step(steps_commands):
+    _, manager = steps_commands
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_pipeline([PipelineStep(id="c", command="count")], scan_id=1))
+
+    step = error.value.detail["steps"][0]
+    assert step["status"] == "failed"
+    assert manager.status(step["job_id"])["status"] == FAILED
+
+
+def _run_pipe_job(manager, fail: bool = False):
+    @register_command("pipe", response_model=PipelineResponse, job=True)
+    async def pipe(scan_id: Optional[int] = None):
+        return await run_pipeline(
+            [
+                PipelineStep(id="r", command="read", args={"fail": fail}),
+                PipelineStep(id="c", command="count", after=["r"]),
+            ],
+            scan_id=2,
+        )
+
+    async def main():
+        await manager.start()
+        try:
+            job_id = manager.submit("pipe", {})
+            while manager.status(job_id)["status"] not in (SUCCEEDED, FAILED):
+                await asyncio.sleep(0.005)
+            return manager.status(job_id)
+        finally:
+            await manager.stop()
+
+    return asyncio.run(asyncio.wait_for(main(), 5))
+
+
+def test_pipeline_job_with_failed_step_is_failed(steps_commands):
+    _, manager = steps_commands
+
+    job = _run_pipe_job(manager, fail=True)
+
+    assert job["status"] == FAILED
+    assert "не выполнены шаги: r, c" in job["error"]
+    assert [step["status"] for step in job["result"]["steps"]] == ["failed", "skipped"]
+
+
+def test_pipeline_job_with_job_steps_does_not_wait_for_free_worker(steps_commands):
+    _, manager = steps_commands
+
+    # Единственный worker занят самим конвейером
+    job = _run_pipe_job(manager)
+
+    assert job["result"]["success"] is True
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from app.core import pipeline
+from app.core.commands import GigaChatProcurementSearch as search
+from app.core.embedding_cache import EmbeddingCache
+from app.core.embedding_pipeline import EMBEDDING_DIM
+
+
+class CountingPipeline:
+    model = "Embeddings"
+    max_chars = 500
+    configured = True
+
+    def __init__(self):
+        self.embedded = []
+
+    async def embed(self, texts, on_progress=None):
+        self.embedded.extend(texts)
+        vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i, hash(text) % EMBEDDING_DIM] = 1
+        return vectors, np.ones(len(texts), dtype=bool)
+
+
+def _prepare(contents, **kwargs):
+    async def main():
+        token = pipeline._artifacts.set({(1, pipeline.RAW_DOCUMENTS): contents})
+        try:
+            return await search.gigachat_prepare_embeddings_command(1, **kwargs)
+        finally:
+            pipeline._artifacts.reset(token)
+
+    return asyncio.run(main())
+
+
+def test_reprepare_embeds_only_changed_documents(data_root, monkeypatch):
+    counting = CountingPipeline()
+    monkeypatch.setattr(search, "get_pipeline", lambda: counting)
+    monkeypatch.setattr(search, "get_cache", lambda: EmbeddingCache(data_root / "cache.sqlite"))
+    monkeypatch.setattr(search, "_services", {})
+
+    first = _prepare(["первый", "второй", "третий"])
+    assert (first["reused"], first["added"], first["removed"]) == (0, 3, 0)
+
+    counting.embedded.clear()
+    # Пустой кэш эмбеддингов: неизменённые документы берутся только из прежнего индекса
+    monkeypatch.setattr(search, "get_cache", lambda: EmbeddingCache(data_root / "empty.sqlite"))
+    second = _prepare(["первый", "второй изменён", "четвёртый"])
+    assert (second["reused"], second["added"], second["removed"]) == (1, 2, 2)
+    assert counting.embedded == ["второй изменён", "четвёртый"]
+
+    forced = _prepare(["первый"], force=True)
+    assert forced["reused"] == 0
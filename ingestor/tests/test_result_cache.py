@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.result_cache import ResultCache
+
+
+class Command:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"call": self.calls}
+
+
+def test_result_is_cached_per_arguments_and_invalidated_by_scan():
+    cache = ResultCache()
+    command = Command()
+
+    async def main():
+        first = await cache.call("search", {"scan_id": 1, "q": "a"}, command, ttl=60)
+        again = await cache.call("search", {"q": "a", "scan_id": 1}, command, ttl=60)
+        other = await cache.call("search", {"scan_id": 1, "q": "b"}, command, ttl=60)
+        cache.invalidate(scan_id=1)
+        fresh = await cache.call("search", {"scan_id": 1, "q": "a"}, command, ttl=60)
+        return first, again, other, fresh
+
+    first, again, other, fresh = asyncio.run(main())
+
+    assert first == again == {"call": 1}
+    assert other == {"call": 2} and fresh == {"call": 3}
+
+
+def test_idempotency_key_replays_response_and_rejects_other_arguments():
+    cache = ResultCache()
+    command = Command()
+
+    async def main():
+        first = await cache.call("submit", {"limit": 5}, command, idempotency_key="k1")
+        replay = await cache.call("submit", {"limit": 5}, command, idempotency_key="k1")
+        with pytest.raises(HTTPException) as error:
+            await cache.call("submit", {"limit": 6}, command, idempotency_key="k1")
+        return first, replay, error.value.status_code
+
+    first, replay, status = asyncio.run(main())
+
+    assert first == replay == {"call": 1}
+    assert status == 422
+    assert command.calls == 1
+
+
+def test_concurrent_identical_requests_run_once():
+    cache = ResultCache()
+    command = Command(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(cache.call("slow", {"x": 1}, command, ttl=60) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"call": 1}] * 5
+    assert command.calls == 1
+
+
+def test_leader_cancellation_does_not_fail_followers():
+    cache = ResultCache()
+    command = Command(delay=0.05)
+
+    async def main():
+        leader = asyncio.create_task(cache.call("slow", {}, command, idempotency_key="k"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(cache.call("slow", {}, command, idempotency_key="k"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        return leader.cancelled(), await follower
+
+    leader_cancelled, result = asyncio.run(main())
+
+    assert leader_cancelled
+    assert result == {"call": 1}
+    assert command.calls == 1 and command.cancelled == 0
+
+
+def test_command_is_cancelled_when_nobody_waits_and_restarts_on_next_request():
+    cache = ResultCache()
+    command = Command(delay=0.05)
+
+    async def main():
+        only = asyncio.create_task(cache.call("slow", {}, command, ttl=60))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        await asyncio.gather(only, return_exceptions=True)
+        return await cache.call("slow", {}, command, ttl=60)
+
+    assert asyncio.run(main()) == {"call": 2}
+    assert command.cancelled == 1
+
+
+def test_result_started_before_invalidation_is_not_cached():
+    cache = ResultCache()
+    command = Command(delay=0.05)
+
+    async def main():
+        running = asyncio.create_task(cache.call("slow", {"scan_id": 3}, command, ttl=60))
+        await asyncio.sleep(0.01)
+        cache.invalidate(scan_id=3)
+        await running
+        return cache.get("slow", {"scan_id": 3})
+
+    assert asyncio.run(main()) is None
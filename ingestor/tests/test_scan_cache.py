@@ -0,0 +1,80 @@
+import asyncio
+
+from app.core.scan_cache import ScanCache
+from app.db.scan_source import InMemoryScanSource
+
+
+class CountingSource(InMemoryScanSource):
+    def __init__(self, scans):
+        super().__init__(scans)
+        self.reads = 0
+
+    def iter_scan(self, scan_id, *args, **kwargs):
+        self.reads += 1
+        return super().iter_scan(scan_id, *args, **kwargs)
+
+
+def _rows(n):
+    return [{"content": f"документ {i}", "title": f"t{i}"} for i in range(n)]
+
+
+def test_second_read_is_served_from_cache():
+    source = CountingSource({1: _rows(5)})
+    cache = ScanCache(source)
+
+    first = asyncio.run(cache.get_rows(1))
+    second = asyncio.run(cache.get_rows(1))
+
+    assert first == second == [{"content": f"документ {i}"} for i in range(5)]
+    assert source.reads == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_columns_are_part_of_the_key():
+    source = CountingSource({1: _rows(3)})
+    cache = ScanCache(source)
+
+    asyncio.run(cache.get_rows(1, ("content",)))
+    titles = asyncio.run(cache.get_rows(1, ("title",)))
+
+    assert titles == [{"title": f"t{i}"} for i in range(3)]
+    assert source.reads == 2
+
+
+def test_concurrent_readers_share_one_source_read():
+    source = CountingSource({1: _rows(50)})
+    cache = ScanCache(source)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_rows(1) for _ in range(4)))
+
+    results = asyncio.run(main())
+
+    assert all(len(rows) == 50 for rows in results)
+    assert source.reads == 1
+
+
+def test_scan_over_budget_is_streamed_without_caching():
+    source = CountingSource({1: _rows(20)})
+    cache = ScanCache(source, max_bytes=500)
+
+    async def batches():
+        return [batch async for batch in cache.aiter_scan(1, batch_size=5)]
+
+    assert sum(len(batch) for batch in asyncio.run(batches())) == 20
+    assert len(cache.lru) == 0
+    asyncio.run(cache.get_rows(1))
+    assert source.reads == 2
+
+
+def test_invalidate_forces_reread():
+    source = CountingSource({1: _rows(2), 2: _rows(2)})
+    cache = ScanCache(source)
+    asyncio.run(cache.get_rows(1))
+    asyncio.run(cache.get_rows(2))
+
+    assert cache.invalidate(1) == 1
+    asyncio.run(cache.get_rows(1))
+    asyncio.run(cache.get_rows(2))
+
+    assert source.reads == 3
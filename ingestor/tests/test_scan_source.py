@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from app.db.scan_source import ClickHouseScanSource, InMemoryScanSource
+
+
+def test_clickhouse_settings_come_from_load_config(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CLICKHOUSE_HOST", "ch.local")
+    monkeypatch.setenv("CLICKHOUSE_USERNAME", "reader")
+    monkeypatch.setenv("CLICKHOUSE_PASSWORD", "secret")
+    monkeypatch.setenv("CLICKHOUSE_DATABASE", "scans")
+    monkeypatch.delenv("CLICKHOUSE_PORT", raising=False)
+
+    source = ClickHouseScanSource.from_env()
+
+    assert source.settings == {
+        "host": "ch.local",
+        "port": 9049,
+        "username": "reader",
+        "password": "secret",
+        "database": "scans",
+    }
+
+
+def test_in_memory_source_applies_projection_filters_and_window():
+    rows = [{"id": i, "kind": "a" if i % 2 else "b", "content": f"doc {i}"} for i in range(10)]
+    source = InMemoryScanSource({1: rows})
+
+    async def collect():
+        return [batch async for batch in source.aiter_scan(1, ("id",), batch_size=2, offset=1, limit=3, filters={"kind": "a"})]
+
+    batches = asyncio.run(collect())
+
+    assert batches == [[{"id": 3}, {"id": 5}], [{"id": 7}]]
+
+
+class SlowScanSource(InMemoryScanSource):
+    def __init__(self, reading, release):
+        super().__init__()
+        self.reading = reading
+        self.release = release
+        self.closed = False
+
+    def iter_scan(self, scan_id, columns=("content",), batch_size=1000, limit=None, offset=0, filters=None):
+        try:
+            self.reading.set()
+            self.release.wait(5)
+            yield [{"content": "doc"}]
+        finally:
+            self.closed = True
+
+
+def test_cancel_during_batch_read_closes_source_after_read():
+    reading, release = threading.Event(), threading.Event()
+    source = SlowScanSource(reading, release)
+
+    async def consume():
+        async for _ in source.aiter_scan(1):
+            pass
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.to_thread(reading.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert source.closed
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.core import vector_codecs
+from app.core.vector_codecs import CODECS
+from app.core.vector_index import CompressedIndex, ExactIndex
+
+
+def _vectors(n=3000, dim=64, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("name, tolerance", [("float32", 1e-5), ("float16", 2e-3), ("int8", 3e-2)])
+def test_scores_close_to_float32(name, tolerance):
+    vectors = _vectors()
+    codec = CODECS[name].fit(vectors)
+    queries = vectors[:4]
+    assert np.abs(codec.score(queries, 0, len(vectors)) - queries @ vectors.T).max() < tolerance
+
+
+@pytest.mark.parametrize("name", ["float16", "int8"])
+def test_sub_block_decoding_matches_full_decode(name):
+    vectors = _vectors()
+    codes = CODECS[name].fit(vectors).codes[100:2900]
+    full = vectors[:3] @ codes.astype(np.float32).T
+    assert np.allclose(vector_codecs._decoded_dot(vectors[:3], codes, block_size=256), full, atol=1e-5)
+
+
+def test_compression_ratio():
+    vectors = _vectors()
+    assert CODECS["float16"].fit(vectors).nbytes == vectors.nbytes // 2
+    assert CODECS["int8"].fit(vectors).nbytes < vectors.nbytes // 3
+    assert CODECS["float32"].fit(vectors, pca_dim=16).codes.shape == (len(vectors), 16)
+
+
+def test_save_load_roundtrip(tmp_path):
+    vectors = _vectors(500)
+    codec = CODECS["int8"].fit(vectors, pca_dim=32)
+    codec.save(tmp_path / "codec.npz")
+    loaded = CODECS["int8"].load(tmp_path / "codec.npz")
+    assert np.array_equal(codec.score(vectors[:2], 0, 500), loaded.score(vectors[:2], 0, 500))
+
+
+def test_rerank_restores_exact_order():
+    vectors = _vectors()
+    queries = vectors[:5]
+    _, truth = ExactIndex(vectors).search(queries, 10)
+    _, found = CompressedIndex(vectors, CODECS["int8"].fit(vectors), rerank=50).search(queries, 10)
+    assert np.array_equal(found, truth)
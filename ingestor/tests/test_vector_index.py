@@ -0,0 +1,75 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core import vector_index
+from app.core.vector_index import ExactIndex, IVFIndex, top_k_rows
+
+
+def _corpus(n=4000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((40, dim))
+    vectors = centers[rng.integers(0, 40, n)] + 0.6 * rng.standard_normal((n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def test_top_k_rows_sorted():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7]], dtype=np.float32)
+    best, ids = top_k_rows(scores, 3)
+    assert ids.tolist() == [[1, 3, 2]]
+    assert np.allclose(best, [[0.9, 0.7, 0.5]])
+    assert top_k_rows(scores, 10)[1].shape == (1, 4)
+
+
+def test_exact_blocks_match_single_block():
+    vectors = _corpus(1000)
+    queries = vectors[:5]
+    _, whole = ExactIndex(vectors).search(queries, 10)
+    _, blocked = ExactIndex(vectors, block_size=128).search(queries, 10)
+    assert np.array_equal(whole, blocked)
+
+
+def test_ivf_recall_with_default_nprobe():
+    vectors = _corpus()
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), 50)] + 0.05 * rng.standard_normal((50, vectors.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    _, truth = ExactIndex(vectors).search(queries, 10)
+    ivf = IVFIndex.build(vectors)
+    _, found = ivf.search(queries, 10)
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    assert hits / truth.size >= 0.95
+
+
+def test_ivf_save_load_roundtrip(tmp_path):
+    vectors = _corpus(500)
+    ivf = IVFIndex.build(vectors, nlist=16)
+    ivf.save(tmp_path / "ivf.npz")
+    loaded = IVFIndex.load(vectors, tmp_path / "ivf.npz")
+    assert np.array_equal(ivf.search(vectors[:3], 5)[1], loaded.search(vectors[:3], 5)[1])
+
+
+def test_concurrent_callers_build_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "_built", {})
+    embedding_index = SimpleNamespace(scan_id=1, manifest={"created_at": time.time()}, path=tmp_path)
+    builds = []
+
+    def build(path):
+        builds.append(path)
+        time.sleep(0.05)
+        return ExactIndex(np.zeros((1, 2), dtype=np.float32))
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(vector_index._cached(embedding_index, "x.npz", None, build)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert all(result is results[0] for result in results)